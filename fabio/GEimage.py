@@ -53,7 +53,8 @@ import struct
 import logging
 logger = logging.getLogger("GEimage")
 from .fabioimage import FabioImage
-from .fabioutils import next_filename, previous_filename
+from .fabioutils import next_filename, previous_filename, read_array, preadinto, \
+    is_plain_file
 
 GE_HEADER_INFO = [
     # Name, length in bytes, format for struct (None means string)
@@ -218,6 +219,7 @@ GE_HEADER_INFO = [
 class GeImage(FabioImage):
 
     _need_a_seek_to_read = True
+    _file = None  # read-only handle on the sequence, shared between frames
 
     def _readheader(self, infile):
         """ Read a GE image header """
@@ -241,14 +243,54 @@ class GeImage(FabioImage):
             frame = 0
         self.header = self.check_header()
         self.resetvals()
+        self.close()
         infile = self._open(fname, "rb")
         self.sequencefilename = fname
         self._readheader(infile)
         self.nframes = self.header['NumberOfFrames']
         self._readframe(infile, frame)
-        infile.close()
+        # keep the file opened: other frames are read from the same handle
+        self._file = infile
         return self
 
+    def _get_file(self):
+        """
+        Provides the handle on the sequence, re-opening it if needed
+
+        @return: file object open in read mode
+        """
+        if self._file is None or self._file.closed:
+            self._file = self._open(self.sequencefilename, "rb")
+        return self._file
+
+    def close(self):
+        """
+        Close the file kept open to read the other frames of the sequence.
+        It is re-opened if another frame is requested.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _frame_offset(self, img_num):
+        """
+        Calculate the position of a frame in the sequence file
+
+        @param img_num: frame number
+        @return: offset in bytes
+        """
+        return self.header['StandardHeaderSizeInBytes'] + \
+               self.header['UserHeaderSizeInBytes'] + \
+               img_num * self.header['NumberOfRowsInFrame'] * \
+               self.header['NumberOfColsInFrame'] * \
+               self.header['ImageDepthInBits'] // 8
+
     def _makeframename(self):
         """ The thing to be printed for the user to represent a frame inside
         a file """
@@ -264,25 +306,18 @@ class GeImage(FabioImage):
         """
         if(img_num > self.nframes or img_num < 0):
             raise Exception("Bad image number")
-        imgstart = self.header['StandardHeaderSizeInBytes'] + \
-                   self.header['UserHeaderSizeInBytes'] + \
-                   img_num * self.header['NumberOfRowsInFrame'] * \
-                   self.header['NumberOfColsInFrame'] * \
-                   self.header['ImageDepthInBits'] // 8
-        # whence = 0 means seek from start of file
-        filepointer.seek(imgstart, 0)
-
+        imgstart = self._frame_offset(img_num)
         self.bpp = self.header['ImageDepthInBits'] // 8  # hopefully 2
-        imglength = self.header['NumberOfRowsInFrame'] * \
-                    self.header['NumberOfColsInFrame'] * self.bpp
         if self.bpp != 2:
             logging.warning("Using uint16 for GE but seems to be wrong, bpp=%s" % self.bpp)
 
-        data = numpy.fromstring(filepointer.read(imglength), numpy.uint16)
+        # positional read: frames can be read concurrently from a shared file
+        data = read_array(filepointer, imgstart,
+                          (self.header['NumberOfRowsInFrame'],
+                           self.header['NumberOfColsInFrame']),
+                          numpy.uint16)
         if not numpy.little_endian:
             data.byteswap(True)
-        data.shape = (self.header['NumberOfRowsInFrame'],
-                            self.header['NumberOfColsInFrame'])
         self.data = data
         self.dim2 , self.dim1 = self.data.shape
         self.currentframe = int(img_num)
@@ -299,18 +334,54 @@ class GeImage(FabioImage):
         """
         if num < 0 or num > self.nframes:
             raise Exception("Requested frame number is out of range")
-        # Do a deep copy of the header to make a new one
-        newheader = {}
-        for k in self.header.keys():
-            newheader[k] = self.header[k]
-        frame = GeImage(header=newheader)
+        # check_header makes a copy of the header
+        frame = GeImage(header=self.header)
         frame.nframes = self.nframes
         frame.sequencefilename = self.sequencefilename
-        infile = frame._open(self.sequencefilename, "rb")
-        frame._readframe(infile, num)
-        infile.close()
+        frame._readframe(self._get_file(), num)
         return frame
 
+    def get_frame_location(self, num=None):
+        """
+        Position of the raw data of a frame in the sequence file
+
+        @param num: frame number, by default the current one
+        @return: 4-tuple (filename, offset, shape, dtype) or None for compressed files
+        """
+        if num is None:
+            num = self.currentframe
+        if not is_plain_file(self.sequencefilename):
+            return None
+        return (self.sequencefilename, self._frame_offset(num),
+                (self.header['NumberOfRowsInFrame'], self.header['NumberOfColsInFrame']),
+                numpy.dtype("<u2"))
+
+    def read_frames(self, start, stop, out=None):
+        """
+        Read a contiguous block of frames of the sequence in a single read
+
+        @param start: index of the first frame
+        @param stop: index after the last frame
+        @param out: (optional) uint16 array of shape (stop - start, rows, cols) to be filled
+        @return: 3D numpy array with the frames
+        """
+        if start < 0 or stop > self.nframes or start >= stop:
+            raise IndexError("read_frames [%s, %s[ out of range [0, %s[" % (start, stop, self.nframes))
+        shape = (stop - start,
+                 self.header['NumberOfRowsInFrame'],
+                 self.header['NumberOfColsInFrame'])
+        if out is None:
+            out = numpy.empty(shape, dtype=numpy.uint16)
+        elif out.shape != shape or out.dtype != numpy.uint16 or not out.flags.c_contiguous:
+            raise ValueError("Output array should be a C-contiguous uint16 array of shape %s" % (shape,))
+        read = preadinto(self._get_file(), out, self._frame_offset(start))
+        if read < out.nbytes:
+            logger.error("Data stream is incomplete: %s < expected %s bytes" % (read, out.nbytes))
+            out.reshape(-1).view(numpy.uint8)[read:] = 0
+        if not numpy.little_endian:
+            out.byteswap(True)
+        return out
+
     def next(self):
         """
         Get the next image in a series as a fabio image
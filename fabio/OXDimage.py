@@ -54,6 +54,7 @@ import numpy
 from .fabioimage import FabioImage
 from .compression import decTY1, compTY1
 from .fabioutils import to_str
+from .converters import convert_data_integer, WRITER_DTYPES
 
 try:
     from numpy import rad2deg, deg2rad
@@ -435,7 +436,7 @@ class OxdImage(FabioImage):
         Only TY1 compressed images is currently possible
         @param fname: output filename
         """
-        datablock8, datablock16, datablock32 = compTY1(self.data)
+        datablock8, datablock16, datablock32 = compTY1(self.checkData(self.data))
         self.header["OI"] = len(datablock16) / 2
         self.header["OL"] = len(datablock32) / 4
         self.header["Compression"] = "TY1"
@@ -451,10 +452,13 @@ class OxdImage(FabioImage):
 
     @staticmethod
     def checkData(data=None):
-        if data is None:
-            return None
-        else:
-            return data.astype(int)
+        """
+        Data as written in the file, called by write
+
+        @param data: array like
+        @return: the data as the narrowest integer type able to hold them
+        """
+        return convert_data_integer(data, WRITER_DTYPES["OXDimage"])
 
     def dec_TY5(self, stream):
         """
@@ -0,0 +1,118 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for the byte-offset compression: in memory, streamed to a file and multithreaded"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import os
+import sys
+import time
+import tempfile
+import multiprocessing
+import numpy
+
+try:
+    import tracemalloc
+except ImportError:  # python2
+    tracemalloc = None
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from ..compression import compByteOffset, compByteOffset_numpy, compByteOffset_stream, compByteOffset_parallel
+from ..cbfimage import CbfImage
+
+
+def measure(function):
+    """
+    @return: execution time and peak memory allocated (in bytes, 0 if unknown)
+    """
+    if tracemalloc is not None:
+        tracemalloc.start()
+    t0 = time.time()
+    function()
+    t = time.time() - t0
+    peak = 0
+    if tracemalloc is not None:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return t, peak
+
+
+def run_benchmark(shape=(4096, 4096), dtypes=("int32", "int64"), workers=None):
+    """
+    Measure time and peak memory needed to compress a frame, then the
+    throughput of the multithreaded compression
+
+    :param shape: shape of the image (default: 16 Mpix)
+    :param dtypes: data types to test
+    :param workers: list of number of threads (default: 1, 2, 4 ... number of CPU)
+    """
+    if workers is None:
+        workers = [1]
+        while workers[-1] * 2 <= multiprocessing.cpu_count():
+            workers.append(workers[-1] * 2)
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("Compressing a %s image" % (shape,))
+    fd, filename = tempfile.mkstemp(suffix=".cbf")
+    os.close(fd)
+    try:
+        print("dtype \t method \t\t time (ms) \t peak memory (MB)")
+        for dtype in dtypes:
+            data = numpy.random.poisson(100, size=shape).astype(dtype)
+            data[::7, ::5] = 70000
+            with open(filename, "wb") as stream:
+                methods = [("cython", lambda: compByteOffset(data)),
+                           ("numpy", lambda: compByteOffset_numpy(data)),
+                           ("stream", lambda: compByteOffset_stream(data, stream)),
+                           ("CbfImage", lambda: CbfImage(data=data).write(filename))]
+                for name, function in methods:
+                    t, peak = measure(function)
+                    print("%s \t %-8s \t %9.1f \t %16.1f" % (dtype, name, 1000 * t, peak / 1e6))
+        print("dtype \t threads \t time (ms) \t throughput (MB/s)")
+        for dtype in dtypes:
+            data = numpy.random.poisson(100, size=shape).astype(dtype)
+            data[::7, ::5] = 70000
+            for nthreads in workers:
+                t0 = time.time()
+                compByteOffset_parallel(data, nthreads)
+                t = time.time() - t0
+                print("%s \t %7i \t %9.1f \t %17.1f" % (dtype, nthreads, 1000 * t, data.nbytes / t / 1e6))
+    finally:
+        os.unlink(filename)
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,85 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for the byte-offset decompression: memchr fast path versus byte-wise decoder"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import sys
+import time
+import numpy
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from ..compression import compByteOffset
+from ..ext import byte_offset
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+def run_benchmark(shape=(4096, 4096), counts=(0.1, 1, 100, 10000), repeat=30):
+    """
+    Measure the time needed to decompress frames with low and high counts,
+    in ms per Mpix
+
+    :param shape: shape of the image (default: 16 Mpix)
+    :param counts: mean number of counts per pixel of the frames (Poisson)
+    :param repeat: number of measurement, takes the best of them
+    """
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("Decompressing %s frames (best of %s), in ms/Mpix" % (shape, repeat))
+    mpix = numpy.prod(shape) / 1e6
+    print("counts \t bytes/pix \t int32 fast \t int32 bytewise \t int64 fast \t int64 bytewise")
+    for count in counts:
+        data = numpy.random.poisson(count, size=shape).astype(numpy.int32)
+        stream = compByteOffset(data)
+        decoders = [lambda: byte_offset.dec_cbf32(stream, data.size),
+                    lambda: byte_offset.dec_cbf32(stream, data.size, fast=False),
+                    lambda: byte_offset.dec_cbf(stream, data.size),
+                    lambda: byte_offset.dec_cbf(stream, data.size, fast=False)]
+        best = [None] * len(decoders)
+        # measurements are interleaved to be fair with the noise of the machine
+        for _ in range(repeat):
+            for i, decoder in enumerate(decoders):
+                t0 = timer()
+                decoder()
+                t = timer() - t0
+                best[i] = t if best[i] is None else min(best[i], t)
+        print("%6s \t %9.2f \t %10.2f \t %14.2f \t %10.2f \t %14.2f" %
+              ((count, len(stream) / data.size) + tuple(1000 * t / mpix for t in best)))
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,111 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for the CIF parser on a large mmCIF-like header"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import sys
+import time
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from ..cbfimage import CIF
+from .. import cbfimage
+
+
+def make_cif(nloops=500, nkeys=8, nrows=20, nitems=2000):
+    """
+    Build a CIF text with many loops, like the header of an mmCIF file
+
+    :param nloops: number of loops (categories)
+    :param nkeys: number of keys per loop
+    :param nrows: number of rows per loop
+    :param nitems: number of key-value pairs outside loops
+    :return: bytes
+    """
+    lines = [b"data_benchmark"]
+    for i in range(nitems):
+        lines.append(("_item_%05i.value 'quoted value %i'" % (i, i)).encode("ascii"))
+    for i in range(nloops):
+        lines.append(b"loop_")
+        for j in range(nkeys):
+            lines.append(("_category_%04i.key_%i" % (i, j)).encode("ascii"))
+        for k in range(nrows):
+            lines.append(" ".join("%i.%i" % (k, j) for j in range(nkeys)).encode("ascii"))
+        lines.append(b";\nmulti-line text field\nof category %i\n;" % i)
+    return b"\n".join(lines) + b"\n"
+
+
+def legacy_loops(fields):
+    """Loop extraction of FabIO 0.4: the list of fields is rebuilt for each loop"""
+    loopidx = []
+    looplen = []
+    for idx, field in enumerate(fields):
+        if field.lower() == CIF.LOOP:
+            loopidx.append(idx)
+    for i in loopidx:
+        looplen.append(CIF._analyseOneLoop(fields, i)[1])
+    for i in range(len(loopidx) - 1, -1, -1):
+        fields = fields[:loopidx[i]] + fields[loopidx[i] + looplen[i]:]
+    return fields
+
+
+def run_benchmark(sizes=(100, 500, 2000)):
+    """
+    Time the tokenizers and the parsing of CIF headers of increasing size
+
+    :param sizes: numbers of loops to test
+    """
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("loops \t size (kB) \t cython split (ms) \t python split (ms) \t legacy loops (ms) \t parse (ms)")
+    for nloops in sizes:
+        text = make_cif(nloops)
+        t0 = time.time()
+        if cbfimage.split_tokens is not None:
+            fields = cbfimage.split_tokens(text)
+        t1 = time.time()
+        fields = CIF._splitCIF(text)
+        t2 = time.time()
+        legacy_loops(fields)
+        t3 = time.time()
+        CIF()._parseCIF(text)
+        t4 = time.time()
+        print("%5i \t %9i \t %17.1f \t %17.1f \t %17.1f \t %10.1f" %
+              (nloops, len(text) // 1000, 1000 * (t1 - t0), 1000 * (t2 - t1), 1000 * (t3 - t2), 1000 * (t4 - t3)))
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,115 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for the EDF header parser: compiled versus python, and reading of multi-frame files"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import os
+import sys
+import time
+import tempfile
+import numpy
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from .. import edfimage
+from ..openimage import openimage
+
+timer = getattr(time, "perf_counter", time.time)
+
+
+def make_header(nkeys=300):
+    """
+    Build a header like those of the ID beamlines: many motor positions
+
+    :param nkeys: number of motor positions
+    :return: dict
+    """
+    return dict(("motor_%03i" % i, "%.6f" % (i * 1.2345)) for i in range(nkeys))
+
+
+def best_of(function, repeat):
+    """
+    :return: best execution time of function, in seconds
+    """
+    best = None
+    for _ in range(repeat):
+        t0 = timer()
+        function()
+        t = timer() - t0
+        best = t if best is None else min(best, t)
+    return best
+
+
+def run_benchmark(sizes=(30, 300, 1000), nframes=100, repeat=20):
+    """
+    Time the parsing of one header and the reading of all headers of a
+    multi-frame file with small frames
+
+    :param sizes: numbers of keys in the header
+    :param nframes: number of frames of the file
+    :param repeat: number of measurement, takes the best of them
+    """
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    if edfimage._parse_header is None:
+        print("_edf cython module not available")
+    print("keys \t size (kB) \t compiled (us) \t python (us) \t file of %s frames (ms)" % nframes)
+    filename = os.path.join(tempfile.gettempdir(), "fabio_edf_header.edf")
+    for nkeys in sizes:
+        header = make_header(nkeys)
+        image = edfimage.edfimage(data=numpy.zeros((16, 16), numpy.uint16), header=header)
+        for _ in range(nframes - 1):
+            image.appendFrame(data=numpy.zeros((16, 16), numpy.uint16), header=header)
+        image.write(filename)
+        block = image._frames[0].getEdfBlock()
+        block = block[block.find(b"{") + 1:block.find(b"}")]
+        compiled = python = 0
+        if edfimage._parse_header is not None:
+            compiled = best_of(lambda: edfimage._parse_header(block), repeat)
+        python = best_of(lambda: edfimage._parse_header_block(block), repeat)
+
+        def read_all():
+            obj = openimage(filename)
+            for i in range(obj.nframes):
+                obj._frames[i].header
+        read = best_of(read_all, max(1, repeat // 4))
+        print("%4i \t %9.1f \t %13.1f \t %11.1f \t %10.1f" %
+              (nkeys, len(block) / 1000, 1e6 * compiled, 1e6 * python, 1000 * read))
+    os.unlink(filename)
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
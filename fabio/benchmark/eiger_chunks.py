@@ -0,0 +1,130 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for reading compressed Eiger stacks with direct chunk reads"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from ..eigerimage import EigerImage, h5py
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+
+def write_eiger(filename, nframes=200, shape=(1065, 1030), compression="gzip"):
+    """
+    Write an Eiger-like file with one frame per chunk and Poisson noise
+
+    :param filename: name of the file
+    :param nframes: number of frames
+    :param shape: shape of a frame
+    :param compression: "gzip", "lz4" or "bitshuffle" (the last two need hdf5plugin)
+    """
+    if compression == "gzip":
+        options = {"compression": "gzip", "shuffle": True}
+    elif compression == "lz4":
+        options = dict(hdf5plugin.LZ4())
+    else:
+        options = dict(hdf5plugin.Bitshuffle())
+    with h5py.File(filename, mode="w") as h5:
+        grp = h5.require_group("entry/data")
+        ds = grp.create_dataset("data_000001", shape=(nframes,) + tuple(shape), dtype="uint32",
+                                chunks=(1,) + tuple(shape), **options)
+        frame = numpy.random.poisson(2, size=shape).astype("uint32")
+        for i in range(nframes):
+            ds[i] = numpy.roll(frame, i, axis=1)
+
+
+def run_benchmark(nframes=200, shape=(1065, 1030), workers=(1, 2, 4, 8), repeat=3,
+                  compressions=("gzip", "lz4", "bitshuffle")):
+    """
+    Measure the number of frames read per second via h5py and via direct chunk reads
+
+    :param nframes: number of frames in the file
+    :param shape: shape of a frame (default: Eiger 1M)
+    :param workers: list with the number of decompression threads to test
+    :param repeat: number of measurement, takes the best of them
+    :param compressions: compression schemes to test
+    """
+    tmpdir = tempfile.mkdtemp(prefix="fabio_bench_")
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("Reading %i frames of %s (best of %s)" % (nframes, shape, repeat))
+    try:
+        for compression in compressions:
+            if compression != "gzip" and hdf5plugin is None:
+                print("%s: skipped, hdf5plugin is needed to write the file" % compression)
+                continue
+            filename = os.path.join(tmpdir, "%s.h5" % compression)
+            write_eiger(filename, nframes, shape, compression)
+            img = EigerImage()
+            img.read(filename)
+            out = numpy.empty((nframes,) + tuple(shape), dtype="uint32")
+            print("#" * 80)
+            print("%s (%.1f MB on disk)" % (compression, os.stat(filename).st_size / 1e6))
+            print("method     \t threads \t time (s) \t frames/s")
+            best = None
+            ds = img.dataset[0]
+            for _ in range(repeat):
+                t0 = time.time()
+                for i in range(nframes):
+                    out[i] = ds[i]
+                t = time.time() - t0
+                best = t if best is None else min(best, t)
+            print("h5py       \t %7i \t %.3f \t %.1f" % (1, best, nframes / best))
+            for nthreads in workers:
+                best = None
+                for _ in range(repeat):
+                    t0 = time.time()
+                    img.read_frames(0, nframes, out=out, workers=nthreads)
+                    t = time.time() - t0
+                    best = t if best is None else min(best, t)
+                print("direct     \t %7i \t %.3f \t %.1f" % (nthreads, best, nframes / best))
+            img.h5.close()
+    finally:
+        shutil.rmtree(tmpdir)
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
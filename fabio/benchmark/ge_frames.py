@@ -0,0 +1,104 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for reading GE sequences frame by frame or by blocks"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from ..GEimage import GEimage
+from ..test.testGEimage import write_ge
+
+
+def run_benchmark(nframes=200, shape=(2048, 2048), block=50, repeat=3):
+    """
+    Compare the reading of a GE sequence with getframe and read_frames
+
+    :param nframes: number of frames in the sequence
+    :param shape: shape of a frame
+    :param block: number of frames read at once with read_frames
+    :param repeat: number of measurement, takes the best of them
+    """
+    tmpdir = tempfile.mkdtemp(prefix="fabio_bench_")
+    filename = os.path.join(tmpdir, "sequence.ge2")
+    data = numpy.random.randint(0, 16000, size=(nframes,) + tuple(shape)).astype(numpy.uint16)
+    write_ge(filename, data)
+    del data
+    size = os.stat(filename).st_size / 1.0e6  # MB
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("Reading %i frames of %s (%.1f MB, best of %s)" % (nframes, shape, size, repeat))
+    print("#" * 80)
+    print("     method      	 time (s) 	 frames/s 	 MB/s")
+
+    def per_frame():
+        obj = GEimage()
+        obj.read(filename)
+        for i in range(1, obj.nframes):
+            obj.getframe(i).data
+        obj.close()
+
+    def by_block():
+        obj = GEimage()
+        obj.read(filename)
+        out = numpy.empty((block,) + tuple(shape), dtype=numpy.uint16)
+        for start in range(0, obj.nframes, block):
+            stop = min(start + block, obj.nframes)
+            obj.read_frames(start, stop, out=out[:stop - start])
+        obj.close()
+
+    try:
+        for name, func in (("getframe loop", per_frame),
+                           ("read_frames(%i)" % block, by_block)):
+            best = None
+            for _ in range(repeat):
+                t0 = time.time()
+                func()
+                t = time.time() - t0
+                best = t if best is None else min(best, t)
+            print("%17s \t %.3f \t %.1f \t %.1f" % (name, best, nframes / best, size / best))
+    finally:
+        shutil.rmtree(tmpdir)
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,120 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for opening small regions of interest of large HDF5 frames by URL"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy
+
+try:
+    from .. import open as fabio_open, version, date
+except:
+    from fabio import open as fabio_open, version, date
+from ..hdf5image import h5py
+from .. import hdf5pool
+
+
+def write_stack(filename, nframes=10, shape=(4096, 4096), chunks=(1, 256, 256)):
+    """
+    Write a compressed HDF5 stack of frames
+
+    :param filename: name of the file
+    :param nframes: number of frames
+    :param shape: shape of a frame
+    :param chunks: chunk shape
+    """
+    with h5py.File(filename, mode="w") as h5:
+        ds = h5.create_dataset("entry/data", shape=(nframes,) + tuple(shape), dtype="uint32",
+                               chunks=chunks, compression="gzip")
+        frame = numpy.random.poisson(10, size=shape).astype("uint32")
+        for i in range(nframes):
+            ds[i] = frame
+
+
+def run_benchmark(nframes=10, shape=(4096, 4096), repeat=5):
+    """
+    Compare opening a whole frame then cropping with reading only the ROI
+
+    :param nframes: number of frames in the file
+    :param shape: shape of a frame
+    :param repeat: number of measurement, takes the best of them
+    """
+    tmpdir = tempfile.mkdtemp(prefix="fabio_bench_")
+    filename = os.path.join(tmpdir, "stack.h5")
+    write_stack(filename, nframes, shape)
+    frame = nframes // 2
+    center = shape[0] // 2, shape[1] // 2
+    rois = [("full frame", "[%i]" % frame),
+            ("one row", "[%i,%i]" % (frame, center[0])),
+            ("64x64 ROI", "[%i,%i:%i,%i:%i]" % (frame, center[0], center[0] + 64, center[1], center[1] + 64)),
+            ("512x512 ROI", "[%i,%i:%i,%i:%i]" % (frame, center[0], center[0] + 512, center[1], center[1] + 512)),
+            ("decimated /8", "[%i,::8,::8]" % frame),
+            ("pixel vs time", "[:,%i,%i:%i]" % (center[0], center[1], center[1] + 1))]
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("Opening ROIs in a stack of %i frames of %s (best of %s)" % (nframes, shape, repeat))
+    print("#" * 80)
+    print("selection      \t crop after read (ms) \t URL selection (ms)")
+    try:
+        for name, selection in rois:
+            best_full = best_url = None
+            for _ in range(repeat):
+                hdf5pool.pool.clear()
+                t0 = time.time()
+                if selection.startswith("[:"):
+                    img = fabio_open("%s::entry/data" % filename)
+                    img.read_frames(0, nframes)
+                else:
+                    img = fabio_open("%s::entry/data" % filename, frame)
+                t = time.time() - t0
+                img.close()
+                best_full = t if best_full is None else min(best_full, t)
+                hdf5pool.pool.clear()
+                t0 = time.time()
+                img = fabio_open("hdf5://%s?entry/data#slice=%s" % (filename, selection))
+                t = time.time() - t0
+                img.close()
+                best_url = t if best_url is None else min(best_url, t)
+            print("%-15s \t %.1f \t %.1f" % (name, 1000 * best_full, 1000 * best_url))
+    finally:
+        hdf5pool.pool.clear()
+        shutil.rmtree(tmpdir)
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
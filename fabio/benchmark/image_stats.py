@@ -0,0 +1,83 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for image statistics: separate numpy passes versus FabioImage.stats"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import sys
+import time
+import numpy
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from ..fabioimage import FabioImage
+
+
+def run_benchmark(shape=(4096, 4096), dtypes=("uint16", "int32", "float32"), workers=(1, 2, 4), repeat=5):
+    """
+    Measure the time needed to get min, max, mean and standard deviation
+
+    :param shape: shape of the image (default: 16 Mpix)
+    :param dtypes: data types to test
+    :param workers: list with the number of threads to test
+    :param repeat: number of measurement, takes the best of them
+    """
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("Statistics of a %s image (best of %s)" % (shape, repeat))
+    print("dtype   \t method \t threads \t time (ms)")
+    for dtype in dtypes:
+        data = numpy.random.poisson(100, size=shape).astype(dtype)
+        best = None
+        for _ in range(repeat):
+            t0 = time.time()
+            data.min(), data.max(), data.mean(dtype=numpy.float64), data.std(dtype=numpy.float64)
+            t = time.time() - t0
+            best = t if best is None else min(best, t)
+        print("%-8s\t numpy  \t %7i \t %.1f" % (dtype, 1, 1000 * best))
+        img = FabioImage(data)
+        for nthreads in workers:
+            best = None
+            for _ in range(repeat):
+                img.resetvals()
+                t0 = time.time()
+                img.stats(workers=nthreads)
+                t = time.time() - t0
+                best = t if best is None else min(best, t)
+            print("%-8s\t stats  \t %7i \t %.1f" % (dtype, nthreads, 1000 * best))
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
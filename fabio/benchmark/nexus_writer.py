@@ -0,0 +1,96 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for streaming frames into a compressed NeXus dataset"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from ..nexus import Nexus, h5py
+
+
+def run_benchmark(nframes=200, shape=(1065, 1030), compressions=("gzip", "lzf"), repeat=3):
+    """
+    Measure the number of frames written per second with h5py and with the
+    FrameWriter of fabio.nexus (threaded or not)
+
+    :param nframes: number of frames to write
+    :param shape: shape of a frame (default: Eiger 1M)
+    :param compressions: compression schemes to test
+    :param repeat: number of measurement, takes the best of them
+    """
+    tmpdir = tempfile.mkdtemp(prefix="fabio_bench_")
+    frame = numpy.random.poisson(2, size=shape).astype("uint32")
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("Writing %i frames of %s (best of %s)" % (nframes, shape, repeat))
+    print("compression \t method     \t time (s) \t frames/s")
+    try:
+        for compression in compressions:
+            for method in ("h5py", "writer", "threaded"):
+                best = None
+                for i in range(repeat):
+                    filename = os.path.join(tmpdir, "%s_%s_%s.h5" % (compression, method, i))
+                    t0 = time.time()
+                    with Nexus(filename, "a") as nxs:
+                        nxdata = nxs.new_class(nxs.new_entry("entry"), "data", "NXdata")
+                        if method == "h5py":
+                            ds = nxdata.create_dataset("data", shape=(nframes,) + shape, dtype="uint32",
+                                                       chunks=(1,) + shape, compression=compression)
+                            for j in range(nframes):
+                                ds[j] = numpy.roll(frame, j, axis=1)
+                        else:
+                            writer = nxs.new_data_writer(nxdata, shape, dtype="uint32", compression=compression,
+                                                         threaded=(method == "threaded"))
+                            for j in range(nframes):
+                                writer.append(numpy.roll(frame, j, axis=1))
+                            writer.close()
+                    t = time.time() - t0
+                    best = t if best is None else min(best, t)
+                    os.unlink(filename)
+                print("%-11s \t %-10s \t %.3f \t %.1f" % (compression, method, best, nframes / best))
+    finally:
+        shutil.rmtree(tmpdir)
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
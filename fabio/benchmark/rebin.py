@@ -0,0 +1,100 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for rebinning: former FabioImage.rebin versus fabio.reduction.rebin"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import sys
+import time
+import numpy
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from ..reduction import rebin
+
+
+def legacy_rebin(data, y_rebin_fact, x_rebin_fact):
+    """Algorithm of FabioImage.rebin in FabIO 0.4, mean of the bins"""
+    dataIn = data.astype("float64")
+    shapeIn = data.shape
+    shapeOut = (shapeIn[0] // y_rebin_fact, shapeIn[1] // x_rebin_fact)
+    binsize = y_rebin_fact * x_rebin_fact
+    if binsize < 50:
+        out = numpy.zeros(shapeOut, dtype="float64")
+        for j in range(x_rebin_fact):
+            for i in range(y_rebin_fact):
+                out += dataIn[i::y_rebin_fact, j::x_rebin_fact]
+    else:
+        temp = data.astype("float64")
+        temp.shape = (shapeOut[0], y_rebin_fact, shapeOut[1], x_rebin_fact)
+        out = temp.sum(axis=3).sum(axis=1)
+    return (out / binsize).astype(data.dtype)
+
+
+def best_time(function, repeat):
+    best = None
+    for _ in range(repeat):
+        t0 = time.time()
+        function()
+        t = time.time() - t0
+        best = t if best is None else min(best, t)
+    return best
+
+
+def run_benchmark(shape=(4096, 4096), factors=(2, 4, 8), dtype="uint16", repeat=5):
+    """
+    Measure the time needed to rebin a frame, mean of the bins
+
+    :param shape: shape of the image (default: 16 Mpix)
+    :param factors: binning factors to test (same in both directions)
+    :param dtype: data type of the image
+    :param repeat: number of measurement, takes the best of them
+    """
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("Rebinning a %s image of %s (best of %s)" % (shape, dtype, repeat))
+    data = numpy.random.poisson(100, size=shape).astype(dtype)
+    print("factor \t legacy (ms) \t float64 (ms) \t float32 (ms) \t max (ms)")
+    for factor in factors:
+        legacy = best_time(lambda: legacy_rebin(data, factor, factor), repeat)
+        new = best_time(lambda: rebin(data, factor), repeat)
+        single = best_time(lambda: rebin(data, factor, dtype=numpy.float32), repeat)
+        maxi = best_time(lambda: rebin(data, factor, "max"), repeat)
+        print("%ix%i \t %11.1f \t %12.1f \t %12.1f \t %8.1f" %
+              (factor, factor, 1000 * legacy, 1000 * new, 1000 * single, 1000 * maxi))
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,124 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = """Benchmark for out-of-core stacking (median, percentile, sigma clipping)
+
+The reference case of 10000 frames of 1 Mpix needs 20 GB of disk:
+
+    python -m fabio.benchmark.stacking 10000 1000 1000
+"""
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import numpy
+try:
+    import resource
+except ImportError:
+    resource = None
+
+try:
+    from .. import version, date
+except:
+    from fabio import version, date
+from ..edfimage import Frame
+from ..stacking import stack_frames
+
+
+def write_stack(filename, nframes, shape, dtype="uint16"):
+    """
+    Write a multi-frame EDF file frame by frame, without keeping the stack in memory
+
+    :param filename: name of the file
+    :param nframes: number of frames
+    :param shape: shape of a frame
+    :param dtype: data type of a frame
+    """
+    with open(filename, "wb") as f:
+        for i in range(nframes):
+            data = numpy.random.poisson(100, size=shape).astype(dtype)
+            f.write(Frame(data=data, number=i + 1).getEdfBlock())
+
+
+def peak_memory():
+    """
+    :return: peak resident memory of the process in MB, or None if unknown
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return peak / 1e6
+    return peak / 1e3
+
+
+def run_benchmark(nframes=200, shape=(1000, 1000), memory=256e6,
+                  methods=("median", "percentile", "sigma_clip"), workers=None):
+    """
+    Measure the time for stacking a synthetic multi-frame EDF file
+
+    :param nframes: number of frames in the stack
+    :param shape: shape of a frame
+    :param memory: memory cap given to stack_frames, in bytes
+    :param methods: list of stacking methods to test
+    :param workers: number of threads (default: number of CPU)
+    """
+    tmpdir = tempfile.mkdtemp(prefix="fabio_bench_")
+    filename = os.path.join(tmpdir, "stack.edf")
+    try:
+        t0 = time.time()
+        write_stack(filename, nframes, shape)
+        size = os.stat(filename).st_size / 1.0e6  # MB
+        print("Python %s" % sys.version)
+        print("FabIO %s (%s)" % (version, date))
+        print("Stacking %i frames of %s (%.1f MB written in %.1fs), memory cap %.1f MB" %
+              (nframes, shape, size, time.time() - t0, memory / 1e6))
+        print("#" * 80)
+        print("method      \t time (s) \t MB/s \t peak RSS (MB)")
+        for method in methods:
+            t0 = time.time()
+            stack_frames(filename, method, q=90, memory=memory, workers=workers)
+            t = time.time() - t0
+            print("%-11s \t %.3f \t %.1f \t %s" % (method, t, size / t, peak_memory()))
+    finally:
+        shutil.rmtree(tmpdir)
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    if len(sys.argv) > 3:
+        run_benchmark(int(sys.argv[1]), (int(sys.argv[2]), int(sys.argv[3])))
+    else:
+        run_benchmark()
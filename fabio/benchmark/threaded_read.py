@@ -0,0 +1,105 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from __future__ import print_function, division
+
+
+__doc__ = "Benchmark for reading frames of a multi-frame file from several threads"
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+__license__ = "MIT"
+__copyright__ = "2016 European Synchrotron Radiation Facility, Grenoble, France"
+
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+from multiprocessing.pool import ThreadPool
+import numpy
+
+try:
+    from .. import open as fabio_open, version, date
+except:
+    from fabio import open as fabio_open, version, date
+from ..edfimage import edfimage
+
+
+def write_stack(filename, nframes=64, shape=(2048, 2048), dtype="uint16"):
+    """
+    Write a multi-frame EDF file with random content
+
+    :param filename: name of the file
+    :param nframes: number of frames
+    :param shape: shape of a frame
+    :param dtype: data type of a frame
+    """
+    data = numpy.random.randint(0, 1000, size=shape).astype(dtype)
+    e = edfimage(data=data)
+    for _ in range(1, nframes):
+        e.appendFrame(data=data)
+    e.write(filename)
+
+
+def run_benchmark(nframes=64, shape=(2048, 2048), workers=(1, 2, 4, 8), repeat=3):
+    """
+    Measure the throughput of reading all frames of one EDF file with a pool of threads
+
+    :param nframes: number of frames in the file
+    :param shape: shape of a frame
+    :param workers: list with the number of threads to test
+    :param repeat: number of measurement, takes the best of them
+    """
+    tmpdir = tempfile.mkdtemp(prefix="fabio_bench_")
+    filename = os.path.join(tmpdir, "stack.edf")
+    write_stack(filename, nframes, shape)
+    size = os.stat(filename).st_size / 1.0e6  # MB
+    print("Python %s" % sys.version)
+    print("FabIO %s (%s)" % (version, date))
+    print("Reading %i frames of %s (%.1f MB, best of %s)" % (nframes, shape, size, repeat))
+    print("#" * 80)
+    print("threads \t time (s) \t frames/s \t MB/s")
+    try:
+        for nthreads in workers:
+            pool = ThreadPool(nthreads)
+            best = None
+            for _ in range(repeat):
+                obj = fabio_open(filename)
+                frames = obj._frames
+                t0 = time.time()
+                pool.map(lambda frame: frame.data, frames)
+                t = time.time() - t0
+                best = t if best is None else min(best, t)
+            pool.close()
+            pool.join()
+            print("%7i \t %.3f \t %.1f \t %.1f" % (nthreads, best, nframes / best, size / best))
+    finally:
+        shutil.rmtree(tmpdir)
+
+run = run_benchmark
+
+if __name__ == "__main__":
+    run_benchmark()
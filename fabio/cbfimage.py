@@ -41,7 +41,7 @@ from __future__ import with_statement, print_function, absolute_import
 __author__ = "Jérôme Kieffer"
 __contact__ = "jerome.kieffer@esrf.eu"
 __license__ = "MIT"
-__date__ = "05/09/2016"
+__date__ = "18/10/2016"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
 __version__ = ["Generated by CIF.py: Jan 2005 - Oct 2015",
                "Written by Jerome Kieffer: Jerome.Kieffer@esrf.eu",
@@ -49,15 +49,24 @@ __version__ = ["Generated by CIF.py: Jan 2005 - Oct 2015",
 
 
 import os
+import re
 import logging
+import threading
 import numpy
-from .fabioimage import FabioImage
-from .compression import compByteOffset, decByteOffset, md5sum, six
-from .ext._cif import split_tokens
+from .fabioimage import FabioImage, OrderedDict
+from .fabioutils import pread, StringTypes
+from .compression import compByteOffset_stream, decByteOffset, md5sum, six, BYTE_OFFSET_PARALLEL_BLOCK
+from .converters import convert_data_integer, WRITER_DTYPES
 
 
 logger = logging.getLogger("CbfImage")
 
+try:
+    from .ext._cif import split_tokens
+except ImportError as error:
+    logger.warning("Failed to import _cif cython module, falling back on the python tokenizer: %s", error)
+    split_tokens = None
+
 
 DATA_TYPES = {"signed 8-bit integer"   : "int8",
               "signed 16-bit integer"  : "int16",
@@ -77,6 +86,154 @@ MINIMUM_KEYS = ["X-Binary-Size-Fastest-Dimension",
                 'X-Binary-Number-of-Elements']
 
 
+# description of a binary section of a CBF file, i.e. of a frame
+SECTION_DTYPE = numpy.dtype([("text_start", numpy.int64),  # CIF text preceding the section
+                             ("text_size", numpy.int64),
+                             ("header_start", numpy.int64),  # MIME header, up to the starter
+                             ("header_size", numpy.int64),
+                             ("start", numpy.int64),  # compressed data
+                             ("size", numpy.int64),
+                             ("dim1", numpy.int64),
+                             ("dim2", numpy.int64),
+                             ("dtype", "S8")])
+
+# size of the blocks read when looking for the binary sections
+SCAN_BLOCK = 1 << 16
+
+# number of section indexes kept in memory
+INDEX_CACHE_SIZE = 64
+_index_cache = OrderedDict()  # (path, mtime, size) -> index, least recently used first
+_index_lock = threading.Lock()
+
+
+def _find(infile, pattern, offset):
+    """
+    Look for a pattern in a file, reading it by blocks from offset
+
+    @param infile: file object opened by FabIO
+    @param pattern: bytes to look for
+    @param offset: where to start looking
+    @return: position of the pattern in the file, -1 if not found
+    """
+    overlap = len(pattern) - 1
+    while True:
+        block = pread(infile, SCAN_BLOCK, offset)
+        found = block.find(pattern)
+        if found >= 0:
+            return offset + found
+        if len(block) < SCAN_BLOCK:
+            return -1
+        offset += SCAN_BLOCK - overlap
+
+
+def _parse_mime_header(raw):
+    """
+    Parse the MIME header of a binary section
+
+    @param raw: bytes from the section boundary to the binary starter
+    @return: list of (key, value)
+    """
+    result = []
+    for line in raw.split(b"\n")[1:]:
+        if len(line) < 10:
+            break
+        try:
+            key, val = line.split(b':', 1)
+        except ValueError:
+            key, val = line.split(b'=', 1)
+        result.append((key.strip().decode("ASCII"), val.strip(b" \"\n\r\t").decode("ASCII")))
+    return result
+
+
+def _scan_section(infile, offset):
+    """
+    Locate the next binary section of a CBF file and describe it
+
+    @param infile: file object opened by FabIO
+    @param offset: where to start looking, i.e. after the previous section
+    @return: record of SECTION_DTYPE or None if there is no more section
+    """
+    boundary = CbfImage.BINARAY_SECTION
+    text_start = offset
+    while True:
+        marker = _find(infile, boundary, offset)
+        if marker < 0:
+            return None
+        offset = marker + len(boundary)
+        if pread(infile, 2, offset) != b"--":
+            break
+        # closing boundary of the previous section
+        text_start = offset = offset + 2
+    starter = _find(infile, CbfImage.STARTER, marker)
+    if starter < 0:
+        raise IOError("CBF binary section at %s without any data" % marker)
+    header = dict(_parse_mime_header(pread(infile, starter - marker, marker)))
+    if "X-Binary-Size" not in header:
+        raise IOError("CBF binary section at %s has no X-Binary-Size" % marker)
+    row = numpy.zeros(1, dtype=SECTION_DTYPE)[0]
+    row["text_start"] = text_start
+    row["text_size"] = marker - text_start
+    row["header_start"] = marker
+    row["header_size"] = starter + len(CbfImage.STARTER) - marker
+    row["start"] = starter + len(CbfImage.STARTER)
+    row["size"] = int(header["X-Binary-Size"])
+    row["dim1"] = int(header.get("X-Binary-Size-Fastest-Dimension", 0))
+    row["dim2"] = int(header.get("X-Binary-Size-Second-Dimension", 0))
+    row["dtype"] = DATA_TYPES.get(header.get("X-Binary-Element-Type"), "int32")
+    return row
+
+
+def index_binary_sections(infile):
+    """
+    Index all binary sections of a CBF file in a single pass: the CIF text
+    and the MIME header of each section are read, the compressed data are
+    skipped.
+
+    @param infile: file object opened by FabIO
+    @return: numpy array of SECTION_DTYPE, one row per frame
+    """
+    rows = []
+    offset = 0
+    while True:
+        row = _scan_section(infile, offset)
+        if row is None:
+            break
+        rows.append(row)
+        offset = row["start"] + row["size"]
+    index = numpy.array(rows, dtype=SECTION_DTYPE)
+    # shared by all images of the file
+    index.flags.writeable = False
+    return index
+
+
+def get_section_index(infile, filename=None):
+    """
+    Index of the binary sections of a file, taken from the cache when the
+    file did not change on disk since it was indexed
+
+    @param infile: file object opened by FabIO
+    @param filename: name of the file, None for streams (not cached)
+    @return: read-only numpy array of SECTION_DTYPE
+    """
+    key = None
+    if isinstance(filename, StringTypes) and os.path.isfile(filename):
+        stat = os.stat(filename)
+        mtime = getattr(stat, "st_mtime_ns", None) or stat.st_mtime
+        key = os.path.abspath(filename), mtime, stat.st_size
+        with _index_lock:
+            index = _index_cache.pop(key, None)
+            if index is not None:
+                _index_cache[key] = index
+                return index
+    index = index_binary_sections(infile)
+    if key is not None:
+        with _index_lock:
+            _index_cache[key] = index
+            while len(_index_cache) > INDEX_CACHE_SIZE:
+                _index_cache.popitem(last=False)
+    return index
+
+
 class CbfImage(FabioImage):
     """
     Read the Cif Binary File data format
@@ -84,6 +241,8 @@ class CbfImage(FabioImage):
 
     STARTER = b"\x0c\x1a\x04\xd5"
     PADDING = 512
+    # compressed files are uncompressed in memory for positional reads
+    _need_a_seek_to_read = True
     BINARAY_SECTION = b"--CIF-BINARY-FORMAT-SECTION--"
     CIF_BINARY_BLOCK_KEY = "_array_data.data"
 
@@ -98,86 +257,63 @@ class CbfImage(FabioImage):
         self.cif = CIF()
         self.cbs = None
         self.start_binary = None
+        self._file = None  # read-only handle, kept open for multi-image files
+        self._index = None  # binary sections of the file, shared between frames
+        self._section = None  # binary section of the current frame
         if fname is not None:  # load the file)
             self.read(fname)
 
     @staticmethod
     def checkData(data=None):
-        if data is None:
-            return None
-        elif numpy.issubdtype(data.dtype, int):
-            return data
-        else:
-            return data.astype(int)
+        """
+        Data as written in the file, called by write
+
+        @param data: array like
+        @return: the data as the narrowest integer type able to hold them
+        """
+        return convert_data_integer(data, WRITER_DTYPES["cbfimage"])
 
     def _readheader(self, inStream):
         """
         Read in a header in some CBF format from a string representing binary stuff
 
+        Only the first binary section is looked for.
+
         @param inStream: file containing the Cif Binary part.
         @type inStream: opened file.
         """
-        self._read_cif_header(inStream)
-        self._read_binary_section_header(inStream)
+        row = _scan_section(inStream, 0)
+        if row is None:
+            raise IOError("No binary section in CBF file %s" % self.filename)
+        self._read_section_header(inStream, row)
 
-    def _read_cif_header(self, inStream):
-        """Read in a ASCII CIF header
+    def _read_section_header(self, inStream, row):
+        """
+        Read the CIF header preceding a binary section and the MIME header of
+        the section, defining the header and the layout of the frame
 
         @param inStream: file containing the Cif Binary part.
-        @type inStream: opened file.
+        @param row: description of the binary section (record of SECTION_DTYPE)
         """
-        blocks = []
-        last = ""
-        header_data = None
-        for i in range(16):
-            # up to 512*16 = 8k headers
-            ablock = inStream.read(self.PADDING)
-            blocks.append(ablock)
-            if last:
-                extra = len(self.BINARAY_SECTION)
-                extblock = last[-extra:] + ablock
-            else:
-                extra = 0
-                extblock = ablock
-            res = extblock.find(self.BINARAY_SECTION)
-            if res >= 0:
-                start_cbs = i * self.PADDING - extra + res
-                all_blocks = b"".join(blocks)
-                header_data = all_blocks[:start_cbs] + b"CIF Binary Section\n;\n"
-                self.cbs = all_blocks[start_cbs:]
-                break
-            last = ablock
-        else:
-            header_data = b"".join(blocks) + inStream.read()
-        self.cif._parseCIF(header_data)
+        self._section = row
+        text = pread(inStream, int(row["text_size"]), int(row["text_start"]))
+        if row["text_start"] > 0:
+            # the text follows the end of the text field of the previous section
+            text = text.lstrip()
+            if text.startswith(b";"):
+                text = text[1:]
+        self.cif = CIF()
+        self.cif._parseCIF(text + b"CIF Binary Section\n;\n")
 
 #        backport contents of the CIF data to the headers
         for key, value in self.cif.items():
-            if key == self.CIF_BINARY_BLOCK_KEY:
-                if self.cbs is None:
-                    self.cbs = value
-            else:
-                self.header[key] = (self.cif[key].strip(" \"\n\r\t"))
+            if key != self.CIF_BINARY_BLOCK_KEY:
+                self.header[key] = (value.strip(" \"\n\r\t"))
 
-    def _read_binary_section_header(self, inStream):
-        """
-        Read the binary section header
-        """
-        self.start_binary = self.cbs.find(self.STARTER)
-        while self.start_binary < 0:
-            self.cbs += inStream.read(self.PADDING)
-            self.start_binary = self.cbs.find(self.STARTER)
-        bin_headers = self.cbs[:self.start_binary]
-        lines = bin_headers.split(b"\n")
-        for line in lines[1:]:
-            if len(line) < 10:
-                break
-            try:
-                key, val = line.split(b':', 1)
-            except ValueError:
-                key, val = line.split(b'=', 1)
-            key = key.strip().decode("ASCII")
-            self.header[key] = val.strip(b" \"\n\r\t").decode("ASCII")
+        self.cbs = pread(inStream, int(row["header_size"]), int(row["header_start"]))
+        self.start_binary = len(self.cbs) - len(self.STARTER)
+        for key, value in _parse_mime_header(self.cbs[:self.start_binary]):
+            self.header[key] = value
         missing = []
         for item in MINIMUM_KEYS:
             if item not in self.header:
@@ -185,51 +321,104 @@ class CbfImage(FabioImage):
         if missing:
             logger.info("Mandatory keys missing in CBF file: " + ", ".join(missing))
         # Compute image size
-        try:
-            self.dim1 = int(self.header['X-Binary-Size-Fastest-Dimension'])
-            self.dim2 = int(self.header['X-Binary-Size-Second-Dimension'])
-        except:
-            raise IOError("CBF file %s is corrupt, no dimensions in it" % inStream.name)
-        try:
-            self.bytecode = DATA_TYPES[self.header['X-Binary-Element-Type']]
-        except KeyError:
-            self.bytecode = "int32"
+        if "X-Binary-Size-Fastest-Dimension" not in self.header or "X-Binary-Size-Second-Dimension" not in self.header:
+            raise IOError("CBF file %s is corrupt, no dimensions in it" % self.filename)
+        self.dim1 = int(row["dim1"])
+        self.dim2 = int(row["dim2"])
+        if "X-Binary-Element-Type" not in self.header:
             logger.warning("Defaulting type to int32")
+        self.bytecode = row["dtype"].decode("ASCII")
         self.bpp = numpy.dtype(self.bytecode).itemsize
 
     def read_raw_data(self, infile):
         """Read and return the raw data chunk
-        
-        @param infile: opened file are correct position 
+
+        @param infile: opened file, the header being already read
         @return: raw compressed stream
         """
-        if self.CIF_BINARY_BLOCK_KEY not in self.cif:
-            err = "Not key %s in CIF, no CBF image in %s" % (self.CIF_BINARY_BLOCK_KEY, self.filename)
+        if self._section is None:
+            err = "No binary section, no CBF image in %s" % self.filename
             logger.error(err)
-            for kv in self.cif.items():
-                print("%s: %s" % kv)
             raise RuntimeError(err)
-        if self.cif[self.CIF_BINARY_BLOCK_KEY] == "CIF Binary Section":
-            self.cbs += infile.read(len(self.STARTER) + int(self.header["X-Binary-Size"]) - len(self.cbs) + self.start_binary)
-        else:
-            if len(self.cif[self.CIF_BINARY_BLOCK_KEY]) > int(self.header["X-Binary-Size"]) + self.start_binary + len(self.STARTER):
-                self.cbs = self.cif[self.CIF_BINARY_BLOCK_KEY][:int(self.header["X-Binary-Size"]) + self.start_binary + len(self.STARTER)]
-            else:
-                self.cbs = self.cif[self.CIF_BINARY_BLOCK_KEY]
-        return self.cbs[self.start_binary + len(self.STARTER):]
+        raw = pread(infile, int(self._section["size"]), int(self._section["start"]))
+        self.cbs += raw
+        return raw
+
+    def _get_file(self):
+        """
+        Provides the handle on the file, re-opening it if needed
+
+        @return: file object open in read mode
+        """
+        if self._file is None or self._file.closed:
+            self._file = self._open(self.filename, "rb")
+        return self._file
+
+    def close(self):
+        """
+        Close the file kept open to read the other frames of a multi-image
+        file. It is re-opened if another frame is requested.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
 
     def read(self, fname, frame=None, check_MD5=True, only_raw=False):
         """Read in header into self.header and the data   into self.data
-        
+
+        All binary sections of the file are indexed at once (the index is
+        cached while the file is unchanged), only the requested frame is
+        decompressed.
+
         @param: fname: name of the file
+        @param frame: number of the frame (binary section) to read
         @return: fabioimage instance
         """
         self.filename = fname
         self.header = self.check_header()
         self.resetvals()
 
-        infile = self._open(fname, "rb")
-        self._readheader(infile)
+        self.close()
+        self._file = infile = self._open(fname, "rb")
+        try:
+            self._index = get_section_index(infile, self.filename)
+        except Exception:
+            self.close()
+            raise
+        self.nframes = len(self._index)
+        if self.nframes == 0:
+            self.close()
+            err = "No binary section, no CBF image in %s" % self.filename
+            logger.error(err)
+            raise RuntimeError(err)
+        if frame is None:
+            frame = 0
+        elif not 0 <= frame < self.nframes:
+            logger.error("Reading file %s You requested frame %s but only %s frames are available", fname, frame, self.nframes)
+            frame = 0
+        try:
+            return self._read_frame(frame, check_MD5, only_raw)
+        finally:
+            if self.nframes == 1:
+                # nothing else to read from a single image file
+                self.close()
+
+    def _read_frame(self, num, check_MD5=True, only_raw=False):
+        """
+        Read the header and decompress the data of one frame
+
+        @param num: frame number, i.e. index of the binary section
+        @return: fabioimage instance (or the raw compressed stream if only_raw)
+        """
+        infile = self._get_file()
+        self.currentframe = num
+        self._read_section_header(infile, self._index[num])
 
         logger.debug("CBS type %s len %s" % (type(self.cbs), len(self.cbs)))
 
@@ -253,6 +442,39 @@ class CbfImage(FabioImage):
         self.pilimage = None
         return self
 
+    def getframe(self, num):
+        """
+        Returns the frame numbered num as a new CbfImage: the binary sections
+        of a multi-image file or the files of a series
+        """
+        if self.nframes == 1:
+            return FabioImage.getframe(self, num)
+        if not 0 <= num < self.nframes:
+            raise IOError("getframe %s out of range [%s %s[" % (num, 0, self.nframes))
+        frame = self.__class__()
+        frame.filename = self.filename
+        frame._index = self._index
+        frame.nframes = self.nframes
+        # the handle is only lent: the frame is fully read, the file stays
+        # open (until close) for the next frames
+        frame._file = self._get_file()
+        try:
+            return frame._read_frame(num)
+        finally:
+            frame._file = None
+
+    def next(self):
+        """ returns the next frame in the file or the series as a fabioimage """
+        if self.nframes > 1:
+            return self.getframe(self.currentframe + 1)
+        return FabioImage.next(self)
+
+    def previous(self):
+        """ returns the previous frame in the file or the series as a fabioimage """
+        if self.nframes > 1:
+            return self.getframe(self.currentframe - 1)
+        return FabioImage.previous(self)
+
     def _readbinary_byte_offset(self, raw_bytes):
         """
         Read in a binary part of an x-CBF_BYTE_OFFSET compressed image
@@ -276,29 +498,32 @@ class CbfImage(FabioImage):
             self.dim2, self.dim1 = self.data.shape
         else:
             raise RuntimeError("CBF image contains no data")
-        binary_blob = compByteOffset(self.data)
+        data = self.checkData(self.data)
         dtype = "Unknown"
         for key, value in DATA_TYPES.items():
-            if value == self.data.dtype:
+            if value == data.dtype:
                 dtype = key
+        # Size and MD5 are known once the data are compressed: their fields
+        # are written with spaces, then patched in place.
+        worst = (7 if data.dtype == numpy.int32 else 15) * data.size
+        size_field = b" " * len(str(worst))
+        md5_field = b" " * 24
         binary_block = [
                         b"--CIF-BINARY-FORMAT-SECTION--",
                         b"Content-Type: application/octet-stream;",
                         b'     conversions="x-CBF_BYTE_OFFSET"',
                         b'Content-Transfer-Encoding: BINARY',
-                        numpy.string_("X-Binary-Size: %d" % (len(binary_blob))),
+                        b"X-Binary-Size: " + size_field,
                         b"X-Binary-ID: 1",
                         numpy.string_('X-Binary-Element-Type: "%s"' % (dtype)),
                         b"X-Binary-Element-Byte-Order: LITTLE_ENDIAN",
-                        b"Content-MD5: " + md5sum(binary_blob),
+                        b"Content-MD5: " + md5_field,
                         numpy.string_("X-Binary-Number-of-Elements: %d" % (self.dim1 * self.dim2)),
                         numpy.string_("X-Binary-Size-Fastest-Dimension: %d" % self.dim1),
                         numpy.string_("X-Binary-Size-Second-Dimension: %d" % self.dim2),
                         b"X-Binary-Size-Padding: 1",
                         b"",
-                        self.STARTER + binary_blob,
-                        b"",
-                        b"--CIF-BINARY-FORMAT-SECTION----"
+                        self.STARTER
                        ]
 
         if "_array_data.header_contents" not in self.header:
@@ -323,12 +548,25 @@ class CbfImage(FabioImage):
         if len(nonCifHeaders) > 0:
             self.cif["_array_data.header_contents"] = "\r\n".join(["# %s" % i for i in nonCifHeaders])
 
-        self.cbf = b"\r\n".join(binary_block)
-        block = b"\r\n".join([b"", self.CIF_BINARY_BLOCK_KEY.encode("ASCII"), b";", self.cbf, b";"])
+        block = b"\r\n".join([b"", self.CIF_BINARY_BLOCK_KEY.encode("ASCII"), b";"] + binary_block)
         self.cif.pop(self.CIF_BINARY_BLOCK_KEY, None)
         with open(fname, "wb") as out_file:
             out_file.write(self.cif.tostring(fname, "\r\n").encode("ASCII"))
+            start = out_file.tell()
             out_file.write(block)
+            size, md5 = compByteOffset_stream(data, out_file, BYTE_OFFSET_PARALLEL_BLOCK, workers=None)
+            out_file.write(b"\r\n\r\n--CIF-BINARY-FORMAT-SECTION----\r\n;")
+            out_file.seek(start + block.index(b"X-Binary-Size: ") + 15)
+            out_file.write(numpy.string_("%d" % size))
+            out_file.seek(start + block.index(b"Content-MD5: ") + 13)
+            out_file.write(md5)
+
+
+# regular expressions used by the python CIF tokenizer
+_BLANK = re.compile(b"[ \t\r\n]")
+_NOT_BLANK = re.compile(b"[^ \t\r\n]")
+_EOL = re.compile(b"[\r\n]")
+_END_TEXT_FIELD = re.compile(b"[\r\n];")
 
 
 ################################################################################
@@ -353,6 +591,7 @@ class CIF(dict):
     LOOP = numpy.string_("loop_")
     UNDERSCORE = ord("_") if six.PY3 else b"_"
     QUESTIONMARK = ord("?") if six.PY3 else b"?"
+    UNKNOWN = numpy.string_("?")
     STOP = numpy.string_("stop_")
     GLOBAL = numpy.string_("global_")
     DATA = numpy.string_("data_")
@@ -443,20 +682,22 @@ class CIF(dict):
         if "read" not in dir(instream):
             raise RuntimeError("CIF._readCIF(instream): I expected instream to be an opened file,\
              here I got %s type %s" % (instream, type(instream)))
-        out_bytes = numpy.string_("")
+        lines = []
+        linesep = numpy.string_(os.linesep)
         for sLine in instream:
             nline = numpy.string_(sLine)
             pos = nline.find(cls.HASH)
             if pos >= 0:
                 if cls.isAscii(nline):
-                    out_bytes += nline[:pos] + numpy.string_(os.linesep)
+                    lines.append(nline[:pos])
+                    lines.append(linesep)
                 if pos > 80:
                     logger.warning("This line is too long and could cause problems in PreQuest: %s", sLine)
             else:
-                out_bytes += nline
+                lines.append(nline)
                 if len(sLine.strip()) > 80:
                     logger.warning("This line is too long and could cause problems in PreQuest: %s", sLine)
-        return out_bytes
+        return numpy.string_(b"".join(lines))
 
     def _parseCIF(self, bytes_text):
         """
@@ -470,31 +711,31 @@ class CIF(dict):
         @return: Nothing, the data are incorporated at the CIF object dictionary
         @rtype: None
         """
-        loopidx = []
-        looplen = []
         loop = []
-        fields = split_tokens(bytes_text)
+        if split_tokens is None:
+            tokens = self._splitCIF(bytes_text)
+        else:
+            tokens = split_tokens(bytes_text)
 
-        logger.debug("After split got %s fields of len: %s", len(fields), [len(i) for i in fields])
+        logger.debug("After split got %s fields", len(tokens))
 
-        for idx, field in enumerate(fields):
-            if field.lower() == self.LOOP:
-                loopidx.append(idx)
-        if loopidx:
-            for i in loopidx:
-                loopone, length, keys = CIF._analyseOneLoop(fields, i)
+        # one pass: loops are analysed and their tokens skipped
+        fields = []
+        idx = 0
+        while idx < len(tokens):
+            if tokens[idx].lower() == self.LOOP:
+                loopone, length, keys = CIF._analyseOneLoop(tokens, idx)
                 loop.append([keys, loopone])
-                looplen.append(length)
-
-            for i in range(len(loopidx) - 1, -1, -1):
-                f1 = fields[:loopidx[i]] + fields[loopidx[i] + looplen[i]:]
-                fields = f1
-
+                idx += length
+            else:
+                fields.append(tokens[idx])
+                idx += 1
+        if loop:
             self[self.LOOP.decode("ASCII")] = loop
 
         for i in range(len(fields) - 1):
             if len(fields[i + 1]) == 0:
-                fields[i + 1] = self.QUESTIONMARK
+                fields[i + 1] = self.UNKNOWN
             if fields[i][0] == self.UNDERSCORE and fields[i + 1][0] != self.UNDERSCORE:
                 try:
                     data = fields[i + 1].decode("ASCII")
@@ -508,83 +749,69 @@ class CIF(dict):
         """
         Separate the text in fields as defined in the CIF
 
+        Python version of fabio.ext._cif.split_tokens, giving the same
+        fields: the text is scanned once, by index, and only the fields
+        themselves are copied.
+
         @param bytes_text: the content of the CIF - file
         @type bytes_text:  8-bit string (str in python2 or bytes in python3)
         @return: list of all the fields of the CIF
         @rtype: list
         """
+        text = bytes(bytes_text)
+        size = len(text)
+        eol = b"\r\n"
+        blank = b" \t\r\n"
+        marker = bytes(cls.BINARY_MARKER)
         fields = []
+        pos = 0
         while True:
-            if len(bytes_text) == 0:
+            match = _NOT_BLANK.search(text, pos)
+            if match is None:
                 break
-            elif bytes_text[0] == cls.SINGLE_QUOTE:
-                idx = 0
-                finished = False
-                while not finished:
-                    idx += 1 + bytes_text[idx + 1:].find(cls.SINGLE_QUOTE)
-                    if idx >= len(bytes_text) - 1:
-                        fields.append(bytes_text[1:-1].strip())
-                        bytes_text = numpy.string_("")
-                        finished = True
+            pos = match.start()
+            char = text[pos:pos + 1]
+            line_start = pos == 0 or text[pos - 1:pos] in eol
+            if line_start and char == b"#":
+                match = _EOL.search(text, pos)
+                if match is None:
+                    break
+                pos = match.start()
+            elif line_start and char == b";":
+                # text field, up to the next semicolon starting a line
+                start = search = pos + 1
+                while True:
+                    match = _END_TEXT_FIELD.search(text, search)
+                    end = size if match is None else match.start() + 1
+                    binary = text.find(marker, search, end)
+                    if binary < 0:
                         break
-
-                    if bytes_text[idx + 1] in cls.BLANK:
-                        fields.append(bytes_text[1:idx].strip())
-                        tmp_text = bytes_text[idx + 1:]
-                        bytes_text = tmp_text.strip()
-                        finished = True
-
-            elif bytes_text[0] == cls.DOUBLE_QUOTE:
-                idx = 0
-                finished = False
-                while not finished:
-                    idx += 1 + bytes_text[idx + 1:].find(cls.DOUBLE_QUOTE)
-                    if idx >= len(bytes_text) - 1:
-                        fields.append(bytes_text[1:-1].strip())
-                        bytes_text = numpy.string_("")
-                        finished = True
+                    # the binary section may contain anything
+                    after = text.find(marker, binary + len(marker))
+                    if after < 0:
+                        end = size
                         break
-
-                    if bytes_text[idx + 1] in cls.BLANK:
-                        fields.append(bytes_text[1:idx].strip())
-                        tmp_text = bytes_text[idx + 1:]
-                        bytes_text = tmp_text.strip()
-                        finished = True
-
-            elif bytes_text[0] == cls.SEMICOLUMN:
-                if bytes_text[1:].strip().find(cls.BINARY_MARKER) == 0:
-                    idx = bytes_text[32:].find(cls.BINARY_MARKER)
-                    if idx == -1:
-                        idx = 0
-                    else:
-                        idx += 32 + len(cls.BINARY_MARKER)
-                else:
-                    idx = 0
-                finished = False
-                while not finished:
-                    idx += 1 + bytes_text[idx + 1:].find(cls.SEMICOLUMN)
-                    if bytes_text[idx - 1] in cls.EOL:
-                        fields.append(bytes_text[1:idx - 1].strip())
-                        tmp_text = bytes_text[idx + 1:]
-                        bytes_text = tmp_text.strip()
-                        finished = True
+                    search = after + len(marker)
+                fields.append(text[start:end].strip())
+                pos = end + 1
+            elif char in (b"'", b'"') and (pos == 0 or text[pos - 1:pos] in blank):
+                # quoted field, closed by a quote followed by a blank
+                search = pos + 1
+                while True:
+                    end = text.find(char, search)
+                    if end < 0:
+                        end = size
+                        break
+                    if end + 1 >= size or text[end + 1:end + 2] in blank:
+                        break
+                    search = end + 1
+                fields.append(text[pos + 1:end].strip())
+                pos = end + 1
             else:
-                res = bytes_text.split(None, 1)
-                if len(res) == 2:
-                    first, second = bytes_text.split(None, 1)
-                    if cls.isAscii(first):
-                        fields.append(first)
-                        bytes_text = second.strip()
-                        continue
-                start_binary = bytes_text.find(cls.BINARY_MARKER)
-                if start_binary > 0:
-                    end_binary = bytes_text[start_binary + 1:].find(cls.BINARY_MARKER) + start_binary + 1 + len(cls.BINARY_MARKER)
-                    fields.append(bytes_text[:end_binary])
-                    bytes_text = bytes_text[end_binary:].strip()
-                else:
-                    fields.append(bytes_text)
-                    bytes_text = numpy.string_("")
-                    break
+                match = _BLANK.search(text, pos)
+                end = size if match is None else match.start()
+                fields.append(text[pos:end])
+                pos = end
         return fields
 
     @classmethod
@@ -601,26 +828,19 @@ class CIF(dict):
         loop = []
         keys = []
         i = start_idx + 1
-        finished = False
-        while not finished:
-            if fields[i][0] == cls.UNDERSCORE:
-                keys.append(fields[i])
-                i += 1
-            else:
-                finished = True
-        data = []
-        while True:
-            if i >= len(fields):
-                break
-            elif len(fields[i]) == 0:
+        while i < len(fields) and len(fields[i]) and fields[i][0] == cls.UNDERSCORE:
+            keys.append(fields[i])
+            i += 1
+        start = i
+        while i < len(fields):
+            if len(fields[i]) == 0:
                 break
             elif fields[i][0] == cls.UNDERSCORE:
                 break
-            elif fields[i] in (cls.LOOP, cls.STOP, cls.GLOBAL, cls.DATA, cls.SAVE):
+            elif fields[i].lower() in (cls.LOOP, cls.STOP, cls.GLOBAL, cls.DATA, cls.SAVE):
                 break
-            else:
-                data.append(fields[i])
-                i += 1
+            i += 1
+        data = fields[start:i]
         k = 0
 
         if len(data) < len(keys):
@@ -629,12 +849,12 @@ class CIF(dict):
                 if k < len(data):
                     element[j] = data[k]
                 else:
-                    element[j] = cls.QUESTIONMARK
+                    element[j] = cls.UNKNOWN
                 k += 1
             loop.append(element)
 
         else:
-            for i in range(len(data) / len(keys)):
+            for i in range(len(data) // len(keys)):
                 element = {}
                 for j in keys:
                     element[j] = data[k]
@@ -40,7 +40,7 @@ from __future__ import absolute_import, print_function, with_statement, division
 __author__ = "Jérôme Kieffer"
 __contact__ = "jerome.kieffer@esrf.eu"
 __license__ = "MIT"
-__date__ = "05/09/2016"
+__date__ = "18/10/2016"
 __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
 
 
@@ -50,6 +50,9 @@ import hashlib
 import struct
 import logging
 import subprocess
+import collections
+import multiprocessing
+from multiprocessing.pool import ThreadPool
 import numpy
 
 
@@ -269,6 +272,67 @@ def decByteOffset_cython(stream, size=None, dtype="int64"):
 decByteOffset = decByteOffset_cython
 
 
+# number of pixels compressed at once by the byte-offset compressors
+BYTE_OFFSET_BLOCK = 1 << 16
+
+# byte-offset escape sequences preceding 16, 32 and 64 bits differences
+_BYTE_OFFSET_ESCAPES = ((3, numpy.int16, b"\x80"),
+                        (7, numpy.int32, b"\x80\x00\x80"),
+                        (15, numpy.int64, b"\x80\x00\x80\x00\x00\x00\x80"))
+
+
+def _byte_offset_block_numpy(block, last):
+    """
+    Byte-offset compression of a block of pixels, vectorized with numpy
+
+    @param block: 1D array of int64
+    @param last: value of the pixel preceding the block
+    @return: bytes
+    """
+    delta = numpy.empty_like(block)
+    delta[0] = block[0] - last
+    numpy.subtract(block[1:], block[:-1], out=delta[1:])
+    absdelta = abs(delta)
+    nbytes = numpy.ones(delta.size, dtype=numpy.int64)
+    nbytes[absdelta > 127] = 3
+    nbytes[absdelta > 32767] = 7
+    nbytes[absdelta > 2147483647] = 15
+    position = numpy.cumsum(nbytes)
+    output = numpy.empty(position[-1], dtype=numpy.uint8)
+    position -= nbytes
+    small = nbytes == 1
+    output[position[small]] = delta[small].astype(numpy.int8).view(numpy.uint8)
+    for size, dtype, escape in _BYTE_OFFSET_ESCAPES:
+        where = numpy.nonzero(nbytes == size)[0]
+        if where.size == 0:
+            continue
+        start = position[where]
+        for i, value in enumerate(bytearray(escape)):
+            output[start + i] = value
+        values = delta[where].astype(numpy.dtype(dtype).newbyteorder("<")).view(numpy.uint8)
+        values.shape = where.size, -1
+        for i in range(values.shape[1]):
+            output[start + len(escape) + i] = values[:, i]
+    return output.tobytes()
+
+
+def compByteOffset_numpy_chunks(data, block=BYTE_OFFSET_BLOCK):
+    """
+    Compress a dataset with the byte_offset algorithm, block after block,
+    using numpy
+
+    @param data: ndarray of integers
+    @param block: number of pixels per block
+    @return: generator of bytes
+    """
+    flat = data.ravel()
+    last = 0
+    for start in range(0, flat.size, block):
+        chunk = numpy.ascontiguousarray(flat[start:start + block], numpy.int64)
+        yield _byte_offset_block_numpy(chunk, last)
+        last = chunk[-1]
+
+
 def compByteOffset_numpy(data):
     """
     Compress a dataset into a string using the byte_offet algorithm
@@ -279,45 +343,8 @@ def compByteOffset_numpy(data):
     test = numpy.array([0,1,2,127,0,1,2,128,0,1,2,32767,0,1,2,32768,0,1,2,2147483647,0,1,2,2147483648,0,1,2,128,129,130,32767,32768,128,129,130,32768,2147483647,2147483648])
 
     """
-    flat = numpy.ascontiguousarray(data.ravel(), numpy.int64)
-    delta = numpy.zeros_like(flat)
-    delta[0] = flat[0]
-    delta[1:] = flat[1:] - flat[:-1]
-    mask = abs(delta) > 127
-    exceptions = numpy.nonzero(mask)[0]
-    if numpy.little_endian:
-        byteswap = False
-    else:
-        byteswap = True
-    start = 0
-    binary_blob = b""
-    for stop in exceptions:
-        if stop - start > 0:
-            binary_blob += delta[start:stop].astype("int8").tostring()
-        exc = delta[stop]
-        absexc = abs(exc)
-        if absexc > 2147483647:  # 2**31-1
-            binary_blob += b"\x80\x00\x80\x00\x00\x00\x80"
-            if byteswap:
-                binary_blob += delta[stop:stop + 1].byteswap().tostring()
-            else:
-                binary_blob += delta[stop:stop + 1].tostring()
-        elif absexc > 32767:  # 2**15-1
-            binary_blob += b"\x80\x00\x80"
-            if byteswap:
-                binary_blob += delta[stop:stop + 1].astype(numpy.int32).byteswap().tostring()
-            else:
-                binary_blob += delta[stop:stop + 1].astype(numpy.int32).tostring()
-        else:  # >127
-            binary_blob += b"\x80"
-            if byteswap:
-                binary_blob += delta[stop:stop + 1].astype(numpy.int16).byteswap().tostring()
-            else:
-                binary_blob += delta[stop:stop + 1].astype(numpy.int16).tostring()
-        start = stop + 1
-    if start < delta.size:
-        binary_blob += delta[start:].astype(numpy.int8).tostring()
-    return binary_blob
+    return b"".join(compByteOffset_numpy_chunks(data))
+
 
 def compByteOffset_cython(data):
     """
@@ -336,14 +363,116 @@ def compByteOffset_cython(data):
         logger.error("Failed to import byte_offset cython module, falling back on numpy method: %s", error)
         return compByteOffset_numpy(data)
     else:
-        if "int32" in str(data.dtype):
-            return byte_offset.comp_cbf32(data).tostring()
-        else:
-            return byte_offset.comp_cbf(data).tostring()
+        return b"".join(byte_offset.comp_cbf_chunks(data))
 
 compByteOffset = compByteOffset_cython
 
 
+def compByteOffset_chunks(data, block=BYTE_OFFSET_BLOCK):
+    """
+    Compress a dataset with the byte_offset algorithm, in bounded memory
+
+    @param data: ndarray of integers (compressed as int32 if it is int32)
+    @param block: number of pixels per block
+    @return: generator of bytes, to be concatenated
+    """
+    try:
+        from .ext import byte_offset
+    except ImportError as error:
+        logger.error("Failed to import byte_offset cython module, falling back on numpy method: %s", error)
+        return compByteOffset_numpy_chunks(data, block)
+    else:
+        return byte_offset.comp_cbf_chunks(data, block)
+
+
+# number of pixels per task of the parallel byte-offset compressor
+BYTE_OFFSET_PARALLEL_BLOCK = 1 << 18
+
+
+def compByteOffset_parallel_chunks(data, workers=None, block=BYTE_OFFSET_PARALLEL_BLOCK):
+    """
+    Compress a dataset with the byte_offset algorithm, the blocks being
+    compressed in parallel by a pool of threads.
+
+    Each block starts from the value of the pixel preceding it, hence the
+    concatenation of the blocks is identical to the serial compression.
+    At most two blocks per thread are in flight.
+
+    @param data: ndarray of integers (compressed as int32 if it is int32)
+    @param workers: number of threads (default: number of CPU)
+    @param block: number of pixels per block
+    @return: generator of bytes, in order, to be concatenated
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    flat = data.ravel()
+    if workers <= 1 or flat.size <= block:
+        for chunk in compByteOffset_chunks(flat, block):
+            yield chunk
+        return
+    try:
+        from .ext import byte_offset
+    except ImportError as error:
+        logger.error("Failed to import byte_offset cython module, falling back on numpy method: %s", error)
+        encode = _byte_offset_block_numpy
+        dtype = numpy.int64
+    else:
+        encode = byte_offset.comp_cbf_block
+        dtype = numpy.int32 if "int32" in str(data.dtype) else numpy.int64
+
+    def process(start):
+        last = flat[start - 1:start].astype(dtype)[0] if start else 0
+        return encode(numpy.ascontiguousarray(flat[start:start + block], dtype), last)
+
+    pool = ThreadPool(workers)
+    try:
+        pending = collections.deque()
+        for start in range(0, flat.size, block):
+            pending.append(pool.apply_async(process, (start,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.close()
+        pool.join()
+
+
+def compByteOffset_parallel(data, workers=None):
+    """
+    Compress a dataset into a string using the byte_offet algorithm, with a
+    pool of threads
+
+    @param data: ndarray of integers
+    @param workers: number of threads (default: number of CPU)
+    @return: string/bytes with compressed data, identical to compByteOffset
+    """
+    return b"".join(compByteOffset_parallel_chunks(data, workers))
+
+
+def compByteOffset_stream(data, stream, block=BYTE_OFFSET_BLOCK, workers=1):
+    """
+    Compress a dataset with the byte_offset algorithm directly into a file,
+    computing the MD5 checksum in the same pass.
+
+    Memory used is a couple of blocks of pixels per thread, whatever the
+    size of the dataset.
+
+    @param data: ndarray of integers
+    @param stream: file-like object open for writing in binary mode
+    @param block: number of pixels per block
+    @param workers: number of compression threads (None: number of CPU)
+    @return: number of bytes written, base64 encoded MD5 of the compressed data
+    """
+    md5 = hashlib.md5()
+    size = 0
+    for chunk in compByteOffset_parallel_chunks(data, workers, block):
+        md5.update(chunk)
+        stream.write(chunk)
+        size += len(chunk)
+    return size, base64.b64encode(md5.digest())
+
+
 def decTY1(raw_8, raw_16=None, raw_32=None):
     """
     Modified byte offset decompressor used in Oxford Diffraction images
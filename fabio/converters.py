@@ -45,17 +45,75 @@ __copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
 
 
 import logging
+import numpy
 logger = logging.getLogger("converter")
 
+# Integer types, narrowest first
+INTEGER_TYPES = ("uint8", "int8", "uint16", "int16", "uint32", "int32", "uint64", "int64")
 
-def convert_data_integer(data):
+# Integer types each writer can store, narrowest first. OXD stores the
+# differences between pixels, computed in the type of the data.
+WRITER_DTYPES = {"cbfimage": INTEGER_TYPES,
+                 "mar345image": ("uint16", "int32"),
+                 "fit2dmaskimage": INTEGER_TYPES,
+                 "kcdimage": INTEGER_TYPES,
+                 "OXDimage": ("int32", "int64"),
+                 "pnmimage": ("uint8", "uint16"),
+                 }
+
+def integer_dtype(data, dtypes=INTEGER_TYPES):
+    """
+    Select the narrowest integer type able to hold the data
+
+    @param data: numpy array
+    @param dtypes: acceptable types, narrowest first
+    @return: numpy.dtype, the dtype of data if it is already acceptable
+    """
+    dtypes = [numpy.dtype(i) for i in dtypes]
+    if data.dtype in dtypes:
+        return data.dtype
+    if data.size == 0:
+        return dtypes[0]
+    # range computed once, as integers (floats are truncated by astype)
+    low, high = data.min(), data.max()
+    if data.dtype.kind == "f":
+        if not (numpy.isfinite(low) and numpy.isfinite(high)):
+            logger.warning("Non finite values converted to %s", dtypes[-1])
+            return dtypes[-1]
+        low, high = numpy.trunc(low), numpy.trunc(high)
+    elif data.dtype.kind == "b":
+        low, high = int(low), int(high)
+    for dtype in dtypes:
+        info = numpy.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return dtype
+    logger.warning("Values in [%s, %s] do not fit in %s", low, high, dtypes[-1])
+    return dtypes[-1]
+
+
+def convert_data_integer(data, dtypes=INTEGER_TYPES):
     """
-    convert data to integer
+    convert data to the narrowest integer type able to hold it
+
+    Data already of an acceptable type are returned as they are and
+    integers are reinterpreted without copy when only the sign differs.
+    Otherwise a converted copy is returned: data are never modified.
+
+    @param data: numpy array or None
+    @param dtypes: acceptable integer types, narrowest first
+    @return: numpy array of integers
     """
-    if data is not None:
-        return data.astype(int)
-    else:
+    if data is None:
         return data
+    data = numpy.asarray(data)
+    dtype = integer_dtype(data, dtypes)
+    if dtype == data.dtype:
+        return data
+    if dtype.itemsize == data.dtype.itemsize and data.flags.c_contiguous and \
+            data.dtype.kind in "iu" and dtype.byteorder == data.dtype.byteorder:
+        # values fit in both types: same bytes
+        return data.view(dtype)
+    return data.astype(dtype)
 
 
 CONVERSION_HEADER = {
@@ -64,22 +122,35 @@ CONVERSION_HEADER = {
 
 CONVERSION_DATA = {
                    ("edfimage", "edfimage"): lambda data: data,
-                   ("edfimage", "cbfimage"): convert_data_integer,
-                   ("edfimage", "mar345image"): convert_data_integer,
-                   ("edfimage", "fit2dmaskimage"): convert_data_integer,
-                   ("edfimage", "kcdimage"): convert_data_integer,
-                   ("edfimage", "OXDimage"): convert_data_integer,
-                   ("edfimage", "pnmimage"): convert_data_integer,
                   }
 
 
+def _lookup(table, inp, outp):
+    """
+    @return: the entry of the table for these formats, whatever the case, or None
+    """
+    key = (inp.lower(), outp.lower())
+    for (src, dst), value in table.items():
+        if (src.lower(), dst.lower()) == key:
+            return value
+
+
 def convert_data(inp, outp, data):
     """
     Return data converted to the output format ... over-simplistic implementation for the moment ...
+
+    Formats storing only integers get the narrowest type they support (see WRITER_DTYPES).
+
     @param inp,outp: input/output format like "cbfimage"
     @param data(ndarray): the actual dataset to be transformed
     """
-    return CONVERSION_DATA.get((inp, outp), lambda data: data)(data)
+    converter = _lookup(CONVERSION_DATA, inp, outp)
+    if converter is not None:
+        return converter(data)
+    for writer, dtypes in WRITER_DTYPES.items():
+        if writer.lower() == outp.lower():
+            return convert_data_integer(data, dtypes)
+    return data
 
 
 def convert_header(inp, outp, header):
@@ -88,4 +159,5 @@ def convert_header(inp, outp, header):
     @param inp,outp: input/output format like "cbfimage"
     @param header(dict):the actual set of headers to be transformed 
     """
-    return CONVERSION_HEADER.get((inp, outp), lambda header: header)(header)
+    converter = _lookup(CONVERSION_HEADER, inp, outp)
+    return header if converter is None else converter(header)
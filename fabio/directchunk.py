@@ -0,0 +1,317 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""Direct chunk reading of compressed HDF5 stacks of frames
+
+libhdf5 decompresses chunks one at a time, holding the lock of h5py. When
+each chunk contains whole frames, the compressed chunks can instead be read
+as raw bytes (read_direct_chunk) and decompressed by a pool of threads:
+zlib, lz4 and bitshuffle release the GIL while decompressing.
+
+Supported HDF5 filters:
+
+* deflate (gzip) and shuffle, always available
+* LZ4 (32004), needs the lz4 package
+* bitshuffle (32008), with or without LZ4, needs the bitshuffle package
+
+Datasets using other filters or another chunk layout are read via h5py.
+"""
+from __future__ import absolute_import, print_function, with_statement, division
+
+__author__ = "Jérôme Kieffer"
+__contact__ = "Jerome.Kieffer@ESRF.eu"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__date__ = "18/10/2016"
+__status__ = "development"
+
+import struct
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy
+logger = logging.getLogger("directchunk")
+
+try:
+    import zlib
+except ImportError:
+    zlib = None
+try:
+    import lz4.block as lz4_block
+except ImportError:
+    lz4_block = None
+try:
+    import bitshuffle
+except ImportError:
+    bitshuffle = None
+
+FILTER_DEFLATE = 1
+FILTER_SHUFFLE = 2
+FILTER_LZ4 = 32004
+FILTER_BITSHUFFLE = 32008
+
+
+def unshuffle(raw, itemsize):
+    """
+    Revert the HDF5 shuffle filter
+
+    @param raw: bytes of the shuffled chunk
+    @param itemsize: size of an element in bytes
+    @return: 1D array of uint8
+    """
+    buf = numpy.frombuffer(raw, dtype=numpy.uint8)
+    if itemsize <= 1:
+        return buf
+    count = buf.size // itemsize
+    planes = buf[:count * itemsize].reshape(itemsize, count)
+    res = numpy.empty(buf.size, dtype=numpy.uint8)
+    elements = res[:count * itemsize].reshape(count, itemsize)
+    # one byte plane at a time is much faster than a transposed copy
+    for i in range(itemsize):
+        elements[:, i] = planes[i]
+    res[count * itemsize:] = buf[count * itemsize:]
+    return res
+
+
+def shuffle(data):
+    """
+    Apply the HDF5 shuffle filter: group the bytes of the elements by rank
+
+    @param data: numpy array, in the byte order of the dataset
+    @return: bytes
+    """
+    buf = numpy.ascontiguousarray(data).view(numpy.uint8)
+    itemsize = data.dtype.itemsize
+    if itemsize <= 1:
+        return buf.tobytes()
+    elements = buf.reshape(-1, itemsize)
+    res = numpy.empty((itemsize, elements.shape[0]), dtype=numpy.uint8)
+    for i in range(itemsize):
+        res[i] = elements[:, i]
+    return res.tobytes()
+
+
+def decompress_lz4(raw):
+    """
+    Decompress a chunk written by the HDF5 LZ4 filter
+
+    The chunk starts with the total size (uint64, big endian) and the block
+    size (uint32, big endian) followed by blocks, each prefixed with its
+    compressed size (uint32, big endian).
+
+    @param raw: bytes of the compressed chunk
+    @return: bytes
+    """
+    total, block_size = struct.unpack(">QI", raw[:12])
+    pos = 12
+    blocks = []
+    remaining = total
+    while remaining > 0:
+        expected = min(block_size, remaining)
+        size = struct.unpack(">I", raw[pos:pos + 4])[0]
+        pos += 4
+        block = raw[pos:pos + size]
+        pos += size
+        if size == expected:
+            blocks.append(block)  # stored uncompressed
+        else:
+            blocks.append(lz4_block.decompress(block, uncompressed_size=expected))
+        remaining -= expected
+    return b"".join(blocks)
+
+
+def decompress_bitshuffle(raw, values, dtype, count):
+    """
+    Decompress a chunk written by the bitshuffle filter
+
+    With LZ4, the chunk starts with the total size (uint64, big endian) and
+    the block size in bytes (uint32, big endian).
+
+    @param raw: bytes of the compressed chunk
+    @param values: client data of the filter (version, version, element size,
+                   block size, compression)
+    @param dtype: data type of the elements
+    @param count: number of elements in the chunk
+    @return: 1D numpy array
+    """
+    if len(values) > 4 and values[4] == 2:
+        block_size = struct.unpack(">I", raw[8:12])[0] // dtype.itemsize
+        buf = numpy.frombuffer(raw, dtype=numpy.uint8, offset=12)
+        return bitshuffle.decompress_lz4(buf, (count,), dtype, block_size)
+    block_size = values[3] if len(values) > 3 else 0
+    return bitshuffle.bitunshuffle(numpy.frombuffer(raw, dtype=dtype, count=count), block_size)
+
+
+class DirectChunkReader(object):
+    """
+    Reads frames of a 3D HDF5 dataset chunked by whole frames, decompressing
+    the raw chunks in Python threads instead of inside libhdf5.
+    """
+    def __init__(self, dataset):
+        """
+        @param dataset: h5py.Dataset of dimension 3
+        """
+        self.dataset = dataset
+        self.dtype = dataset.dtype
+        self.shape = dataset.shape
+        self.chunks = dataset.chunks
+        self.filters = []
+        self.supported = self._check()
+
+    def _check(self):
+        """
+        @return: True if the dataset can be read chunk by chunk
+        """
+        dataset = self.dataset
+        if len(self.shape) != 3 or self.chunks is None or tuple(self.chunks[1:]) != tuple(self.shape[1:]):
+            return False
+        if "read_direct_chunk" not in dir(dataset.id) or self.dtype.kind not in "iuf":
+            return False
+        plist = dataset.id.get_create_plist()
+        for i in range(plist.get_nfilters()):
+            code, _, values, _ = plist.get_filter(i)
+            self.filters.append((code, tuple(values)))
+        for code, _ in self.filters:
+            if code == FILTER_DEFLATE and zlib is not None:
+                continue
+            if code == FILTER_SHUFFLE:
+                continue
+            if code == FILTER_LZ4 and lz4_block is not None:
+                continue
+            if code == FILTER_BITSHUFFLE and bitshuffle is not None:
+                continue
+            logger.debug("HDF5 filter %s not handled, reading %s via h5py", code, dataset.name)
+            return False
+        return True
+
+    def decode(self, raw, filter_mask=0):
+        """
+        Apply the filters of the dataset in reverse order on a raw chunk
+
+        @param raw: bytes as stored in the file
+        @param filter_mask: bit i set when filter i was not applied to this chunk
+        @return: numpy array with the content of the chunk
+        """
+        count = self.chunks[0] * self.chunks[1] * self.chunks[2]
+        for i in range(len(self.filters) - 1, -1, -1):
+            if filter_mask & (1 << i):
+                continue
+            code, values = self.filters[i]
+            if code == FILTER_DEFLATE:
+                raw = zlib.decompress(raw)
+            elif code == FILTER_SHUFFLE:
+                raw = unshuffle(raw, self.dtype.itemsize)
+            elif code == FILTER_LZ4:
+                raw = decompress_lz4(raw)
+            elif code == FILTER_BITSHUFFLE:
+                raw = decompress_bitshuffle(raw, values, self.dtype, count)
+        if isinstance(raw, numpy.ndarray):
+            return raw.view(self.dtype).reshape(self.chunks)
+        return numpy.frombuffer(raw, dtype=self.dtype, count=count).reshape(self.chunks)
+
+    def read_chunk(self, index):
+        """
+        Read and decompress one chunk
+
+        @param index: index of the chunk along the first axis
+        @return: numpy array of shape chunks (read only)
+        """
+        start = index * self.chunks[0]
+        try:
+            filter_mask, raw = self.dataset.id.read_direct_chunk((start, 0, 0))
+        except (KeyError, ValueError, RuntimeError, OSError):
+            # chunk never written: let libhdf5 apply the fill value
+            stop = min(start + self.chunks[0], self.shape[0])
+            data = numpy.zeros(self.chunks, dtype=self.dtype)
+            data[:stop - start] = self.dataset[start:stop]
+            return data
+        return self.decode(raw, filter_mask)
+
+    def read(self, start, stop, out, pool=None, step=1):
+        """
+        Read frames range(start, stop, step) of the dataset into out
+
+        @param start: first frame
+        @param stop: frame after the last one
+        @param out: array of shape (len(range(start, stop, step)), rows, columns)
+        @param pool: ThreadPool sharing the decompression, if any
+        @param step: distance between two frames read
+        @return: out
+        """
+        depth = self.chunks[0]
+        frames = {}
+        for position, frame in enumerate(range(start, stop, step)):
+            frames.setdefault(frame // depth, []).append((position, frame - (frame // depth) * depth))
+        indexes = sorted(frames)
+
+        def process(index):
+            chunk = self.read_chunk(index)
+            selection = frames[index]
+            first, last = selection[0], selection[-1]
+            if len(selection) == last[0] - first[0] + 1 and len(selection) == last[1] - first[1] + 1:
+                out[first[0]:last[0] + 1] = chunk[first[1]:last[1] + 1]
+            else:
+                for position, local in selection:
+                    out[position] = chunk[local]
+        if pool is None or len(indexes) == 1:
+            for index in indexes:
+                process(index)
+        else:
+            pool.map(process, indexes)
+        return out
+
+
+def read_frames(dataset, start, stop, out=None, workers=None):
+    """
+    Read a range of frames of a 3D dataset, using direct chunk reads and
+    parallel decompression when the layout allows it.
+
+    @param dataset: h5py.Dataset of dimension 3
+    @param start: first frame
+    @param stop: frame after the last one
+    @param out: array of shape (stop - start, rows, columns) to be filled
+    @param workers: number of decompression threads (default: number of CPU)
+    @return: 3D numpy array
+    """
+    if out is None:
+        out = numpy.empty((stop - start,) + tuple(dataset.shape[1:]), dtype=dataset.dtype.newbyteorder("="))
+    reader = DirectChunkReader(dataset)
+    if not reader.supported:
+        out[...] = dataset[start:stop]
+        return out
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    pool = ThreadPool(workers) if workers > 1 and stop - start > 1 else None
+    try:
+        reader.read(start, stop, out, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    return out
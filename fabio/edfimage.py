@@ -52,8 +52,13 @@ import logging
 logger = logging.getLogger("edfimage")
 import numpy
 from .fabioimage import FabioImage, OrderedDict
-from .fabioutils import isAscii, toAscii, nice_int
-from .compression import decBzip2, decGzip, decZlib
+from .fabioutils import isAscii, toAscii, nice_int, pread, read_array, is_plain_file
+from .compression import decBzip2, decGzip, decZlib, decByteOffset, compByteOffset_parallel
+try:
+    from .ext._edf import parse_header as _parse_header
+except ImportError as error:
+    logger.warning("Failed to import _edf cython module, falling back on the python header parser: %s", error)
+    _parse_header = None
 
 
 BLOCKSIZE = 512
@@ -118,31 +123,418 @@ DEFAULT_VALUES = {
                    }
 
 
+MAX_DIMS = 8  # maximum number of dimensions stored in the frame table
+
+# upper-case keys needed to describe the binary blob of a frame
+LAYOUT_KEYS = frozenset(["SIZE", "DATATYPE", "BYTEORDER", "COMPRESSION"] +
+                        ["DIM_%i" % i for i in range(1, MAX_DIMS + 2)])
+
+FRAME_TABLE_DTYPE = numpy.dtype([("start", numpy.int64),  # position of the binary blob, -1 if unknown
+                                 ("size", numpy.int64),  # size of the binary blob, -1 if unknown
+                                 ("dtype", "S8"),  # numpy type string of the data, empty if unknown
+                                 ("bpp", numpy.uint8),  # bytes per pixel, 0 if unknown
+                                 ("byteorder", "S1"),  # "<" or ">", empty if unknown
+                                 ("compression", "S32"),  # upper-case compression, empty if none
+                                 ("ndim", numpy.uint8),
+                                 ("dims", numpy.int64, (MAX_DIMS,)),
+                                 ("header_offset", numpy.int64),  # position in the raw header buffer, -1 if none
+                                 ("header_size", numpy.int64)])
+
+
+def parse_header_block(block, select=None):
+    """
+    Split the ascii header block of an EDF frame into a dictionary
+
+    Uses the compiled parser of fabio.ext._edf when available.
+
+    @param block: header block (without the curly brackets), bytes or ascii string
+    @param select: set of upper-case keys to retrieve, all keys if None
+    @return: 2-tuple with the OrderedDict of the header and the dict of upper-case keys
+    """
+    if _parse_header is not None:
+        return _parse_header(block, select)
+    return _parse_header_block(block, select)
+
+
+def _parse_header_block(block, select=None):
+    """
+    Python version of fabio.ext._edf.parse_header
+
+    @param block: header block (without the curly brackets), bytes or ascii string
+    @param select: set of upper-case keys to retrieve, all keys if None
+    @return: 2-tuple with the OrderedDict of the header and the dict of upper-case keys
+    """
+    if not isinstance(block, str):
+        block = bytes(block).decode("ASCII")
+    header = OrderedDict()
+    capsHeader = {}
+    for line in block.split(';'):
+        if '=' in line:
+            key, val = line.split('=', 1)
+            # Why would someone put null bytes in a header?
+            key = key.replace("\x00", " ").strip()
+            if select is not None and key.upper() not in select:
+                continue
+            header[key] = val.replace("\x00", " ").strip()
+            capsHeader[key.upper()] = key
+    return header, capsHeader
+
+
+def byte_order(value):
+    """
+    Convert the ByteOrder of an EDF header into a numpy byte order
+
+    @param value: value of the ByteOrder key, like "LowByteFirst"
+    @return: "<" for little endian, ">" for big endian, "" if not understood
+    """
+    if "Low" in value:
+        return "<"
+    if "High" in value:
+        return ">"
+    return ""
+
+
+def frame_layout(header, capsHeader, bytecode=None):
+    """
+    Calculate the layout of the binary blob described by an EDF header
+
+    @param header: dict with the header of the frame
+    @param capsHeader: dict with the upper-case keys of the header
+    @param bytecode: data type of the frame if already known
+    @return: 6-tuple with size of the blob, list of dims, bytecode, bytes per pixel,
+             byte order and compression
+    """
+    size = None
+    calcsize = 1
+    dims = []
+    if "SIZE" in capsHeader:
+        try:
+            size = nice_int(header[capsHeader["SIZE"]])
+        except ValueError:
+            logger.warning("Unable to convert to integer : %s %s " % (capsHeader["SIZE"], header[capsHeader["SIZE"]]))
+    if "DIM_1" in capsHeader:
+        try:
+            dim1 = nice_int(header[capsHeader['DIM_1']])
+        except ValueError:
+            logger.error("Unable to convert to integer Dim_1: %s %s" % (capsHeader["DIM_1"], header[capsHeader["DIM_1"]]))
+        else:
+            calcsize *= dim1
+            dims.append(dim1)
+    else:
+        logger.error("No Dim_1 in headers !!!")
+    if "DIM_2" in capsHeader:
+        try:
+            dim2 = nice_int(header[capsHeader['DIM_2']])
+        except ValueError:
+            logger.error("Unable to convert to integer Dim_3: %s %s" % (capsHeader["DIM_2"], header[capsHeader["DIM_2"]]))
+        else:
+            calcsize *= dim2
+            dims.append(dim2)
+    else:
+        logger.error("No Dim_2 in headers !!!")
+    iDim = 3
+    # JON: this appears to be for nD images, but we don't treat those
+    while iDim is not None:
+        strDim = "DIM_%i" % iDim
+        if strDim in capsHeader:
+            try:
+                dim3 = nice_int(header[capsHeader[strDim]])
+            except ValueError:
+                logger.error("Unable to convert to integer %s: %s %s",
+                             strDim, capsHeader[strDim], header[capsHeader[strDim]])
+                dim3 = None
+                iDim = None
+            else:
+                if dim3 > 1:
+                    # Otherwise treat dim3==1 as a 2D image
+                    calcsize *= dim3
+                    dims.append(dim3)
+                iDim += 1
+
+        else:
+            logger.debug("No Dim_3 -> it is a 2D image")
+            iDim = None
+    if bytecode is None:
+        if "DATATYPE" in capsHeader:
+            bytecode = DATA_TYPES[header[capsHeader['DATATYPE']]]
+        else:
+            bytecode = numpy.uint16
+            logger.warning("Defaulting type to uint16")
+    bpp = numpy.dtype(bytecode).itemsize
+    calcsize *= bpp
+    if (size is None):
+        size = calcsize
+    elif (size != calcsize):
+        if ("COMPRESSION" in capsHeader) and (header[capsHeader['COMPRESSION']].upper().startswith("NO")):
+            logger.info("Mismatch between the expected size %s and the calculated one %s" % (size, calcsize))
+            size = calcsize
+    byteorder = ""
+    if "BYTEORDER" in capsHeader:
+        byteorder = byte_order(header[capsHeader["BYTEORDER"]])
+    compression = None
+    if "COMPRESSION" in capsHeader:
+        compression = header[capsHeader["COMPRESSION"]].upper()
+    return size, dims, bytecode, bpp, byteorder, compression
+
+
+class FrameTable(object):
+    """
+    Columnar description of the frames of an EDF file
+
+    Each frame is a row of a numpy structured array (position, size, type and
+    shape of the binary blob) and the raw header blocks are concatenated in a
+    single buffer. Only the keys describing the blob are read when a frame is
+    added: headers are parsed into dictionaries when requested.
+    """
+    def __init__(self, capacity=16, fileobj=None):
+        """
+        @param capacity: initial number of rows allocated
+        @param fileobj: opened file object with locking capabilities
+        """
+        self.file = fileobj
+        self.rows = numpy.zeros(max(1, int(capacity)), dtype=FRAME_TABLE_DTYPE)
+        self.nrows = 0
+        self._raw_headers = bytearray()
+
+    def __len__(self):
+        return self.nrows
+
+    def new_row(self):
+        """
+        Allocate a new (empty) row in the table
+
+        @return: index of the row
+        """
+        if self.nrows == len(self.rows):
+            rows = numpy.zeros(2 * len(self.rows), dtype=FRAME_TABLE_DTYPE)
+            rows[:self.nrows] = self.rows
+            self.rows = rows
+        index = self.nrows
+        row = self.rows[index]
+        row["start"] = row["size"] = row["header_offset"] = -1
+        self.nrows += 1
+        return index
+
+    def add_header(self, block, start=None):
+        """
+        Register a new frame from its header block
+
+        @param block: header block (without the curly brackets), bytes or ascii string
+        @param start: position of the binary blob in the file
+        @return: index of the row describing the frame
+        """
+        index = self.new_row()
+        header, capsHeader = parse_header_block(block, LAYOUT_KEYS)
+        self.set_layout(index, *frame_layout(header, capsHeader))
+        if not isinstance(block, bytes):
+            block = block.encode("ASCII")
+        raw = block.rstrip()
+        self.rows["header_offset"][index] = len(self._raw_headers)
+        self.rows["header_size"][index] = len(raw)
+        self._raw_headers += raw
+        if start is not None:
+            self.rows["start"][index] = start
+        return index
+
+    def set_layout(self, index, size, dims, bytecode, bpp, byteorder="", compression=None):
+        """
+        Store the layout of the binary blob of a frame
+
+        @param index: row number
+        @param size: size of the binary blob
+        @param dims: list of dimensions (fastest first)
+        @param bytecode: data type of the frame
+        @param bpp: number of bytes per pixel
+        @param byteorder: "<" or ">", empty if unknown
+        @param compression: upper-case compression scheme, None if absent
+        """
+        self.rows["size"][index] = -1 if size is None else size
+        self.set_dims(index, dims)
+        self.set_bytecode(index, bytecode)
+        self.rows["bpp"][index] = bpp or 0
+        self.rows["byteorder"][index] = byteorder.encode("ASCII")
+        self.rows["compression"][index] = (compression or "").encode("ASCII")
+
+    def set_dims(self, index, dims):
+        if len(dims) > MAX_DIMS:
+            logger.warning("EDF frame with more than %s dimensions, ignoring the last ones: %s", MAX_DIMS, dims)
+            dims = dims[:MAX_DIMS]
+        self.rows["ndim"][index] = len(dims)
+        self.rows["dims"][index, :len(dims)] = dims
+
+    def get_dims(self, index):
+        return [int(i) for i in self.rows["dims"][index, :self.rows["ndim"][index]]]
+
+    def set_bytecode(self, index, bytecode):
+        if bytecode is None:
+            self.rows["dtype"][index] = b""
+        else:
+            self.rows["dtype"][index] = numpy.dtype(bytecode).str.encode("ASCII")
+
+    def get_bytecode(self, index):
+        dtype = self.rows["dtype"][index]
+        if dtype:
+            return numpy.dtype(dtype.decode("ASCII")).type
+
+    def get_byteorder(self, index):
+        return self.rows["byteorder"][index].decode("ASCII")
+
+    def get_compression(self, index):
+        compression = self.rows["compression"][index]
+        if compression:
+            return compression.decode("ASCII")
+
+    def parse_header(self, index, select=None):
+        """
+        Parse the raw header stored for a given frame
+
+        @param index: row number
+        @param select: set of upper-case keys to retrieve, all keys if None
+        @return: 2-tuple with the OrderedDict of the header and the dict of upper-case keys
+        """
+        offset = self.rows["header_offset"][index]
+        if offset < 0:
+            return OrderedDict(), {}
+        raw = self._raw_headers[offset: offset + self.rows["header_size"][index]]
+        return parse_header_block(bytes(raw), select)
+
+
 class Frame(object):
     """
     A class representing a single frame in an EDF file
+
+    A frame is a lightweight view over one row of a FrameTable. Frames read
+    from a file share the table of the file and parse their header lazily,
+    once: reading the data only needs the table.
     """
-    def __init__(self, data=None, header=None, number=None):
+    __slots__ = ["_table", "_index", "_header", "_capsHeader", "_data", "iFrame"]
 
-        self.header = EdfImage.check_header(header)
+    def __init__(self, data=None, header=None, number=None):
+        self._table = FrameTable(capacity=1)
+        self._index = self._table.new_row()
+        self._header = EdfImage.check_header(header)
 
-        self.capsHeader = {}
-        for key in self.header:
-            self.capsHeader[key.upper()] = key
+        self._capsHeader = {}
+        for key in self._header:
+            self._capsHeader[key.upper()] = key
         self._data = data
-        self.dims = []
-        self.dim1 = 0
-        self.dim2 = 0
-        self.start = None  # Position of start of raw data in file
-        self.size = None  # size of raw data in file
-        self.file = None  # opened file object with locking capabilities !!!
-        self.bpp = None
-        self._bytecode = None
         if (number is not None):
             self.iFrame = int(number)
         else:
             self.iFrame = 0
 
+    @classmethod
+    def from_table(cls, table, index, number=None):
+        """
+        Alternative constructor: view on a row of a FrameTable
+
+        @param table: FrameTable instance
+        @param index: row number in the table
+        @param number: frame number
+        @return: Frame instance
+        """
+        self = cls.__new__(cls)
+        self._table = table
+        self._index = index
+        self._header = None
+        self._capsHeader = None
+        self._data = None
+        self.iFrame = 0 if number is None else int(number)
+        return self
+
+    def _parse_raw_header(self):
+        self._header, self._capsHeader = self._table.parse_header(self._index)
+
+    def getHeader(self):
+        if self._header is None:
+            self._parse_raw_header()
+        return self._header
+
+    def setHeader(self, value):
+        self._header = value
+        if self._capsHeader is None:
+            self._capsHeader = {}
+
+    header = property(getHeader, setHeader)
+
+    def getCapsHeader(self):
+        if self._capsHeader is None:
+            if self._header is None:
+                self._parse_raw_header()
+            else:
+                self._capsHeader = dict((key.upper(), key) for key in self._header)
+        return self._capsHeader
+
+    def setCapsHeader(self, value):
+        self._capsHeader = value
+
+    capsHeader = property(getCapsHeader, setCapsHeader)
+
+    def getFile(self):
+        return self._table.file
+
+    def setFile(self, value):
+        self._table.file = value
+
+    file = property(getFile, setFile, doc="opened file object with locking capabilities !!!")
+
+    def getStart(self):
+        start = self._table.rows["start"][self._index]
+        return None if start < 0 else int(start)
+
+    def setStart(self, value):
+        self._table.rows["start"][self._index] = -1 if value is None else value
+
+    start = property(getStart, setStart, doc="Position of start of raw data in file")
+
+    def getSize(self):
+        size = self._table.rows["size"][self._index]
+        return None if size < 0 else int(size)
+
+    def setSize(self, value):
+        self._table.rows["size"][self._index] = -1 if value is None else value
+
+    size = property(getSize, setSize, doc="size of raw data in file")
+
+    def getDims(self):
+        return self._table.get_dims(self._index)
+
+    def setDims(self, value):
+        self._table.set_dims(self._index, value)
+
+    dims = property(getDims, setDims)
+
+    def _get_dim(self, axis):
+        if self._table.rows["ndim"][self._index] > axis:
+            return int(self._table.rows["dims"][self._index, axis])
+        return 0
+
+    def _set_dim(self, axis, value):
+        dims = self.dims
+        if len(dims) <= axis:
+            dims += [0] * (axis + 1 - len(dims))
+        dims[axis] = value
+        self.dims = dims
+
+    dim1 = property(lambda self: self._get_dim(0), lambda self, value: self._set_dim(0, value))
+    dim2 = property(lambda self: self._get_dim(1), lambda self, value: self._set_dim(1, value))
+
+    def getBpp(self):
+        return int(self._table.rows["bpp"][self._index]) or None
+
+    def setBpp(self, value):
+        self._table.rows["bpp"][self._index] = value or 0
+
+    bpp = property(getBpp, setBpp)
+
+    def _get_bytecode(self):
+        return self._table.get_bytecode(self._index)
+
+    def _set_bytecode(self, value):
+        self._table.set_bytecode(self._index, value)
+
+    _bytecode = property(_get_bytecode, _set_bytecode)
+
     def parseheader(self, block):
         """
         Parse the header in some EDF format from an already open file
@@ -152,101 +544,25 @@ class Frame(object):
         @return: size of the binary blob
         """
         # reset values ...
-        self.header = OrderedDict()
-        self.capsHeader = {}
-        self.size = None
-        calcsize = 1
-        self.dims = []
-
-        for line in block.split(';'):
-            if '=' in line:
-                key, val = line.split('=', 1)
-                # Why would someone put null bytes in a header?
-                key = key.replace("\x00", " ").strip()
-                self.header[key] = val.replace("\x00", " ").strip()
-                self.capsHeader[key.upper()] = key
-
-        # Compute image size
-        if "SIZE" in self.capsHeader:
-            try:
-                self.size = nice_int(self.header[self.capsHeader["SIZE"]])
-            except ValueError:
-                logger.warning("Unable to convert to integer : %s %s " % (self.capsHeader["SIZE"], self.header[self.capsHeader["SIZE"]]))
-        if "DIM_1" in self.capsHeader:
-            try:
-                dim1 = nice_int(self.header[self.capsHeader['DIM_1']])
-            except ValueError:
-                logger.error("Unable to convert to integer Dim_1: %s %s" % (self.capsHeader["DIM_1"], self.header[self.capsHeader["DIM_1"]]))
-            else:
-                calcsize *= dim1
-                self.dims.append(dim1)
-        else:
-            logger.error("No Dim_1 in headers !!!")
-        if "DIM_2" in self.capsHeader:
-            try:
-                dim2 = nice_int(self.header[self.capsHeader['DIM_2']])
-            except ValueError:
-                logger.error("Unable to convert to integer Dim_3: %s %s" % (self.capsHeader["DIM_2"], self.header[self.capsHeader["DIM_2"]]))
-            else:
-                calcsize *= dim2
-                self.dims.append(dim2)
-        else:
-            logger.error("No Dim_2 in headers !!!")
-        iDim = 3
-        # JON: this appears to be for nD images, but we don't treat those
-        while iDim is not None:
-            strDim = "DIM_%i" % iDim
-            if strDim in self.capsHeader:
-                try:
-                    dim3 = nice_int(self.header[self.capsHeader[strDim]])
-                except ValueError:
-                    logger.error("Unable to convert to integer %s: %s %s",
-                                 strDim, self.capsHeader[strDim], self.header[self.capsHeader[strDim]])
-                    dim3 = None
-                    iDim = None
-                else:
-                    if dim3 > 1:
-                        # Otherwise treat dim3==1 as a 2D image
-                        calcsize *= dim3
-                        self.dims.append(dim3)
-                    iDim += 1
-
-            else:
-                logger.debug("No Dim_3 -> it is a 2D image")
-                iDim = None
-        if self._bytecode is None:
-            if "DATATYPE" in self.capsHeader:
-                self._bytecode = DATA_TYPES[self.header[self.capsHeader['DATATYPE']]]
-            else:
-                self._bytecode = numpy.uint16
-                logger.warning("Defaulting type to uint16")
-        self.bpp = len(numpy.array(0, self._bytecode).tostring())
-        calcsize *= self.bpp
-        if (self.size is None):
-            self.size = calcsize
-        elif (self.size != calcsize):
-            if ("COMPRESSION" in self.capsHeader) and (self.header[self.capsHeader['COMPRESSION']].upper().startswith("NO")):
-                logger.info("Mismatch between the expected size %s and the calculated one %s" % (self.size, calcsize))
-                self.size = calcsize
-
-        for i, n in enumerate(self.dims):
-            setattr(self, "dim%i" % (i + 1), n)
-
+        self._header, self._capsHeader = parse_header_block(block)
+        self._table.set_layout(self._index, *frame_layout(self._header, self._capsHeader, self._bytecode))
         return self.size
 
     def swap_needed(self):
         """
         Decide if we need to byteswap
+
+        @return True if needed, False else and None if not understood
         """
-        if ('Low' in self.header[self.capsHeader['BYTEORDER']] and numpy.little_endian) or \
-           ('High' in self.header[self.capsHeader['BYTEORDER']] and not numpy.little_endian):
+        byteorder = self._table.get_byteorder(self._index)
+        if not byteorder and self._header is not None and "BYTEORDER" in self.capsHeader:
+            # frame built from a header, not read from a file
+            byteorder = byte_order(self._header[self.capsHeader["BYTEORDER"]])
+        if not byteorder:
+            return None
+        if byteorder == ("<" if numpy.little_endian else ">"):
             return False
-        if ('High' in self.header[self.capsHeader['BYTEORDER']] and numpy.little_endian) or \
-           ('Low' in self.header[self.capsHeader['BYTEORDER']] and not numpy.little_endian):
-            if self.bpp in [2, 4, 8]:
-                return True
-            else:
-                return False
+        return self.bpp in [2, 4, 8]
 
     def getData(self):
         """
@@ -267,44 +583,47 @@ class Frame(object):
                     self._bytecode = numpy.uint16
             dims = self.dims[:]
             dims.reverse()
-            with self.file.lock:
-                if self.file.closed:
-                    logger.error("file: %s from %s is closed. Cannot read data." % (self.file, self.file.filename))
-                    return
-                else:
-                    self.file.seek(self.start)
-                    fileData = self.file.read(self.size)
-
-            if ("COMPRESSION" in self.capsHeader):
-                compression = self.header[self.capsHeader["COMPRESSION"]].upper()
+            if self.file.closed:
+                logger.error("file: %s from %s is closed. Cannot read data." % (self.file, self.file.filename))
+                return
+            compression = self._table.get_compression(self._index)
+            if compression in (None, "NONE"):
+                # Raw data are read in place, with a positional read: no lock
                 uncompressed_size = self.bpp
                 for i in dims:
                     uncompressed_size *= i
-                if "OFFSET" in compression:
-                    try:
-                        import byte_offset  # IGNORE:F0401
-                    except ImportError as error:
-                        logger.error("Unimplemented compression scheme:  %s (%s)" % (compression, error))
-                    else:
-                        myData = byte_offset.analyseCython(fileData, size=uncompressed_size)
-                        rawData = myData.astype(self._bytecode).tostring()
-                        self.size = uncompressed_size
-                elif compression == "NONE":
-                    rawData = fileData
-                elif "GZIP" in compression:
-                    rawData = decGzip(fileData)
-                    self.size = uncompressed_size
-                elif "BZ" in compression:
-                    rawData = decBzip2(fileData)
-                    self.size = uncompressed_size
-                elif "Z" in compression:
-                    rawData = decZlib(fileData)
+                if self.size > uncompressed_size:
+                    logger.info("Data stream contains trailing junk : %s > expected %s bytes" % (self.size, uncompressed_size))
                     self.size = uncompressed_size
-                else:
-                    logger.warning("Unknown compression scheme %s" % compression)
-                    rawData = fileData
-
+                data = read_array(self.file, self.start, tuple(dims), self._bytecode)
+                if self.size < uncompressed_size:
+                    logger.error("Data stream is incomplete: %s < expected %s bytes" % (self.size, uncompressed_size))
+                    data.reshape(-1).view("uint8")[self.size:] = 0
+                if self.swap_needed():
+                    data.byteswap(True)
+                self._data = data
+                self._bytecode = data.dtype.type
+                return data
+            fileData = pread(self.file, self.size, self.start)
+
+            uncompressed_size = self.bpp
+            for i in dims:
+                uncompressed_size *= i
+            if "OFFSET" in compression:
+                myData = decByteOffset(fileData, size=uncompressed_size // self.bpp)
+                rawData = myData.astype(self._bytecode).tostring()
+                self.size = uncompressed_size
+            elif "GZIP" in compression:
+                rawData = decGzip(fileData)
+                self.size = uncompressed_size
+            elif "BZ" in compression:
+                rawData = decBzip2(fileData)
+                self.size = uncompressed_size
+            elif "Z" in compression:
+                rawData = decZlib(fileData)
+                self.size = uncompressed_size
             else:
+                logger.warning("Unknown compression scheme %s" % compression)
                 rawData = fileData
 
             expected = self.size
@@ -360,6 +679,18 @@ class Frame(object):
         header_keys = list(self.header.keys())
         capsHeader = self.capsHeader.copy()
 
+        binary = None
+        if "COMPRESSION" in capsHeader and "OFFSET" in str(header[capsHeader["COMPRESSION"]]).upper():
+            if data.dtype.kind in "iu":
+                # blocks compressed in parallel, identical to the serial compression
+                binary = compByteOffset_parallel(data)
+            else:
+                logger.warning("Byte-offset compression needs integers, writing %s data uncompressed", data.dtype)
+                header.pop(capsHeader["COMPRESSION"])
+                header_keys.remove(capsHeader["COMPRESSION"])
+        if binary is None:
+            binary = data.tostring()
+
         listHeader = ["{\n"]
 #        First of all clean up the headers:
         for i in capsHeader:
@@ -379,7 +710,7 @@ class Frame(object):
 
 #            Then update static headers freshly deleted
         header_keys.insert(0, "Size")
-        header["Size"] = len(data.tostring())
+        header["Size"] = len(binary)
         header_keys.insert(0, "HeaderID")
         header["HeaderID"] = "EH:%06d:000000:000000" % (self.iFrame + fit2dMode)
         header_keys.insert(0, "Image")
@@ -406,7 +737,7 @@ class Frame(object):
         header_keys.insert(0, "EDF_HeaderSize")
         header["EDF_HeaderSize"] = "%5s" % (approxHeaderSize)
         header_keys.insert(0, "EDF_BinarySize")
-        header["EDF_BinarySize"] = data.nbytes
+        header["EDF_BinarySize"] = len(binary)
         header_keys.insert(0, "EDF_DataBlockID")
         if "EDF_DataBlockID" not in header:
             header["EDF_DataBlockID"] = "%i.Image.Psd" % (self.iFrame + fit2dMode)
@@ -440,7 +771,7 @@ class Frame(object):
         else:
             headerSize = approxHeaderSize
         listHeader.append(" " * (headerSize - preciseSize) + "}\n")
-        return ("".join(listHeader)).encode("ASCII") + data.tostring()
+        return ("".join(listHeader)).encode("ASCII") + binary
 
 
 class EdfImage(FabioImage):
@@ -493,7 +824,7 @@ class EdfImage(FabioImage):
         Read in a header in some EDF format from an already open file
 
         @param infile: file object open in read mode
-        @return: string (or None if no header was found.
+        @return: bytes (or None if no header was found.)
         """
         MAX_HEADER_SIZE = BLOCKSIZE * 20
         block = infile.read(BLOCKSIZE)
@@ -515,11 +846,20 @@ class EdfImage(FabioImage):
                 if new_max_header_size > MAX_HEADER_SIZE:
                     logger.info("Redefining MAX_HEADER_SIZE to %s" % new_max_header_size)
                     MAX_HEADER_SIZE = new_max_header_size
-        while (b'}\r' not in block) and (b'}\n' not in block):
-            block = block + infile.read(BLOCKSIZE)
-            if len(block) > MAX_HEADER_SIZE:
-                logger.warning("Runaway header in EDF file MAX_HEADER_SIZE: %s \n%s" % (MAX_HEADER_SIZE, block))
-                return
+        if (b'}\r' not in block) and (b'}\n' not in block):
+            # long header: grow a buffer, only the new bytes are searched
+            buf = bytearray(block)
+            searched = 0
+            while (buf.find(b'}\r', searched) < 0) and (buf.find(b'}\n', searched) < 0):
+                searched = len(buf) - 1
+                buf += infile.read(BLOCKSIZE)
+                if len(buf) > MAX_HEADER_SIZE:
+                    logger.warning("Runaway header in EDF file MAX_HEADER_SIZE: %s \n%s" % (MAX_HEADER_SIZE, bytes(buf)))
+                    return
+                if len(buf) == searched + 1:
+                    logger.warning("Truncated header in EDF file %s" % infile.name)
+                    return
+            block = bytes(buf)
         start = block.find(b"{") + 1
         end = block.find(b"}")
 
@@ -533,7 +873,7 @@ class EdfImage(FabioImage):
             offset = None
         if offset is not None:
             infile.seek(offset, os.SEEK_CUR)
-        return block[start:end].decode("ASCII")
+        return block[start:end]
 
     def _readheader(self, infile):
         """
@@ -552,17 +892,16 @@ class EdfImage(FabioImage):
         elif "len" in attrs:
             stream_size = infile.len
 
+        table = FrameTable(fileobj=infile)
         while bContinue:
             block = self._readHeaderBlock(infile)
             if block is None:
                 bContinue = False
                 break
-            frame = Frame(number=self.nframes)
-            size = frame.parseheader(block)
-            frame.file = infile
-            frame.start = infile.tell()
-            frame.size = size
-            self._frames += [frame]
+            index = table.add_header(block, infile.tell())
+            frame = Frame.from_table(table, index, number=self.nframes)
+            size = frame.size
+            self._frames.append(frame)
             try:
                 infile.seek(size, os.SEEK_CUR)
             except Exception as error:
@@ -577,13 +916,16 @@ class EdfImage(FabioImage):
                 bContinue = False
                 break
 
-        for i, frame in enumerate(self._frames):
-            missing = []
-            for item in MINIMUM_KEYS:
-                if item not in frame.capsHeader:
-                    missing.append(item)
-            if len(missing) > 0:
-                logger.info("EDF file %s frame %i misses mandatory keys: %s " % (self.filename, i, " ".join(missing)))
+        if logger.isEnabledFor(logging.INFO):
+            minimum_keys = frozenset(MINIMUM_KEYS)
+            for i in range(len(table)):
+                capsHeader = table.parse_header(i, minimum_keys)[1]
+                missing = []
+                for item in MINIMUM_KEYS:
+                    if item not in capsHeader:
+                        missing.append(item)
+                if len(missing) > 0:
+                    logger.info("EDF file %s frame %i misses mandatory keys: %s " % (self.filename, i, " ".join(missing)))
         self.currentframe = 0
 
     def read(self, fname, frame=None):
@@ -615,12 +957,7 @@ class EdfImage(FabioImage):
         """
         if self.bpp == 1:
             return False
-        if ('Low' in self.header[self.capsHeader['BYTEORDER']] and numpy.little_endian) or \
-           ('High' in self.header[self.capsHeader['BYTEORDER']] and not numpy.little_endian):
-            return False
-        if ('High' in self.header[self.capsHeader['BYTEORDER']] and numpy.little_endian) or \
-           ('Low' in self.header[self.capsHeader['BYTEORDER']] and not numpy.little_endian):
-            return True
+        return self._frames[self.currentframe].swap_needed()
 
     def unpack(self):
         """
@@ -775,6 +1112,28 @@ class EdfImage(FabioImage):
             data.byteswap(True)
         return data[slice2]
 
+    def get_frame_location(self, num=None):
+        """
+        Position of the raw data of a frame in the EDF file
+
+        @param num: frame number, by default the current one
+        @return: 4-tuple (filename, offset, shape, dtype) or None for compressed frames
+        """
+        if num is None:
+            num = self.currentframe
+        frame = self._frames[num]
+        if frame.file is None or frame.start is None or len(frame.dims) != 2:
+            return None
+        filename = frame.file.name
+        if not is_plain_file(filename):
+            return None
+        if frame._table.get_compression(frame._index) not in (None, "NONE"):
+            return None
+        dtype = numpy.dtype(frame._bytecode)
+        if frame.swap_needed():
+            dtype = dtype.newbyteorder()
+        return filename, frame.start, tuple(frame.dims[::-1]), dtype
+
 ################################################################################
 # Properties definition for header, data, header_keys and capsHeader
 ################################################################################
@@ -51,7 +51,11 @@ __license__ = "MIT"
 __copyright__ = "ESRF"
 __date__ = "12/07/2016"
 
+import bisect
 import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy
 logger = logging.getLogger("numpyimage")
 
 try:
@@ -61,6 +65,8 @@ except ImportError:
 
 from .fabioimage import FabioImage
 from .fabioutils import NotGoodReader
+from .directchunk import DirectChunkReader
+from . import hdf5pool
 
 
 class EigerImage(FabioImage):
@@ -75,9 +81,26 @@ class EigerImage(FabioImage):
         if not h5py:
             raise RuntimeError("fabio.EigerImage cannot be used without h5py. Please install h5py and restart")
 
+        self._offsets = None
         FabioImage.__init__(self, data, header)
         self.dataset = [data]
         self.h5 = None
+        self._readers = None
+        self._links = None
+
+    def getNbFrames(self):
+        """
+        Getter for number of frames, from the offsets shared with the other
+        frames of the file once known
+        """
+        if self._offsets is not None:
+            return self._offsets[-1]
+        return self._nframes
+
+    def setNbFrames(self, value):
+        self._nframes = value
+
+    nframes = property(getNbFrames, setNbFrames, "property: number of frames in the file")
 
     def __repr__(self):
         if self.h5 is not None:
@@ -85,6 +108,21 @@ class EigerImage(FabioImage):
         else:
             return "%s object at %s" % (self.__class__.__name__, hex(id(self)))
 
+    def close(self):
+        """
+        Release the HDF5 file, shared with the other images of the same file
+        """
+        if self.h5 is not None:
+            hdf5pool.pool.release(self.h5)
+            self.h5 = None
+        self._readers = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
     def _readheader(self, infile):
         """
         Read and decode the header of an image:
@@ -101,14 +139,17 @@ class EigerImage(FabioImage):
         @param fname: name of the file
         """
 
+        self.close()
         self.resetvals()
         with self._open(fname) as infile:
             self._readheader(infile)
 
         self.dataset = None
+        links = []  # (group, name) of each dataset
         lstds = []
         # read the image data
-        self.h5 = h5py.File(fname, mode="r")
+        self.h5 = hdf5pool.pool.acquire(fname)
+        entry = None
         if "entry" in self.h5:
             entry = self.h5["entry"]
             if "data" in entry:
@@ -117,39 +158,98 @@ class EigerImage(FabioImage):
                     "Newer format /entry/data/data_1"
                     datasets = [i for i in data.keys() if i.startswith("data")]
                     datasets.sort()
-                    try:
-                        for i in datasets:
-                            lstds.append(data[i])
-                    except KeyError:
-                        pass
-
+                    links = [(data, i) for i in datasets]
                 else:
                     lstds = [data]
             else:
                 "elder format entry/data_01"
                 datasets = [i for i in entry.keys() if i.startswith("data")]
                 datasets.sort()
-                try:
-                    for i in datasets:
-                        lstds.append(entry[i])
-                except KeyError:
-                    pass
+                links = [(entry, i) for i in datasets]
 
+        if links:
+            # external links are resolved (i.e. data files opened) on access
+            lstds = []
+            for group, name in links:
+                if isinstance(group.get(name, getlink=True), h5py.ExternalLink):
+                    lstds.append(None)
+                else:
+                    try:
+                        lstds.append(group[name])
+                    except KeyError:
+                        break
+            links = links[:len(lstds)]
         if not lstds:
             raise NotGoodReader("HDF5 file does not contain an Eiger-like structure.")
 
         self.dataset = lstds
-        self.nframes = sum(i.shape[0] for i in lstds)
-        self._dim1 = self.dataset[0].shape[-1]
-        self._dim2 = self.dataset[0].shape[-2]
+        self._links = links or [None] * len(lstds)
+        self._readers = [None] * len(lstds)
+        self._offsets = None
+        self._offsets = self._frame_offsets()
+        first = self._get_dataset(0)[0]
+        self._dim1 = first.shape[-1]
+        self._dim2 = first.shape[-2]
 
         if frame is not None:
             return self.getframe(int(frame))
         else:
             self.currentframe = 0
-            self.data = self.dataset[0][self.currentframe, :, :]
+            self.data = first[self.currentframe, :, :]
             return self
 
+    def _frame_offsets(self):
+        """
+        Index of the first frame of each dataset, opening only the first and
+        the last data files.
+
+        The other data files are assumed to hold as many frames as the first
+        one: offsets are corrected when they are opened.
+
+        @return: list of offsets, followed by the total number of frames
+        """
+        unknown = [i for i, ds in enumerate(self.dataset) if ds is None]
+        per_file = None
+        if unknown:
+            # frames per data file, from the first one
+            per_file = self._resolve(unknown[0]).shape[0]
+            # the last one is usually shorter
+            self._resolve(unknown[-1])
+        offsets = [0]
+        for ds in self.dataset:
+            offsets.append(offsets[-1] + (per_file if ds is None else ds.shape[0]))
+        return offsets
+
+    def _resolve(self, index):
+        """
+        Open the dataset number index, following its external link if needed
+
+        @return: h5py.Dataset
+        """
+        ds = self.dataset[index]
+        if ds is None:
+            group, name = self._links[index]
+            ds = group[name]
+            self.dataset[index] = ds
+            offsets = self._offsets
+            if offsets is not None and offsets[index + 1] - offsets[index] != ds.shape[0]:
+                delta = ds.shape[0] - (offsets[index + 1] - offsets[index])
+                logger.warning("%s holds %s frames, %s expected", name, ds.shape[0],
+                               offsets[index + 1] - offsets[index])
+                # lists are shared with the frames: update them in place
+                for i in range(index + 1, len(offsets)):
+                    offsets[i] += delta
+        return ds
+
+    def _get_dataset(self, index):
+        """
+        @return: the dataset number index and its chunk reader
+        """
+        ds = self._resolve(index)
+        if self._readers[index] is None:
+            self._readers[index] = DirectChunkReader(ds)
+        return ds, self._readers[index]
+
     def write(self, fname):
         """
         try to write image
@@ -157,7 +257,7 @@ class EigerImage(FabioImage):
         """
         if len(self.dataset.shape) == 2:
             self.dataset.shape = (1,) + self.dataset.shape
-        with h5py.File(fname) as h5file:
+        with h5py.File(fname, mode="a") as h5file:
             grp = h5file.require_group("entry/data")
             if len(self.dataset) > 1:
                 for i, ds in enumerate(self.dataset):
@@ -171,18 +271,15 @@ class EigerImage(FabioImage):
             new_img = None
             if (num >= 0) and num < self.nframes:
                 if isinstance(self.dataset, list):
-                    nfr = num
-                    for ds in self.dataset:
-                        if nfr < ds.shape[0]:
-                            data = ds[nfr]
-                            break
-                        else:
-                            nfr -= ds.shape[0]
+                    data = self.read_frames(num, num + 1)[0]
                 else:
                     data = self.dataset[num]
                 new_img = self.__class__(data=data, header=self.header)
                 new_img.dataset = self.dataset
-                new_img.h5 = self.h5
+                new_img._links = self._links
+                new_img._readers = self._readers
+                new_img._offsets = self._offsets
+                new_img.h5 = hdf5pool.pool.retain(self.h5)
                 new_img.nframes = self.nframes
                 new_img.currentframe = num
             else:
@@ -191,6 +288,68 @@ class EigerImage(FabioImage):
             new_img = FabioImage.getframe(self, num)
         return new_img
 
+    def read_frames(self, start, stop, step=1, out=None, workers=None):
+        """
+        Read several frames at once: frames range(start, stop, step)
+
+        The datasets holding the frames are found by bisection and each of
+        them is read in a single operation. Datasets chunked by whole frames
+        with deflate, shuffle, LZ4 or bitshuffle compression are read chunk
+        by chunk and decompressed by a pool of threads, the others with one
+        hyperslab selection read directly into the output array.
+
+        @param start: index of the first frame
+        @param stop: index after the last frame
+        @param step: distance between two frames
+        @param out: optional C-contiguous array of shape (nframes, dim2, dim1) to be filled
+        @param workers: number of decompression threads (default: number of CPU)
+        @return: 3D numpy array
+        """
+        frames = range(start, stop, step)
+        if step < 1 or len(frames) == 0 or start < 0 or frames[-1] >= self.nframes:
+            raise IndexError("read_frames [%s:%s:%s] out of range [0, %s[" % (start, stop, step, self.nframes))
+        first = self._get_dataset(0)[0]
+        shape = (len(frames),) + tuple(first.shape[1:])
+        if out is None:
+            out = numpy.empty(shape, dtype=first.dtype.newbyteorder("="))
+        elif out.shape != shape:
+            raise ValueError("Output array of shape %s expected, got %s" % (shape, out.shape))
+        offsets = self._offsets
+        if workers is None:
+            workers = multiprocessing.cpu_count()
+        pool = ThreadPool(workers) if workers > 1 and len(frames) > 1 else None
+        try:
+            position = 0
+            index = bisect.bisect_right(offsets, frames[0]) - 1
+            while position < len(frames):
+                ds, reader = self._get_dataset(index)
+                if frames[position] >= offsets[index + 1]:
+                    # the data file holds fewer frames than announced
+                    if frames[-1] >= self.nframes:
+                        raise IndexError("read_frames [%s:%s:%s] out of range [0, %s[" % (start, stop, step, self.nframes))
+                    index = bisect.bisect_right(offsets, frames[position]) - 1
+                    continue
+                local = frames[position] - offsets[index]
+                # number of requested frames held by this dataset
+                count = min(len(frames) - position,
+                            (offsets[index + 1] - frames[position] - 1) // step + 1)
+                dest = out[position:position + count]
+                selection = numpy.s_[local:local + (count - 1) * step + 1:step]
+                if reader.supported:
+                    reader.read(local, local + (count - 1) * step + 1, dest, pool, step)
+                elif out.flags.c_contiguous:
+                    ds.read_direct(out, selection, numpy.s_[position:position + count])
+                else:
+                    dest[...] = ds[selection]
+                position += count
+                if position < len(frames):
+                    index = bisect.bisect_right(offsets, frames[position]) - 1
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        return out
+
     def previous(self):
         """ returns the previous frame in the series as a fabioimage """
         return self.getframe(self.currentframe - 1)
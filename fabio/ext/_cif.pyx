@@ -29,7 +29,7 @@ __author__ = "Jerome Kieffer"
 __contact__ = "jerome.kieffer@esrf.eu"
 __license__ = "MIT"
 __copyright__ = "2014, European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "30/10/2015"
+__date__ = "18/10/2016"
 
 cimport numpy
 import numpy
@@ -41,13 +41,16 @@ def split_tokens(bytes_text):
     """
     Separate the text representing a CIF file into a list of tokens. 
 
+    The text is scanned in place through a read-only memoryview: only the
+    tokens are copied.
+
     @param bytes_text: the content of the CIF - file
     @type bytes_text:  8-bit string (str in python2 or bytes in python3)
     @return: list of all the fields of the CIF
     @rtype: list
     """
     cdef:
-        unsigned char[:] ary = bytearray(bytes_text)
+        const unsigned char[:] ary
         bint in_comment=False, in_single_quote=False, in_double_quote=False, multiline=False, go_on=True
         int i=-1, start=-1, end=-1, imax
         char prev, next, cur = b"\n"
@@ -62,9 +65,12 @@ def split_tokens(bytes_text):
         unsigned char QUESTIONMARK = b"?"
         bytes BINARY_MARKER = b"--CIF-BINARY-FORMAT-SECTION--"
         int lbms = len(BINARY_MARKER)
+    fields = []
+    if len(bytes_text) == 0:
+        return fields
+    ary = bytes_text
     next = ary[0]
     imax = len(bytes_text) - 1
-    fields = []
     while go_on:
         i += 1
         prev = cur
@@ -99,7 +105,9 @@ def split_tokens(bytes_text):
             # Handle CBF
             if cur == DASH:
                 if bytes_text[i:i + lbms] == BINARY_MARKER:
-                    end = bytes_text[i + lbms:].find(BINARY_MARKER)
+                    end = bytes_text.find(BINARY_MARKER, i + lbms)
+                    if end >= 0:
+                        end -= i + lbms
                     i += end + 2 * lbms
                     cur = ary[i]
                     next = ary[i + 1]
@@ -0,0 +1,176 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) 2016 European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+__doc__ = "EDF header parser helper functions"
+__author__ = "Jerome Kieffer"
+__contact__ = "jerome.kieffer@esrf.eu"
+__license__ = "MIT"
+__copyright__ = "2016, European Synchrotron Radiation Facility, Grenoble, France"
+__date__ = "18/10/2016"
+
+import cython
+from libc.string cimport memchr, memcmp
+from cpython.bytes cimport PyBytes_FromStringAndSize
+from cpython.unicode cimport PyUnicode_DecodeASCII
+from collections import OrderedDict
+
+DEF MAX_KEYS = 4096
+
+# raw key (bytes) -> (raw key, key, upper-case key), shared by all frames of all files
+cdef dict _keys = {}
+# keys of the last header parsed, in order: (raw key, key, upper-case key).
+# Frames of a file usually share the same keys, in the same order.
+cdef list _previous = []
+cdef dict _previous_caps = {}
+
+
+cdef inline bint _blank(unsigned char c) nogil:
+    """Characters removed by str.strip(), null bytes being read as spaces"""
+    return c == 32 or c == 0 or 9 <= c <= 13 or 28 <= c <= 31
+
+
+cdef inline unicode _decode(const unsigned char *start, Py_ssize_t size):
+    """Decode a (stripped) key or value, null bytes being replaced by spaces"""
+    text = PyUnicode_DecodeASCII(<const char*> start, size, NULL)
+    if size and memchr(start, 0, size) != NULL:
+        text = text.replace(u"\x00", u" ")
+    return text
+
+
+def clear_keys():
+    """
+    Empty the cache of the interned keys
+    """
+    global _previous, _previous_caps
+    _keys.clear()
+    _previous = []
+    _previous_caps = {}
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+def parse_header(block, select=None):
+    """
+    Split the ascii header block of an EDF frame into a dictionary, in a
+    single pass over the bytes.
+
+    Keys are interned: the same string objects (and their upper-case
+    version) are used for all frames, which also saves their hashing. Keys
+    are first compared with those of the previous header at the same
+    position, then looked up in a cache. When all keys match, the dict of
+    upper-case keys is copied from the previous header.
+
+    With a selection, only the values of the selected keys are decoded.
+
+    :param block: header block (without the curly brackets), bytes or ascii string
+    :param select: set of upper-case keys to retrieve, all keys if None
+    :return: 2-tuple with the OrderedDict of the header and the dict of upper-case keys
+    """
+    global _previous, _previous_caps
+    cdef:
+        const unsigned char[:] buf
+        const unsigned char *ptr
+        Py_ssize_t length, pos = 0, start, equal, ks, ke, vs, ve, rank = 0, nprevious, i
+        bint same = True
+        bint full = select is None
+        list previous = _previous, current = []
+        dict caps = {}
+        tuple entry
+        bytes raw_key
+    header = OrderedDict()
+    if isinstance(block, unicode):
+        block = block.encode("ASCII")
+    length = len(block)
+    if length == 0:
+        return header, caps
+    buf = block
+    ptr = &buf[0]
+    nprevious = len(previous)
+    while pos < length:
+        start = pos
+        equal = -1
+        while pos < length and ptr[pos] != 59:  # ;
+            if equal < 0 and ptr[pos] == 61:  # =
+                equal = pos
+            pos += 1
+        if equal >= 0:
+            ks = start
+            ke = equal
+            while ks < ke and _blank(ptr[ks]):
+                ks += 1
+            while ke > ks and _blank(ptr[ke - 1]):
+                ke -= 1
+            vs = equal + 1
+            ve = pos
+            while vs < ve and _blank(ptr[vs]):
+                vs += 1
+            while ve > vs and _blank(ptr[ve - 1]):
+                ve -= 1
+            entry = None
+            if rank < nprevious:
+                entry = <tuple> previous[rank]
+                raw_key = <bytes> entry[0]
+                if len(raw_key) != ke - ks or memcmp(<const char*> raw_key, ptr + ks, ke - ks) != 0:
+                    entry = None
+            if entry is None:
+                if same and full:
+                    # keys differ from the previous header: fill caps so far
+                    same = False
+                    for i in range(rank):
+                        caps[(<tuple> current[i])[2]] = (<tuple> current[i])[1]
+                raw_key = PyBytes_FromStringAndSize(<const char*> ptr + ks, ke - ks)
+                entry = _keys.get(raw_key)
+                if entry is None:
+                    key = _decode(ptr + ks, ke - ks)
+                    entry = (raw_key, key, key.upper())
+                    if len(_keys) >= MAX_KEYS:
+                        _keys.clear()
+                    _keys[raw_key] = entry
+                same = False
+            current.append(entry)
+            rank += 1
+            if full:
+                header[entry[1]] = _decode(ptr + vs, ve - vs)
+                if not same:
+                    caps[entry[2]] = entry[1]
+            elif entry[2] in select:
+                header[entry[1]] = _decode(ptr + vs, ve - vs)
+                caps[entry[2]] = entry[1]
+        pos += 1
+    if full:
+        if same and rank == nprevious and _previous_caps is not None:
+            caps = _previous_caps.copy()
+        else:
+            if same:
+                for i in range(rank):
+                    caps[(<tuple> current[i])[2]] = (<tuple> current[i])[1]
+            _previous = current
+            _previous_caps = caps.copy()
+    elif not (same and rank == nprevious):
+        # the upper-case keys of the whole header are not known
+        _previous = current
+        _previous_caps = None
+    return header, caps
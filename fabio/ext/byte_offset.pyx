@@ -35,29 +35,35 @@ __author__ = "Jerome Kieffer"
 __contact__ = "jerome.kieffer@esrf.eu"
 __license__ = "MIT"
 __copyright__ = "2010-2016, European Synchrotron Radiation Facility, Grenoble, France"
-__date__ = "12/07/2016"
+__date__ = "18/10/2016"
 
 
 cimport numpy
 import numpy
 import cython
+from libc.string cimport memchr
+
+# number of pixels compressed at once: the scratch buffer is 15 bytes per pixel
+DEF BLOCK = 65536
+# runs of 1-byte differences shorter than this are found without memchr
+DEF SHORT_RUN = 16
 
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def comp_cbf32(data not None):
-    """Compress a dataset using the byte-offset described for Pilatus
-
-    :param data: array of integers
-    :return: numpy array of chars
+cdef Py_ssize_t _encode32(const numpy.int32_t[::1] ary, numpy.int8_t[::1] output, numpy.int32_t last) nogil:
+    """Byte-offset compression of a block of int32, wrapping around like
+    dec_cbf32: at most 7 bytes per pixel
+
+    :param ary: block of pixels
+    :param output: buffer of at least 7 * len(ary) bytes
+    :param last: value of the pixel preceding the block
+    :return: number of bytes written
     """
     cdef:
-        numpy.int32_t[::1] ary = numpy.ascontiguousarray(data.ravel(), dtype=numpy.int32)
-        int size = ary.size, i=0, j=0
-        numpy.int8_t[::1] output = numpy.zeros(size*7, dtype=numpy.int8)
-        numpy.int32_t last, current, delta, absdelta
-    last = 0
-    for i in range(size):
+        Py_ssize_t i, j = 0
+        numpy.int32_t current, delta, absdelta
+    for i in range(ary.shape[0]):
         current = ary[i]
         delta = current - last
         absdelta = delta if delta>0 else -delta
@@ -79,27 +85,27 @@ def comp_cbf32(data not None):
             output[j] = delta
             j+=1
         last = current
-    return numpy.asarray(output)[:j]
+    return j
+
 
 @cython.boundscheck(False)
 @cython.wraparound(False)
-def comp_cbf(data not None):
-    """Compress a dataset using the byte-offset described for any int64
+cdef Py_ssize_t _encode64(const numpy.int64_t[::1] ary, numpy.int8_t[::1] output, numpy.int64_t last) nogil:
+    """Byte-offset compression of a block of int64: at most 15 bytes per pixel
 
-    :param data: array of integers
-    :return: numpy array of chars
+    :param ary: block of pixels
+    :param output: buffer of at least 15 * len(ary) bytes
+    :param last: value of the pixel preceding the block
+    :return: number of bytes written
     """
     cdef:
-        numpy.int64_t[::1] ary = numpy.ascontiguousarray(data.ravel(), dtype=numpy.int64)
-        int size = ary.size, i=0, j=0
-        numpy.int8_t[::1] output = numpy.zeros(size*15, dtype=numpy.int8)
-        numpy.int64_t last, current, delta, absdelta
-    last = 0
-    for i in range(size):
+        Py_ssize_t i, j = 0
+        numpy.int64_t current, delta, absdelta
+    for i in range(ary.shape[0]):
         current = ary[i]
         delta = current - last
         absdelta = delta if delta>0 else -delta
-        if absdelta >= 1<<31:
+        if absdelta >= (<numpy.int64_t> 1) << 31:
             output[j] = -128
             output[j+1] = 0
             output[j+2] = -128
@@ -134,146 +140,467 @@ def comp_cbf(data not None):
             output[j] = delta
             j+=1
         last = current
-    return numpy.asarray(output)[:j]
+    return j
 
 
-@cython.boundscheck(False)
-@cython.wraparound(False)
-def dec_cbf(bytes stream not None, size=None):
-    """
-    Analyze a stream of char with any length of exception (2,4, or 8 bytes integers)
-    @param stream: bytes (string) representing the compressed data
-    @param size: the size of the output array (of longInts)
-    @return : int64 ndArrays
+def comp_cbf_chunks(data not None, int block=BLOCK):
+    """Compress a dataset with the byte-offset algorithm, block after block
+
+    Only one block of pixels (converted to int32 or int64) and its worst-case
+    output (15 bytes per pixel) are held at once, whatever the size of the
+    dataset. The GIL is released during the compression of each block.
+
+    :param data: array of integers, compressed as int32 if it is int32,
+        as int64 otherwise
+    :param block: number of pixels per block
+    :return: generator of bytes
     """
     cdef:
-        int               i = 0
-        int               j = 0
-        numpy.uint8_t     tmp8 = 0
-
-        numpy.int64_t    last = 0
-        numpy.int64_t    current = 0
-        numpy.int64_t    tmp64 = 0
-        numpy.int64_t    tmp64a = 0
-        numpy.int64_t    tmp64b = 0
-        numpy.int64_t    tmp64c = 0
-        numpy.int64_t    tmp64d = 0
-        numpy.int64_t    tmp64e = 0
-        numpy.int64_t    tmp64f = 0
-        numpy.int64_t    tmp64g = 0
-
-        numpy.uint8_t    key8 = 0x80
-        numpy.uint8_t    key0 = 0x00
+        numpy.int8_t[::1] output
+        numpy.int32_t[::1] ary32
+        numpy.int64_t[::1] ary64
+        numpy.int32_t last32 = 0
+        numpy.int64_t last64 = 0
+        Py_ssize_t start, size, j
+        bint is32 = "int32" in str(data.dtype)
+    flat = data.ravel()
+    size = flat.size
+    block = max(1, block)
+    output = numpy.empty(min(block, max(size, 1)) * (7 if is32 else 15), dtype=numpy.int8)
+    for start in range(0, size, block):
+        if is32:
+            ary32 = numpy.ascontiguousarray(flat[start:start + block], dtype=numpy.int32)
+            with nogil:
+                j = _encode32(ary32, output, last32)
+            last32 = ary32[ary32.shape[0] - 1]
+        else:
+            ary64 = numpy.ascontiguousarray(flat[start:start + block], dtype=numpy.int64)
+            with nogil:
+                j = _encode64(ary64, output, last64)
+            last64 = ary64[ary64.shape[0] - 1]
+        yield numpy.asarray(output)[:j].tobytes()
 
-        int csize
-        int lenStream = < int > len(stream)
-        numpy.uint8_t[:] cstream = bytearray(stream)
-    if size is None:
-        csize = lenStream
-    else:
-        csize = < int > size
-    cdef numpy.ndarray[numpy.int64_t, ndim = 1] dataOut = numpy.empty(csize, dtype=numpy.int64)
-    with nogil:
-        while (i < lenStream) and (j < csize):
-            if (cstream[i] == key8):
-                if ((cstream[i + 1] == key0) and (cstream[i + 2] == key8)):
-                    if (cstream[i + 3] == key0) and (cstream[i + 4] == key0) and (cstream[i + 5] == key0) and (cstream[i + 6] == key8):
-                        # Retrieve the interesting Bytes of data
-                        tmp64g = cstream[i + 7]
-                        tmp64f = cstream[i + 8]
-                        tmp64e = cstream[i + 9]
-                        tmp64d = cstream[i + 10]
-                        tmp64c = cstream[i + 11]
-                        tmp64b = cstream[i + 12]
-                        tmp64a = cstream[i + 13]
-                        tmp64  = <numpy.int8_t> cstream[i + 14]
-                        # Assemble data into a 64 bits integer
-                        current = (tmp64 << 56) | (tmp64a << 48) | (tmp64b << 40) | (tmp64c << 32) | (tmp64d << 24) | (tmp64e << 16) | (tmp64f << 8) | (tmp64g)
-                        i += 15
-                    else:
-                        # Retrieve the interesting Bytes of data
-                        tmp64c = cstream[i + 3]
-                        tmp64b = cstream[i + 4]
-                        tmp64a = cstream[i + 5]
-                        tmp64  = <numpy.int8_t> cstream[i + 6]
-                        # Assemble data into a 64 bits integer
-                        current = (tmp64 << 24) | (tmp64a << 16) | (tmp64b << 8) | (tmp64c);
-                        i += 7
-                else:
-                    tmp64a = cstream[i + 1]
-                    tmp64  = <numpy.int8_t> cstream[i + 2];
 
-                    current = (tmp64 << 8) | (tmp64a);
-                    i += 3
-            else:
-                current = (<numpy.int8_t> cstream[i])
-                i += 1
-            last += current
-            dataOut[j] = last
-            j += 1
+def comp_cbf_block(data not None, last=0):
+    """Compress one block of a dataset with the byte-offset algorithm,
+    starting from the value of the pixel preceding the block
 
-    return dataOut[:j]
+    Blocks compressed this way, in any order or in parallel, give the
+    compressed dataset once concatenated. The GIL is released during the
+    compression.
 
+    :param data: 1D array of integers, compressed as int32 if it is int32,
+        as int64 otherwise
+    :param last: value of the pixel preceding the block, 0 for the first one
+    :return: bytes
+    """
+    cdef:
+        numpy.int8_t[::1] output
+        numpy.int32_t[::1] ary32
+        numpy.int64_t[::1] ary64
+        numpy.int32_t last32
+        numpy.int64_t last64
+        Py_ssize_t j
+    if "int32" in str(data.dtype):
+        ary32 = numpy.ascontiguousarray(data, dtype=numpy.int32).ravel()
+        last32 = last
+        output = numpy.empty(7 * ary32.shape[0], dtype=numpy.int8)
+        with nogil:
+            j = _encode32(ary32, output, last32)
+    else:
+        ary64 = numpy.ascontiguousarray(data, dtype=numpy.int64).ravel()
+        last64 = last
+        output = numpy.empty(15 * ary64.shape[0], dtype=numpy.int8)
+        with nogil:
+            j = _encode64(ary64, output, last64)
+    return numpy.asarray(output)[:j].tobytes()
 
-@cython.boundscheck(False)
-def dec_cbf32(bytes stream not None, size=None):
+
+def comp_cbf32(data not None):
+    """Compress a dataset using the byte-offset described for Pilatus
+
+    :param data: array of integers
+    :return: numpy array of chars
     """
-    Analyze a stream of char with any length of exception (2 or 4 bytes integers)
-    Optimized for int32 decompression
+    return numpy.frombuffer(b"".join(comp_cbf_chunks(numpy.asarray(data, dtype=numpy.int32))), dtype=numpy.int8)
 
-    @param stream: bytes (string) representing the compressed data
-    @param size: the size of the output array (of longInts)
-    @return : int64 ndArrays
+
+def comp_cbf(data not None):
+    """Compress a dataset using the byte-offset described for any int64
+
+    :param data: array of integers
+    :return: numpy array of chars
     """
-    cdef:
-        int               i = 0
-        int               j = 0
-        numpy.uint8_t     tmp8 = 0
+    return numpy.frombuffer(b"".join(comp_cbf_chunks(numpy.asarray(data, dtype=numpy.int64))), dtype=numpy.int8)
 
-        numpy.int32_t    last = 0
-        numpy.int32_t    current = 0
-        numpy.int32_t    tmp64 = 0
-        numpy.int32_t    tmp64a = 0
-        numpy.int32_t    tmp64b = 0
-        numpy.int32_t    tmp64c = 0
 
-        numpy.uint8_t    key8 = 0x80
-        numpy.uint8_t    key0 = 0x00
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t _decode64_bytewise(const numpy.uint8_t[::1] cstream, numpy.int64_t[::1] dataOut) nogil:
+    """Byte-offset decompression testing every byte for an exception
 
-        int csize
-        int lenStream = < int > len(stream)
-        numpy.uint8_t[:] cstream = bytearray(stream)
-    if size is None:
-        csize = lenStream
-    else:
-        csize = < int > size
-    cdef numpy.ndarray[numpy.int32_t, ndim = 1] dataOut = numpy.empty(csize, dtype=numpy.int32)
-    with nogil:
-        while (i < lenStream) and (j < csize):
-            if (cstream[i] == key8):
-                if ((cstream[i + 1] == key0) and (cstream[i + 2] == key8)):
+    :param cstream: compressed stream
+    :param dataOut: output buffer, its size is the maximum number of pixels
+    :return: number of pixels decoded
+    """
+    cdef:
+        Py_ssize_t i = 0, j = 0
+        Py_ssize_t lenStream = cstream.shape[0], csize = dataOut.shape[0]
+        numpy.int64_t last = 0, current = 0
+        numpy.int64_t tmp64, tmp64a, tmp64b, tmp64c, tmp64d, tmp64e, tmp64f, tmp64g
+        numpy.uint8_t key8 = 0x80
+        numpy.uint8_t key0 = 0x00
+    while (i < lenStream) and (j < csize):
+        if (cstream[i] == key8):
+            if (i + 2 < lenStream) and ((cstream[i + 1] == key0) and (cstream[i + 2] == key8)):
+                if (i + 6 < lenStream) and (cstream[i + 3] == key0) and (cstream[i + 4] == key0) and (cstream[i + 5] == key0) and (cstream[i + 6] == key8):
+                    if i + 14 >= lenStream:
+                        break
+                    # Retrieve the interesting Bytes of data
+                    tmp64g = cstream[i + 7]
+                    tmp64f = cstream[i + 8]
+                    tmp64e = cstream[i + 9]
+                    tmp64d = cstream[i + 10]
+                    tmp64c = cstream[i + 11]
+                    tmp64b = cstream[i + 12]
+                    tmp64a = cstream[i + 13]
+                    tmp64  = <numpy.int8_t> cstream[i + 14]
+                    # Assemble data into a 64 bits integer
+                    current = (tmp64 << 56) | (tmp64a << 48) | (tmp64b << 40) | (tmp64c << 32) | (tmp64d << 24) | (tmp64e << 16) | (tmp64f << 8) | (tmp64g)
+                    i += 15
+                else:
+                    if i + 6 >= lenStream:
+                        break
                     # Retrieve the interesting Bytes of data
                     tmp64c = cstream[i + 3]
                     tmp64b = cstream[i + 4]
                     tmp64a = cstream[i + 5]
                     tmp64  = <numpy.int8_t> cstream[i + 6]
-                    # Assemble data into a 32 bits integer
-                    current = (tmp64 << 24) | (tmp64a << 16) | (tmp64b << 8) | (tmp64c)
+                    # Assemble data into a 64 bits integer
+                    current = (tmp64 << 24) | (tmp64a << 16) | (tmp64b << 8) | (tmp64c);
                     i += 7
-                else:
-                    tmp64a = cstream[i + 1]
-                    tmp64  = <numpy.int8_t> cstream[i + 2]
+            else:
+                if i + 2 >= lenStream:
+                    break
+                tmp64a = cstream[i + 1]
+                tmp64  = <numpy.int8_t> cstream[i + 2];
 
-                    current = (tmp64 << 8) | (tmp64a);
-                    i += 3
+                current = (tmp64 << 8) | (tmp64a);
+                i += 3
+        else:
+            current = (<numpy.int8_t> cstream[i])
+            i += 1
+        last += current
+        dataOut[j] = last
+        j += 1
+    return j
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef Py_ssize_t _decode32_bytewise(const numpy.uint8_t[::1] cstream, numpy.int32_t[::1] dataOut) nogil:
+    """Byte-offset decompression into int32 (exceptions of 2 or 4 bytes)
+    testing every byte for an exception
+
+    :param cstream: compressed stream
+    :param dataOut: output buffer, its size is the maximum number of pixels
+    :return: number of pixels decoded
+    """
+    cdef:
+        Py_ssize_t i = 0, j = 0
+        Py_ssize_t lenStream = cstream.shape[0], csize = dataOut.shape[0]
+        numpy.int32_t last = 0, current = 0
+        numpy.int32_t tmp64, tmp64a, tmp64b, tmp64c
+        numpy.uint8_t key8 = 0x80
+        numpy.uint8_t key0 = 0x00
+    while (i < lenStream) and (j < csize):
+        if (cstream[i] == key8):
+            if (i + 2 < lenStream) and ((cstream[i + 1] == key0) and (cstream[i + 2] == key8)):
+                if i + 6 >= lenStream:
+                    break
+                # Retrieve the interesting Bytes of data
+                tmp64c = cstream[i + 3]
+                tmp64b = cstream[i + 4]
+                tmp64a = cstream[i + 5]
+                tmp64  = <numpy.int8_t> cstream[i + 6]
+                # Assemble data into a 32 bits integer
+                current = (tmp64 << 24) | (tmp64a << 16) | (tmp64b << 8) | (tmp64c)
+                i += 7
+            else:
+                if i + 2 >= lenStream:
+                    break
+                tmp64a = cstream[i + 1]
+                tmp64  = <numpy.int8_t> cstream[i + 2]
+
+                current = (tmp64 << 8) | (tmp64a);
+                i += 3
+        else:
+            current = (<numpy.int8_t> cstream[i])
+            i += 1
+        last += current
+        dataOut[j] = last
+        j += 1
+    return j
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline numpy.uint64_t _read_le(const numpy.uint8_t *ptr, int nbytes) nogil:
+    """Little-endian unsigned integer of nbytes bytes"""
+    cdef:
+        numpy.uint64_t value = 0
+        int k
+    for k in range(nbytes - 1, -1, -1):
+        value = (value << 8) | ptr[k]
+    return value
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _cumsum_int64(const numpy.int8_t *deltas, numpy.int64_t *dest, Py_ssize_t run, numpy.int64_t *last) nogil:
+    """Cumulative sum of a run of 1-byte differences, starting from last
+
+    Partial sums are computed 8 by 8 so that only one addition per 8 pixels
+    depends on the previous pixels.
+    """
+    cdef:
+        Py_ssize_t k = 0
+        numpy.int64_t value = last[0]
+        numpy.int64_t s0, s1, s2, s3, s4, s5, s6, s7
+    while k + 8 <= run:
+        s0 = deltas[k]
+        s1 = s0 + deltas[k + 1]
+        s2 = s1 + deltas[k + 2]
+        s3 = s2 + deltas[k + 3]
+        s4 = s3 + deltas[k + 4]
+        s5 = s4 + deltas[k + 5]
+        s6 = s5 + deltas[k + 6]
+        s7 = s6 + deltas[k + 7]
+        dest[k] = value + s0
+        dest[k + 1] = value + s1
+        dest[k + 2] = value + s2
+        dest[k + 3] = value + s3
+        dest[k + 4] = value + s4
+        dest[k + 5] = value + s5
+        dest[k + 6] = value + s6
+        dest[k + 7] = value + s7
+        value += s7
+        k += 8
+    while k < run:
+        value += deltas[k]
+        dest[k] = value
+        k += 1
+    last[0] = value
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+cdef inline void _cumsum_int32(const numpy.int8_t *deltas, numpy.int32_t *dest, Py_ssize_t run, numpy.int32_t *last) nogil:
+    """Cumulative sum of a run of 1-byte differences, starting from last
+
+    Partial sums are computed 8 by 8 so that only one addition per 8 pixels
+    depends on the previous pixels.
+    """
+    cdef:
+        Py_ssize_t k = 0
+        numpy.int32_t value = last[0]
+        numpy.int32_t s0, s1, s2, s3, s4, s5, s6, s7
+    while k + 8 <= run:
+        s0 = deltas[k]
+        s1 = s0 + deltas[k + 1]
+        s2 = s1 + deltas[k + 2]
+        s3 = s2 + deltas[k + 3]
+        s4 = s3 + deltas[k + 4]
+        s5 = s4 + deltas[k + 5]
+        s6 = s5 + deltas[k + 6]
+        s7 = s6 + deltas[k + 7]
+        dest[k] = value + s0
+        dest[k + 1] = value + s1
+        dest[k + 2] = value + s2
+        dest[k + 3] = value + s3
+        dest[k + 4] = value + s4
+        dest[k + 5] = value + s5
+        dest[k + 6] = value + s6
+        dest[k + 7] = value + s7
+        value += s7
+        k += 8
+    while k < run:
+        value += deltas[k]
+        dest[k] = value
+        k += 1
+    last[0] = value
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef Py_ssize_t _decode64(const numpy.uint8_t[::1] stream, numpy.int64_t[::1] output) nogil:
+    """Byte-offset decompression looking for exceptions with memchr
+
+    The runs of 1-byte differences between two exceptions are summed in a
+    loop without branch: only the exceptions take the slow path.
+
+    :param stream: compressed stream
+    :param output: output buffer, its size is the maximum number of pixels
+    :return: number of pixels decoded
+    """
+    cdef:
+        Py_ssize_t i = 0, j = 0, run, stop
+        Py_ssize_t length = stream.shape[0], size = output.shape[0]
+        const numpy.uint8_t *start
+        const void *found
+        numpy.int64_t last = 0
+    if length == 0 or size == 0:
+        return 0
+    start = &stream[0]
+    while i < length and j < size:
+        if start[i] != 0x80:
+            # short runs are frequent on high-count frames: their bytes are
+            # decoded one by one, memchr is only called for longer runs
+            stop = min(i + SHORT_RUN, length, i + size - j)
+            while i < stop and start[i] != 0x80:
+                last += <numpy.int8_t> start[i]
+                output[j] = last
+                i += 1
+                j += 1
+            if i < stop:
+                continue
+            if i >= length or j >= size:
+                break
+            found = memchr(start + i, 0x80, length - i)
+            run = (length if found == NULL else (<const numpy.uint8_t *> found - start)) - i
+            if run > size - j:
+                run = size - j
+            _cumsum_int64(<const numpy.int8_t *> (start + i), &output[j], run, &last)
+            i += run
+            j += run
+            if i >= length or j >= size:
+                break
+        # exception at position i
+        if i + 2 < length and start[i + 1] == 0 and start[i + 2] == 0x80:
+            if i + 6 < length and start[i + 3] == 0 and start[i + 4] == 0 and start[i + 5] == 0 and start[i + 6] == 0x80:
+                if i + 14 >= length:
+                    break
+                last += <numpy.int64_t> _read_le(start + i + 7, 8)
+                i += 15
             else:
-                current = (<numpy.int8_t> cstream[i])
+                if i + 6 >= length:
+                    break
+                last += <numpy.int32_t> (start[i + 3] | (start[i + 4] << 8) | (start[i + 5] << 16) | (<numpy.uint32_t> start[i + 6] << 24))
+                i += 7
+        else:
+            if i + 2 >= length:
+                break
+            last += <numpy.int16_t> (start[i + 1] | (start[i + 2] << 8))
+            i += 3
+        output[j] = last
+        j += 1
+    return j
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+cdef Py_ssize_t _decode32(const numpy.uint8_t[::1] stream, numpy.int32_t[::1] output) nogil:
+    """Byte-offset decompression into int32 (exceptions of 2 or 4 bytes)
+    looking for exceptions with memchr
+
+    :param stream: compressed stream
+    :param output: output buffer, its size is the maximum number of pixels
+    :return: number of pixels decoded
+    """
+    cdef:
+        Py_ssize_t i = 0, j = 0, run, stop
+        Py_ssize_t length = stream.shape[0], size = output.shape[0]
+        const numpy.uint8_t *start
+        const void *found
+        numpy.int32_t last = 0
+    if length == 0 or size == 0:
+        return 0
+    start = &stream[0]
+    while i < length and j < size:
+        if start[i] != 0x80:
+            # short runs are frequent on high-count frames: their bytes are
+            # decoded one by one, memchr is only called for longer runs
+            stop = min(i + SHORT_RUN, length, i + size - j)
+            while i < stop and start[i] != 0x80:
+                last += <numpy.int8_t> start[i]
+                output[j] = last
                 i += 1
-            last += current
-            dataOut[j] = last
-            j += 1
+                j += 1
+            if i < stop:
+                continue
+            if i >= length or j >= size:
+                break
+            found = memchr(start + i, 0x80, length - i)
+            run = (length if found == NULL else (<const numpy.uint8_t *> found - start)) - i
+            if run > size - j:
+                run = size - j
+            _cumsum_int32(<const numpy.int8_t *> (start + i), &output[j], run, &last)
+            i += run
+            j += run
+            if i >= length or j >= size:
+                break
+        # exception at position i
+        if i + 2 < length and start[i + 1] == 0 and start[i + 2] == 0x80:
+            if i + 6 >= length:
+                break
+            last += <numpy.int32_t> (start[i + 3] | (start[i + 4] << 8) | (start[i + 5] << 16) | (<numpy.uint32_t> start[i + 6] << 24))
+            i += 7
+        else:
+            if i + 2 >= length:
+                break
+            last += <numpy.int16_t> (start[i + 1] | (start[i + 2] << 8))
+            i += 3
+        output[j] = last
+        j += 1
+    return j
 
-    return dataOut[:j]
+
+def dec_cbf(bytes stream not None, size=None, bint fast=True):
+    """
+    Analyze a stream of char with any length of exception (2,4, or 8 bytes integers)
+    @param stream: bytes (string) representing the compressed data
+    @param size: the size of the output array (of longInts)
+    @param fast: look for exceptions with memchr and sum the runs of
+        1-byte differences without branch, else test every byte
+    @return : int64 ndArrays
+    """
+    cdef:
+        const numpy.uint8_t[::1] cstream = stream
+        numpy.int64_t[::1] dataOut
+        Py_ssize_t j
+    dataOut = numpy.empty(len(stream) if size is None else size, dtype=numpy.int64)
+    with nogil:
+        if fast:
+            j = _decode64(cstream, dataOut)
+        else:
+            j = _decode64_bytewise(cstream, dataOut)
+    return numpy.asarray(dataOut)[:j]
+
+
+def dec_cbf32(bytes stream not None, size=None, bint fast=True):
+    """
+    Analyze a stream of char with any length of exception (2 or 4 bytes integers)
+    Optimized for int32 decompression
+
+    @param stream: bytes (string) representing the compressed data
+    @param size: the size of the output array (of longInts)
+    @param fast: look for exceptions with memchr and sum the runs of
+        1-byte differences without branch, else test every byte
+    @return : int32 ndArrays
+    """
+    cdef:
+        const numpy.uint8_t[::1] cstream = stream
+        numpy.int32_t[::1] dataOut
+        Py_ssize_t j
+    dataOut = numpy.empty(len(stream) if size is None else size, dtype=numpy.int32)
+    with nogil:
+        if fast:
+            j = _decode32(cstream, dataOut)
+        else:
+            j = _decode32_bytewise(cstream, dataOut)
+    return numpy.asarray(dataOut)[:j]
 
 
 @cython.boundscheck(False)
@@ -53,6 +53,7 @@ import os
 import logging
 import sys
 import tempfile
+import multiprocessing
 logger = logging.getLogger("fabioimage")
 import numpy
 try:
@@ -79,6 +80,23 @@ try:
 except ImportError:
     from .third_party.ordereddict import OrderedDict
 
+# PIL raw modes to decode numpy arrays as 32 bits float images:
+# (kind, itemsize, big endian) -> raw mode
+PIL_RAWMODES = {("u", 1, False): "F;8",
+                ("i", 1, False): "F;8S",
+                ("u", 2, False): "F;16",
+                ("i", 2, False): "F;16S",
+                ("u", 4, False): "F;32",
+                ("i", 4, False): "F;32S",
+                ("f", 4, False): "F;32F",
+                ("f", 8, False): "F;64F",
+                ("u", 2, True): "F;16B",
+                ("i", 2, True): "F;16BS",
+                ("u", 4, True): "F;32B",
+                ("i", 4, True): "F;32BS",
+                ("f", 4, True): "F;32BF",
+                ("f", 8, True): "F;64BF"}
+
 
 class FabioMeta(type):
     """ Metaclass used to register all image classes inheriting from fabioImage
@@ -138,10 +156,13 @@ class FabioImage(with_metaclass(FabioMeta, object)):
         self.header = self.check_header(header)
         # cache for image statistics
         self.mean = self.maxval = self.stddev = self.minval = None
+        self._stats = {}
         # Cache roi
         self.roi = None
         self.area_sum = None
         self.slice = None
+        # summed-area table, for integrate_areas
+        self._summed_area = None
         # New for multiframe files
         self.nframes = 1
         self.currentframe = 0
@@ -278,6 +299,9 @@ class FabioImage(with_metaclass(FabioMeta, object)):
         """
         Convert to Python Imaging Library 16 bit greyscale image
 
+        The image is decoded by PIL straight from the memory of the numpy
+        array (buffer protocol), without intermediate copy into a string.
+        The result is cached until resetvals.
         """
         if not Image:
             raise RuntimeError("PIL is not installed !!! ")
@@ -285,27 +309,41 @@ class FabioImage(with_metaclass(FabioMeta, object)):
             self.read(filename)
         if self.pilimage is not None:
             return self.pilimage
-        # mode map
-        size = self.data.shape[:2][::-1]
-        typmap = {
-                  'float32': "F",
-                  'int32': "F;32NS",
-                  'uint32': "F;32N",
-                  'int16': "F;16NS",
-                  'uint16': "F;16N",
-                  'int8': "F;8S",
-                  'uint8': "F;8"
-                 }
-        if self.data.dtype.name in typmap:
-            mode2 = typmap[self.data.dtype.name]
-            mode1 = mode2[0]
-        else:
+        data = numpy.ascontiguousarray(self.data)
+        if data.dtype.kind == "b":
+            data = data.view(numpy.uint8)
+        size = data.shape[-2:][::-1]
+        dtype = data.dtype
+        key = (dtype.kind, dtype.itemsize, dtype.byteorder == ">" or (dtype.byteorder == "=" and not numpy.little_endian))
+        if key[0] in "iu" and key[1] == 8:
+            # not handled by PIL
+            data = data.astype(numpy.float64)
+            key = ("f", 8, not numpy.little_endian)
+        if key not in PIL_RAWMODES:
             raise RuntimeError("Unknown numpy type: %s" % (self.data.dtype.type))
-        dats = self.data.tostring()
-        self.pilimage = Image.frombuffer(mode1, size, dats, "raw", mode2, 0, 1)
-
+        self.pilimage = Image.frombuffer("F", size, data, "raw", PIL_RAWMODES[key], 0, 1)
         return self.pilimage
 
+    def thumbnail(self, size=256, scale="log", filename=None, percentiles=(1, 99)):
+        """
+        Small 8 bit preview of the image
+
+        The image is binned by a blocked mean (fabio.reduction.rebin) and
+        scaled to 8 bits with numpy: PIL is only used to save the preview.
+
+        @param size: maximum size of the thumbnail, in pixels, or (width, height)
+        @param scale: "linear", "log" or "percentile" (linear between percentiles)
+        @param filename: if given, the thumbnail is saved (PNG, JPEG or any
+            format known by PIL from the extension)
+        @param percentiles: lower and upper percentiles for the percentile scale
+        @return: 2D numpy array of uint8
+        """
+        from .thumbnail import thumbnail, save_thumbnail
+        res = thumbnail(self.data, size, scale, percentiles)
+        if filename:
+            save_thumbnail(res, filename)
+        return res
+
     def getheader(self):
         """ returns self.header """
         return self.header
@@ -324,6 +362,39 @@ class FabioImage(with_metaclass(FabioMeta, object)):
                 self.minval = self.data.min()
         return self.minval
 
+    def stats(self, dummy=None, delta_dummy=None, saturation=None, bins=None, hist_range=None, workers=None):
+        """
+        Statistics of the image computed in one pass, cached until resetvals
+
+        A call without masking options also sets the values returned by
+        getmin, getmax, getmean and getstddev, which otherwise compute their
+        own single reduction.
+
+        @param dummy: value of the masked pixels, excluded from the statistics
+        @param delta_dummy: tolerance on the dummy value
+        @param saturation: pixels above or equal to this value are counted as saturated
+        @param bins: number of bins of the histogram (None for no histogram)
+        @param hist_range: range of the histogram, by default the range of the data
+        @param workers: number of threads (default: number of CPU)
+        @return: dict with min, max, mean, std, sum, count, masked, saturated
+            (and histogram and bin_edges when bins is given)
+        """
+        if self.data is None:
+            return None
+        key = (dummy, delta_dummy, saturation, bins, None if hist_range is None else tuple(hist_range))
+        if getattr(self, "_stats", None) is None:
+            self._stats = {}
+        if key not in self._stats:
+            from .reduction import image_stats
+            if workers is None:
+                workers = multiprocessing.cpu_count()
+            res = image_stats(self.data, dummy, delta_dummy, saturation, bins, hist_range, workers)
+            self._stats[key] = res
+            if dummy is None:
+                self.minval, self.maxval = res["min"], res["max"]
+                self.mean, self.stddev = res["mean"], res["std"]
+        return dict(self._stats[key])
+
     def make_slice(self, coords):
         """
         Convert a len(4) set of coords into a len(2)
@@ -348,12 +419,26 @@ class FabioImage(with_metaclass(FabioMeta, object)):
         return (slice(int(fixme[0]), int(fixme[2]) + 1),
                 slice(int(fixme[1]), int(fixme[3]) + 1))
 
-    def integrate_area(self, coords):
+    def _roi_slices(self, coords):
+        """
+        @return: pair of slices for 4 coordinates (see make_slice) or a pair of slices
+        """
+        if len(coords) == 4:
+            return self.make_slice(list(coords))
+        elif len(coords) == 2 and isinstance(coords[0], slice) and \
+                isinstance(coords[1], slice):
+            return tuple(coords)
+        raise ValueError("Region of interest expected as 4 coordinates or 2 slices, got %s" % (coords,))
+
+    def integrate_area(self, coords, summed_area=False):
         """
         Sums up a region of interest
         if len(coords) == 4 -> convert coords to slices
         if len(coords) == 2 -> use as slices
         floor -> ? removed as unused in the function.
+
+        @param summed_area: use (and build if needed) the summed-area table
+            of the image, worth it when many regions are integrated
         """
         if self.data is None:
             # This should return NAN, not zero ?
@@ -364,6 +449,10 @@ class FabioImage(with_metaclass(FabioMeta, object)):
                         isinstance(coords[1], slice):
             sli = coords
 
+        if summed_area or self._summed_area is not None:
+            from .reduction import roi_bounds, area_sums
+            bounds = roi_bounds([sli], self.data.shape[-2:])
+            return float(area_sums(self.summed_area_table(), bounds)[0])
         if sli == self.slice and self.area_sum is not None:
             pass
         elif sli == self.slice and self.roi is not None:
@@ -374,6 +463,35 @@ class FabioImage(with_metaclass(FabioMeta, object)):
             self.area_sum = self.roi.sum(dtype=numpy.float)
         return self.area_sum
 
+    def summed_area_table(self):
+        """
+        Summed-area table of the image, computed once and cached until resetvals
+
+        @return: array of shape (dim2 + 1, dim1 + 1), int64 for integer images,
+            float64 otherwise (see fabio.reduction.summed_area_table)
+        """
+        if self.data is None:
+            return None
+        if self._summed_area is None:
+            from .reduction import summed_area_table
+            self._summed_area = summed_area_table(self.data)
+        return self._summed_area
+
+    def integrate_areas(self, list_of_coords):
+        """
+        Sums up many regions of interest at once, using the summed-area table
+
+        @param list_of_coords: list of regions, each given as 4 coordinates
+            or a pair of slices (see integrate_area)
+        @return: 1D numpy array of float64 with the sum of each region
+        """
+        if self.data is None:
+            return numpy.zeros(len(list_of_coords))
+        from .reduction import roi_bounds, area_sums
+        slices = [self._roi_slices(coords) for coords in list_of_coords]
+        bounds = roi_bounds(slices, self.data.shape[-2:])
+        return area_sums(self.summed_area_table(), bounds).astype(numpy.float64)
+
     def getmean(self):
         """ return the mean """
         if self.mean is None:
@@ -401,47 +519,43 @@ class FabioImage(with_metaclass(FabioMeta, object)):
         """ Reset cache - call on changing data """
         self.mean = self.stddev = self.maxval = self.minval = None
         self.roi = self.slice = self.area_sum = None
+        self._stats = {}
+        self._summed_area = None
+        self.pilimage = None
 
-    def rebin(self, x_rebin_fact, y_rebin_fact, keep_I=True):
+    def rebin(self, x_rebin_fact, y_rebin_fact, keep_I=True, edge=None, method=None):
         """
         Rebin the data and adjust dims
         @param x_rebin_fact: x binning factor
         @param y_rebin_fact: y binning factor
         @param keep_I: shall the signal increase ?
+        @param edge: None to refuse sizes not divisible by the factors, else
+            "trim", "pad" or "partial" (see fabio.reduction.rebin)
+        @param method: "sum", "mean" or "max", overrides keep_I
         @type x_rebin_fact: int
         @type y_rebin_fact: int
         @type keep_I: boolean
 
 
         """
+        from .reduction import rebin
         if self.data is None:
             raise Exception('Please read in the file you wish to rebin first')
 
-        if (self.dim1 % x_rebin_fact != 0) or (self.dim2 % y_rebin_fact != 0):
+        shape = self.data.shape
+        if edge is None and ((shape[-1] % x_rebin_fact != 0) or (shape[-2] % y_rebin_fact != 0)):
             raise RuntimeError('image size is not divisible by rebin factor - '
                                'skipping rebin')
-        else:
-            dataIn = self.data.astype("float64")
-            shapeIn = self.data.shape
-            shapeOut = (shapeIn[0] // y_rebin_fact, shapeIn[1] // x_rebin_fact)
-            binsize = y_rebin_fact * x_rebin_fact
-            if binsize < 50:  # method faster for small binning (4x4)
-                out = numpy.zeros(shapeOut, dtype="float64")
-                for j in range(x_rebin_fact):
-                    for i in range(y_rebin_fact):
-                        out += dataIn[i::y_rebin_fact, j::x_rebin_fact]
-            else:  # method faster for large binning (8x8)
-                temp = self.data.astype("float64")
-                temp.shape = (shapeOut[0], y_rebin_fact, shapeOut[1], x_rebin_fact)
-                out = temp.sum(axis=3).sum(axis=1)
+        if method is None:
+            method = "mean" if keep_I else "sum"
+        dtype = None
+        if method == "max" or self.data.dtype == numpy.float64:
+            # accumulated in the type of the data: no cast needed
+            dtype = self.data.dtype
+        out = rebin(self.data, (y_rebin_fact, x_rebin_fact), method, edge or "trim", dtype=dtype)
         self.resetvals()
-        if keep_I:
-            self.data = (out / (y_rebin_fact * x_rebin_fact)).astype(self.data.dtype)
-        else:
-            self.data = out.astype(self.data.dtype)
-
-        self.dim1 = self.dim1 / x_rebin_fact
-        self.dim2 = self.dim2 / y_rebin_fact
+        self.data = out.astype(self.data.dtype, copy=False)
+        self.dim2, self.dim1 = self.data.shape[-2:]
 
         # update header
         self.update_header()
@@ -492,6 +606,17 @@ class FabioImage(with_metaclass(FabioMeta, object)):
         "Wrapper for read"
         return self.read(*arg, **kwarg)
 
+    def get_frame_location(self, num=None):
+        """
+        Position of the raw data of a frame in its file, allowing to read it
+        directly (partially or concurrently) without going through the reader.
+
+        @param num: frame number, by default the current one
+        @return: 4-tuple (filename, offset, shape, dtype) or None if the frame
+                 is not stored uncompressed at a fixed position of a plain file
+        """
+        return None
+
     def readROI(self, filename, frame=None, coords=None):
         """
         Method reading Region of Interest.
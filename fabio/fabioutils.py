@@ -46,6 +46,7 @@ import re
 import os
 import logging
 import sys
+import numpy
 logger = logging.getLogger("fabioutils")
 
 try:
@@ -441,6 +442,23 @@ class BytesIO(six.BytesIO):
         self.__size = size
     size = property(getSize, setSize)
 
+    def pread(self, size, offset):
+        """
+        Read size bytes at offset without using nor moving the stream position
+
+        @param size: number of bytes to read
+        @param offset: position of the first byte
+        @return: bytes (shorter than size at the end of the stream)
+        """
+        if "getbuffer" not in dir(self):
+            # python2: no buffer export, fall back on the lock
+            return _locked_pread(self, size, offset)
+        view = self.getbuffer()
+        try:
+            return view[offset:offset + size].tobytes()
+        finally:
+            view.release()
+
 
 class File(FileIO):
     """
@@ -499,6 +517,54 @@ class File(FileIO):
         self.__size = size
     size = property(getSize, setSize)
 
+    def pread(self, size, offset):
+        """
+        Read size bytes at offset without using nor moving the file pointer.
+
+        Relies on os.pread when available so that several threads can read
+        different parts of the same file concurrently, without locking.
+
+        @param size: number of bytes to read
+        @param offset: position of the first byte in the file
+        @return: bytes (shorter than size at the end of the file)
+        """
+        if _os_pread is None:
+            return _locked_pread(self, size, offset)
+        fd = self.fileno()
+        chunk = _os_pread(fd, size, offset)
+        if len(chunk) == size or not chunk:
+            return chunk
+        chunks = [chunk]
+        read = len(chunk)
+        while read < size:
+            chunk = _os_pread(fd, size - read, offset + read)
+            if not chunk:
+                break
+            chunks.append(chunk)
+            read += len(chunk)
+        return b"".join(chunks)
+
+    def preadinto(self, array, offset):
+        """
+        Fill a numpy array with the content of the file starting at offset,
+        without using nor moving the file pointer.
+
+        @param array: C-contiguous numpy array
+        @param offset: position of the first byte in the file
+        @return: number of bytes read
+        """
+        if _os_preadv is None:
+            return _preadinto(self, array, offset)
+        fd = self.fileno()
+        buf = array.reshape(-1).view("uint8")
+        read = 0
+        while read < buf.nbytes:
+            count = _os_preadv(fd, [buf[read:]], offset + read)
+            if count == 0:
+                break
+            read += count
+        return read
+
     def __exit__(self, *args, **kwargs):
         """
         Close the file.
@@ -627,6 +693,88 @@ else:
             return self
 
 
+_os_pread = getattr(os, "pread", None)
+_os_preadv = getattr(os, "preadv", None)
+
+
+def _locked_pread(fileobj, size, offset):
+    """
+    Positional read for streams without native support: seek and read while
+    holding the lock of the stream (if any)
+    """
+    lock = getattr(fileobj, "lock", None)
+    if lock is None:
+        fileobj.seek(offset)
+        return fileobj.read(size)
+    with lock:
+        fileobj.seek(offset)
+        return fileobj.read(size)
+
+
+def _preadinto(fileobj, array, offset):
+    """
+    Fill a numpy array using the positional read of the stream
+
+    @return: number of bytes read
+    """
+    buf = array.reshape(-1).view("uint8")
+    raw = pread(fileobj, buf.nbytes, offset)
+    buf[:len(raw)] = numpy.frombuffer(raw, dtype="uint8")
+    return len(raw)
+
+
+def pread(fileobj, size, offset):
+    """
+    Read size bytes at offset in a file-like object, in a thread-safe manner.
+
+    FabIO's files read without locking (positional I/O) while other streams
+    are read with seek + read under their lock.
+
+    @param fileobj: file-like object (preferably opened by FabIO)
+    @param size: number of bytes to read
+    @param offset: position of the first byte
+    @return: bytes (shorter than size at the end of the stream)
+    """
+    if "pread" in dir(fileobj):
+        return fileobj.pread(size, offset)
+    return _locked_pread(fileobj, size, offset)
+
+
+def preadinto(fileobj, array, offset):
+    """
+    Fill a numpy array with the content of a file-like object starting at
+    offset, in a thread-safe manner and without intermediate copy when possible.
+
+    @param fileobj: file-like object (preferably opened by FabIO)
+    @param array: C-contiguous numpy array to be filled
+    @param offset: position of the first byte
+    @return: number of bytes read
+    """
+    if "preadinto" in dir(fileobj):
+        return fileobj.preadinto(array, offset)
+    return _preadinto(fileobj, array, offset)
+
+
+def read_array(fileobj, offset, shape, dtype):
+    """
+    Read a numpy array stored contiguously at offset in a file-like object
+
+    Missing bytes at the end of the stream are left as zeros.
+
+    @param fileobj: file-like object (preferably opened by FabIO)
+    @param offset: position of the first byte
+    @param shape: shape of the array
+    @param dtype: data type of the array
+    @return: numpy array
+    """
+    data = numpy.empty(shape, dtype=dtype)
+    read = preadinto(fileobj, data, offset)
+    if read < data.nbytes:
+        logger.error("Data stream is incomplete: %s < expected %s bytes" % (read, data.nbytes))
+        data.reshape(-1).view("uint8")[read:] = 0
+    return data
+
+
 class NotGoodReader(RuntimeError):
     """The reader used is probably not the good one
     """
@@ -668,6 +816,53 @@ class DebugSemaphore(_Semaphore):
         self.release()
 
 
+def is_plain_file(filename):
+    """
+    Tells if a file can be read directly at a given offset, i.e. it is an
+    existing file on disk, not compressed by gzip or bzip2.
+
+    @param filename: string
+    @return: boolean
+    """
+    if not isinstance(filename, StringTypes) or not os.path.isfile(filename):
+        return False
+    return os.path.splitext(filename)[1].lower() not in (".gz", ".bz2")
+
+
+def memmap_stack(filename, offset, shape, dtype, stride=None):
+    """
+    Copy-on-write memory map of a stack of frames stored at a fixed position
+    of a file: frames are zero-copy views and reading one costs only page
+    faults. Frames can be modified in memory, the file is never written.
+
+    @param filename: name of a plain (uncompressed) file
+    @param offset: position of the first pixel of the first frame
+    @param shape: 3-tuple (nframes, rows, columns)
+    @param dtype: data type of the pixels
+    @param stride: distance in bytes between the start of two frames
+                   (default: frames are contiguous)
+    @return: 3D numpy array backed by a numpy.memmap or None if the file
+             cannot be mapped (compressed, truncated, ...)
+    """
+    if not is_plain_file(filename):
+        return None
+    dtype = numpy.dtype(dtype)
+    nframes, rows, columns = [int(i) for i in shape]
+    frame_size = rows * columns * dtype.itemsize
+    if stride is None:
+        stride = frame_size
+    size = offset + max(nframes - 1, 0) * stride + frame_size
+    if nframes < 1 or frame_size == 0 or os.path.getsize(filename) < size:
+        return None
+    try:
+        raw = numpy.memmap(filename, dtype=numpy.uint8, mode="c", shape=(size,))
+    except (IOError, OSError, ValueError) as error:
+        logger.warning("Unable to memory-map %s: %s", filename, error)
+        return None
+    return numpy.ndarray((nframes, rows, columns), dtype=dtype, buffer=raw, offset=offset,
+                         strides=(stride, columns * dtype.itemsize, dtype.itemsize))
+
+
 def exists(path):
     """Test whether a path exists.
     
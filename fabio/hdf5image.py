@@ -35,6 +35,11 @@ input should being the form:
 
 filename::path
 
+or an URL, optionally with a selection using the numpy syntax, read with a
+single hyperslab selection:
+
+hdf5:///example.h5?entry/instrument/detector/data#slice=[:,100:200,::2]
+
 Only supports ndim=2 or 3 (exposed as a stack of images
 """
 # Get ready for python3:
@@ -55,12 +60,71 @@ from .fabioimage import FabioImage
 logger = logging.getLogger("hdf5image")
 if sys.version_info[0] < 3:
     bytes = str
+    from urlparse import urlparse
+else:
+    from urllib.parse import urlparse
 
 try:
     import h5py
 except ImportError:
     h5py = None
 from .fabioutils import previous_filename, next_filename
+from . import hdf5pool
+
+
+def parse_slice(text):
+    """
+    Parse a selection written with the numpy syntax, like "[5, 100:200, ::2]"
+
+    @param text: the selection, with or without brackets
+    @return: tuple of int, slice or Ellipsis
+    """
+    text = text.strip()
+    if text.startswith("[") and text.endswith("]"):
+        text = text[1:-1]
+    selection = []
+    for item in text.split(","):
+        item = item.strip()
+        if item == "...":
+            selection.append(Ellipsis)
+        elif ":" in item:
+            parts = [int(i) if i.strip() else None for i in item.split(":")]
+            if len(parts) > 3:
+                raise ValueError("Invalid slice %s" % item)
+            selection.append(slice(*parts))
+        else:
+            selection.append(int(item))
+    return tuple(selection)
+
+
+def normalize_selection(selection, shape):
+    """
+    Expand a selection to one explicit int or slice per dimension
+
+    @param selection: tuple of int, slice or Ellipsis
+    @param shape: shape of the dataset
+    @return: tuple of int or slice with positive start, stop and step
+    """
+    selection = list(selection)
+    if Ellipsis in selection:
+        index = selection.index(Ellipsis)
+        selection[index:index + 1] = [slice(None)] * (len(shape) - len(selection) + 1)
+    if len(selection) > len(shape):
+        raise IndexError("Selection %s has too many dimensions for shape %s" % (selection, shape))
+    selection += [slice(None)] * (len(shape) - len(selection))
+    result = []
+    for item, size in zip(selection, shape):
+        if isinstance(item, slice):
+            start, stop, step = item.indices(size)
+            if step < 1:
+                raise ValueError("Only positive steps are supported in HDF5 selections")
+            result.append(slice(start, max(start, stop), step))
+        else:
+            index = item + size if item < 0 else item
+            if not 0 <= index < size:
+                raise IndexError("Index %s out of range for size %s" % (item, size))
+            result.append(index)
+    return tuple(result)
 
 
 class Hdf5Image(FabioImage):
@@ -80,14 +144,53 @@ class Hdf5Image(FabioImage):
         FabioImage.__init__(self, *arg, **kwargs)
         self.hdf5 = None
         self.dataset = None
+        self._url_selection = None  # selection requested in the URL, for the next read
+        self._selection = None  # normalized selection, one item per dimension
+
+    def close(self):
+        """
+        Release the HDF5 file, shared with the other images of the same file
+        """
+        if self.hdf5 is not None:
+            hdf5pool.pool.release(self.hdf5)
+            self.hdf5 = None
+        self.dataset = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def set_url(self, url):
+        """
+        Define the file, the dataset and the selection to read from an URL like
+        hdf5:///example.h5?entry/instrument/detector/data#slice=[:,100:200,5]
+
+        @param url: URL as a string or as parsed by urlparse
+        """
+        if not hasattr(url, "fragment"):
+            url = urlparse(url)
+        selection = None
+        for item in url.fragment.split("&"):
+            if item.startswith("slice="):
+                selection = parse_slice(item[len("slice="):])
+        self._url_selection = selection
+        self.filename = "%s::%s" % (url.path, url.query)
 
     def read(self, fname, frame=None):
         """
         try to read image
-        @param fname: filename::datasetpath
+        @param fname: filename::datasetpath or hdf5:// URL
         """
 
+        self.close()
         self.resetvals()
+        if fname.startswith("hdf5:") or fname.startswith("nxs:"):
+            self.set_url(fname)
+            fname = self.filename
+        # the selection of an URL only applies to the read following set_url
+        url_selection, self._url_selection = self._url_selection, None
         if "::" not in fname:
             err = "the '::' separator in mandatory for HDF5 container, absent in %s" % fname
             logger.error(err)
@@ -96,7 +199,7 @@ class Hdf5Image(FabioImage):
 
         self.filename = filename
         if os.path.isfile(self.filename):
-            self.hdf5 = h5py.File(self.filename, "r")
+            self.hdf5 = hdf5pool.pool.acquire(self.filename)
         else:
             error = "No such file or directory: %s" % self.filename
             logger.error(error)
@@ -111,23 +214,83 @@ class Hdf5Image(FabioImage):
             logger.warning("The actual dataset is ")
             self.dataset = self.dataset["data"]
 
-        # ndim does not exist for external links ?
-        ndim = len(self.dataset.shape)
+        self._selection = None
+        if url_selection is not None:
+            self._selection = normalize_selection(url_selection, self.dataset.shape)
+            shape = self._selected_shape()
+        else:
+            # ndim does not exist for external links ?
+            shape = self.dataset.shape
+        ndim = self._selected_ndim()
         if ndim == 3:
-            self.nframes = self.dataset.shape[0]
+            self.nframes = shape[0]
             if frame is not None:
                 self.currentframe = int(frame)
             else:
                 self.currentframe = 0
-            self.data = self.dataset[self.currentframe, :, :]
+            self.data = self._read_frame(self.currentframe)
         elif ndim == 2:
-            self.data = self.dataset[:, :]
+            self.nframes = 1
+            self.data = self._read_frame(None)
+        elif ndim == 1 and self._selection is not None:
+            self.nframes = 1
+            self.data = self._read_frame(None).reshape(1, -1)
         else:
-            err = "Only 2D and 3D datasets are supported by FabIO, here %sD" % self.dataset.ndim
+            err = "Only 2D and 3D datasets are supported by FabIO, here %sD" % ndim
             logger.error(err)
             raise RuntimeError(err)
         return self
 
+    def _selected_shape(self):
+        """
+        @return: shape of the selection of the dataset
+        """
+        return tuple(len(range(item.start, item.stop, item.step))
+                     for item in self._selection if isinstance(item, slice))
+
+    def _selected_ndim(self):
+        """
+        @return: number of dimensions of the dataset, or of its selection
+        """
+        if self._selection is None:
+            return len(self.dataset.shape)
+        return len(self._selected_shape())
+
+    def _frames_selection(self, start, stop, step=1):
+        """
+        Selection of the dataset for frames range(start, stop, step)
+
+        @return: tuple usable as h5py selection, or as source_sel for read_direct
+        """
+        if self._selection is None:
+            if len(self.dataset.shape) == 2:
+                return numpy.s_[:, :]
+            return numpy.s_[start:stop:step, :, :]
+        selection = list(self._selection)
+        for axis, item in enumerate(selection):
+            if isinstance(item, slice):
+                # the first selected axis holds the frames
+                frames = range(start, stop, step)
+                first = item.start + frames[0] * item.step
+                last = item.start + frames[-1] * item.step
+                selection[axis] = slice(first, last + 1, step * item.step)
+                break
+        return tuple(selection)
+
+    def _read_frame(self, num):
+        """
+        Read one frame (of the selection if any) with a single hyperslab selection
+
+        @param num: frame number, None for 2D datasets or selections
+        @return: numpy array
+        """
+        if num is None:
+            if self._selection is None:
+                return self.dataset[()]
+            return self.dataset[self._selection]
+        selection = self._frames_selection(num, num + 1)
+        return self.dataset[selection][0]
+
     def write(self, fname, force_type=numpy.uint16):
         raise NotImplementedError("Write is not implemented")
 
@@ -136,18 +299,53 @@ class Hdf5Image(FabioImage):
         Returns a frame as a new FabioImage object
         @param num: frame number
         """
-        if num < 0 or num > self.nframes:
+        if num < 0 or num >= self.nframes:
             raise RuntimeError("Requested frame number %i is out of range [0, %i[ " % (num, self.nframes))
         # Do a deep copy of the header to make a new one
         frame = self.__class__(header=self.header)
-        frame.hdf5 = self.hdf5
+        frame.hdf5 = hdf5pool.pool.retain(self.hdf5)
         frame.dataset = self.dataset
         frame.filename = self.filename
         frame.nframes = self.nframes
-        frame.data = self.dataset[num, :, :]
+        frame._selection = self._selection
+        if self._selected_ndim() == 3:
+            frame.data = self._read_frame(num)
+        else:
+            # single frame, as in read()
+            data = self._read_frame(None)
+            if data.ndim == 1:
+                data = data.reshape(1, -1)
+            frame.data = data
         frame.currentframe = num
         return frame
 
+    def read_frames(self, start, stop, step=1, out=None):
+        """
+        Read several frames at once, frames range(start, stop, step), with a
+        single hyperslab selection read directly into the output array
+
+        @param start: index of the first frame
+        @param stop: index after the last frame
+        @param step: distance between two frames
+        @param out: optional array of shape (nframes, dim2, dim1) to be filled
+        @return: 3D numpy array
+        """
+        frames = range(start, stop, step)
+        if step < 1 or len(frames) == 0 or start < 0 or frames[-1] >= self.nframes:
+            raise IndexError("read_frames [%s:%s:%s] out of range [0, %s[" % (start, stop, step, self.nframes))
+        shape = (len(frames),) + tuple(self.data.shape)
+        if out is None:
+            out = numpy.empty(shape, dtype=self.dataset.dtype.newbyteorder("="))
+        elif out.shape != shape:
+            raise ValueError("Output array of shape %s expected, got %s" % (shape, out.shape))
+        if self.nframes == 1:
+            out[0] = self._read_frame(None).reshape(shape[1:])
+        elif out.flags.c_contiguous:
+            self.dataset.read_direct(out, self._frames_selection(frames[0], frames[-1] + 1, step))
+        else:
+            out[...] = self.dataset[self._frames_selection(frames[0], frames[-1] + 1, step)]
+        return out
+
     def next(self):
         """
         Get the next image in a series as a fabio image
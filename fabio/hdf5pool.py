@@ -0,0 +1,190 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""Pool of HDF5 files opened read-only, shared between images
+
+Opening an HDF5 file reads its superblock and metadata: images of the same
+file share one h5py.File from the pool. Each handle is reference-counted:
+images acquire it when reading and release it when closed. A handle is closed
+as soon as no image uses it, unless the pool is asked to keep some idle files
+open (keep_idle), in least-recently-used order. A file modified on disk (other
+modification time or size) gets a new handle.
+"""
+from __future__ import absolute_import, print_function, with_statement, division
+
+__author__ = "Jérôme Kieffer"
+__contact__ = "Jerome.Kieffer@ESRF.eu"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__date__ = "18/10/2016"
+__status__ = "development"
+
+import os
+import threading
+import logging
+from collections import OrderedDict
+logger = logging.getLogger("hdf5pool")
+
+try:
+    import h5py
+except ImportError:
+    h5py = None
+
+
+class Hdf5FilePool(object):
+    """
+    LRU pool of reference-counted, read-only h5py.File
+    """
+    def __init__(self, keep_idle=0):
+        """
+        @param keep_idle: number of files kept open when not in use any more
+                          (by default they are closed once released)
+        """
+        self.keep_idle = keep_idle
+        self._lock = threading.Lock()
+        self._files = OrderedDict()  # key -> h5py.File, least recently used first
+        self._refcount = {}  # key -> number of users
+        self._keys = {}  # id(h5py.File) -> key
+        self._latest = {}  # path -> most recent key
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __repr__(self):
+        return "Hdf5FilePool with %s open files (%s kept idle), %s hits, %s misses" % \
+            (len(self._files), self.keep_idle, self.hits, self.misses)
+
+    @staticmethod
+    def _key(filename):
+        """
+        @return: key identifying a version of a file: (path, mtime, size)
+        """
+        path = os.path.abspath(filename)
+        stat = os.stat(path)
+        return path, stat.st_mtime, stat.st_size
+
+    def acquire(self, filename):
+        """
+        Get an open HDF5 file, to be given back with release()
+
+        @param filename: name of the HDF5 file
+        @return: h5py.File opened read-only
+        """
+        if h5py is None:
+            raise RuntimeError("h5py module is missing: HDF5 files not supported")
+        key = self._key(filename)
+        with self._lock:
+            h5 = self._files.pop(key, None)
+            if h5 is not None and h5.id.valid:
+                self.hits += 1
+            else:
+                self.misses += 1
+                h5 = h5py.File(key[0], mode="r")
+                self._refcount[key] = 0
+                self._keys[id(h5)] = key
+                previous = self._latest.get(key[0])
+                self._latest[key[0]] = key
+                if previous is not None and previous in self._files and self._refcount[previous] == 0:
+                    self._close(previous)
+            self._files[key] = h5
+            self._refcount[key] += 1
+            self._evict()
+        return h5
+
+    def retain(self, h5):
+        """
+        Take one more reference on a file obtained from acquire()
+
+        @param h5: h5py.File from this pool
+        @return: the same h5py.File
+        """
+        with self._lock:
+            key = self._keys.get(id(h5))
+            if key is not None and key in self._files:
+                self._refcount[key] += 1
+        return h5
+
+    def release(self, h5):
+        """
+        Give back a file obtained from acquire() or retain()
+
+        @param h5: h5py.File from this pool
+        """
+        with self._lock:
+            key = self._keys.get(id(h5))
+            if key is None or key not in self._files:
+                return
+            self._refcount[key] = max(0, self._refcount[key] - 1)
+            if self._refcount[key] == 0 and self._latest.get(key[0]) != key:
+                # outdated version of a modified file
+                self._close(key)
+            else:
+                self._evict()
+
+    def _close(self, key):
+        """Close a file of the pool, lock already held"""
+        h5 = self._files.pop(key)
+        self._refcount.pop(key, None)
+        self._keys.pop(id(h5), None)
+        if self._latest.get(key[0]) == key:
+            self._latest.pop(key[0])
+        try:
+            h5.close()
+        except Exception as error:
+            logger.warning("Error while closing %s: %s", key[0], error)
+
+    def _evict(self):
+        """Close least recently used idle files above keep_idle, lock already held"""
+        idle = [key for key in self._files if self._refcount[key] == 0]
+        for key in idle[:max(0, len(idle) - self.keep_idle)]:
+            self._close(key)
+            self.evictions += 1
+
+    def clear(self):
+        """
+        Close all files, including those in use
+        """
+        with self._lock:
+            for key in list(self._files):
+                self._close(key)
+
+    def stats(self):
+        """
+        @return: dict with the number of hits, misses, evictions, open files and files in use
+        """
+        with self._lock:
+            return {"hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions,
+                    "open": len(self._files),
+                    "in_use": sum(1 for count in self._refcount.values() if count > 0)}
+
+
+# Pool shared by all HDF5-based images
+pool = Hdf5FilePool()
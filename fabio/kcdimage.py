@@ -42,6 +42,7 @@ import os
 import string
 from .fabioimage import FabioImage
 from .fabioutils import six
+from .converters import convert_data_integer, WRITER_DTYPES
 logger = logging.getLogger("kcdimage")
 
 DATA_TYPES = {"u16": numpy.uint16 }
@@ -160,10 +161,11 @@ class KcdImage(FabioImage):
 
     @staticmethod
     def checkData(data=None):
-        if data is None:
-            return None
-        else:
-            return data.astype(int)
+        """
+        @param data: array like
+        @return: the data as the narrowest integer type able to hold them
+        """
+        return convert_data_integer(data, WRITER_DTYPES["kcdimage"])
 
 
 kcdimage = KcdImage
@@ -65,6 +65,7 @@ from .fabioimage import FabioImage
 
 logger = logging.getLogger("mar345image")
 from .compression import compPCK, decPCK
+from .converters import integer_dtype, WRITER_DTYPES
 
 
 class Mar345Image(FabioImage):
@@ -386,7 +387,7 @@ class Mar345Image(FabioImage):
             shape = data.shape
             assert len(shape) == 2, "image has 2 dimensions"
             mshape = max(shape)
-            z = numpy.zeros((mshape, mshape), dtype=int)
+            z = numpy.zeros((mshape, mshape), dtype=integer_dtype(data, WRITER_DTYPES["mar345image"]))
             z[:shape[0], :shape[1]] = data
             return z
 
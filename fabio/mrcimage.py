@@ -45,9 +45,10 @@ import logging
 import sys
 import numpy
 from .fabioimage import FabioImage
-from .fabioutils import previous_filename, next_filename
+from .fabioutils import previous_filename, next_filename, read_array, is_plain_file, \
+    memmap_stack
 logger = logging.getLogger("mrcimage")
-if sys.version_info < (3.0):
+if sys.version_info < (3, 0):
     bytes = str
 
 
@@ -61,6 +62,8 @@ class MrcImage(FabioImage):
             "MAPC", "MAPR", "MAPS", "DMIN", "DMAX", "DMEAN", "ISPG", "NSYMBT",
             "EXTRA", "ORIGIN", "MAP", "MACHST", "RMS", "NLABL")
 
+    dataset = None  # memory map of the whole stack, when possible
+
     def _readheader(self, infile):
         """
         Read and decode the header of an image:
@@ -110,6 +113,8 @@ class MrcImage(FabioImage):
 
         with self._open(fname) as infile:
             self._readheader(infile)
+            self.dataset = memmap_stack(fname, self._calc_offset(0),
+                                        (self.nframes, self.dim2, self.dim1), self.bytecode)
             self._readframe(infile, self.currentframe)
         return self
 
@@ -122,6 +127,20 @@ class MrcImage(FabioImage):
         assert frame < self.nframes
         return 1024 + frame * self.imagesize
 
+    def get_frame_location(self, num=None):
+        """
+        Position of the raw data of a frame in the stack
+
+        @param num: frame number, by default the current one
+        @return: 4-tuple (filename, offset, shape, dtype) or None for compressed files
+        """
+        if num is None:
+            num = self.currentframe
+        if not is_plain_file(self.sequencefilename):
+            return None
+        return (self.sequencefilename, self._calc_offset(num),
+                (self.dim2, self.dim1), numpy.dtype(self.bytecode))
+
     def _makeframename(self):
         self.filename = "%s$%04d" % (self.sequencefilename,
                                      self.currentframe)
@@ -134,11 +153,11 @@ class MrcImage(FabioImage):
         """
         if (img_num > self.nframes or img_num < 0):
             raise RuntimeError("Requested frame number is out of range")
-        imgstart = self.header['offset'] + img_num * (512 * 476 * 2 + 24)
-        infile.seek(self.calc_offset(img_num), 0)
-        self.data = numpy.fromstring(infile.read(self.imagesize),
-                                    self.bytecode)
-        self.data.shape = self.dim2, self.dim1
+        if self.dataset is not None:
+            self.data = self.dataset[img_num]
+        else:
+            self.data = read_array(infile, self._calc_offset(img_num),
+                                   (self.dim2, self.dim1), self.bytecode)
         self.currentframe = int(img_num)
         self._makeframename()
 
@@ -154,10 +173,13 @@ class MrcImage(FabioImage):
             raise RuntimeError("Requested frame number is out of range")
         # Do a deep copy of the header to make a new one
         frame = MrcImage(header=self.header.copy())
-        for key in ("dim1", "dim2", "nframes", "bytecode", "imagesize", "sequencefilename"):
+        for key in ("dim1", "dim2", "nframes", "bytecode", "imagesize", "sequencefilename", "dataset"):
             frame.__setattr__(key, self.__getattribute__(key))
-        with frame._open(self.sequencefilename, "rb") as infile:
-            frame._readframe(infile, num)
+        if frame.dataset is not None:
+            frame._readframe(None, num)
+        else:
+            with frame._open(self.sequencefilename, "rb") as infile:
+                frame._readframe(infile, num)
         return frame
 
     def next(self):
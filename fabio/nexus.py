@@ -46,15 +46,21 @@ import os
 import posixpath
 import sys
 import time
+import threading
+import zlib
+import json
 
 from .fabioutils import exists
 from ._version import version
+from . import directchunk
 
 if sys.version_info[0] < 3:
     bytes = str
     from urlparse import urlparse
+    import Queue as queue
 else:
     from urllib.parse import urlparse
+    import queue
 
 
 logger = logging.getLogger("fabio.nexus")
@@ -106,6 +112,19 @@ def from_isotime(text, use_tz=False):
     return time.mktime(time.strptime(base, "%Y-%m-%dT%H:%M:%S")) + tz
 
 
+def _get_nx_class(grp):
+    """
+    @param grp: HDF5 group
+    @return: the NX_class attribute of the group as a string, or None
+    """
+    nx_class = grp.attrs.get("NX_class")
+    if isinstance(nx_class, numpy.ndarray):
+        nx_class = nx_class.tolist()[0] if nx_class.size == 1 else None
+    if isinstance(nx_class, bytes) and not isinstance(nx_class, str):
+        nx_class = nx_class.decode("utf-8")
+    return nx_class
+
+
 def is_hdf5(filename):
     """
     Check if a file is actually a HDF5 file
@@ -131,12 +150,14 @@ class Nexus(object):
 
     #TODO: make it thread-safe !!!
     """
-    def __init__(self, filename, mode="r"):
+    def __init__(self, filename, mode="r", index_file=None, follow_links=False):
         """
         Constructor
 
         @param filename: name of the hdf5 file containing the nexus
         @param mode: can be r or a
+        @param index_file: JSON file where the index of NeXus classes is kept between sessions
+        @param follow_links: set to True to index the groups reached via soft or external links
         """
         self.filename = os.path.abspath(filename)
         self.mode = mode
@@ -146,8 +167,14 @@ class Nexus(object):
         if exists(self.filename) and self.mode == "r":
             self.h5 = h5py.File(self.filename.split("::")[0], mode=self.mode)
         else:
-            self.h5 = h5py.File(self.filename.split("::")[0])
+            self.h5 = h5py.File(self.filename.split("::")[0], mode="a")
         self.to_close = []
+        self.index_file = index_file
+        self.follow_links = bool(follow_links)
+        self._index = None
+        self._index_built = False  # index to be saved at close
+        if index_file is not None:
+            self._index = self._load_index()
 
     def close(self):
         """
@@ -157,6 +184,8 @@ class Nexus(object):
         for entry in self.to_close:
             entry["end_time"] = end_time
         self.h5.close()
+        if self.index_file is not None and self._index is not None and self._index_built:
+            self._save_index()
 
     # Context manager for "with" statement compatibility
     def __enter__(self, *arg, **kwarg):
@@ -165,6 +194,106 @@ class Nexus(object):
     def __exit__(self, *arg, **kwarg):
         self.close()
 
+    def _file_key(self):
+        """
+        @return: identification of the version of the file: [path, mtime, size]
+        """
+        path = self.filename.split("::")[0]
+        stat = os.stat(path)
+        return [path, stat.st_mtime, stat.st_size]
+
+    def _load_index(self):
+        """
+        Read the index saved for this version of the file, if any
+
+        @return: index or None
+        """
+        if not os.path.exists(self.index_file):
+            return None
+        try:
+            with open(self.index_file) as f:
+                saved = json.load(f)
+        except (IOError, ValueError) as error:
+            logger.warning("Unable to read the NeXus index %s: %s", self.index_file, error)
+            return None
+        if saved.get("file") != self._file_key() or \
+                saved.get("follow_links", False) != self.follow_links:
+            logger.debug("NeXus index %s is outdated", self.index_file)
+            return None
+        return {"classes": saved["classes"],
+                "entries": [tuple(i) for i in saved["entries"]]}
+
+    def _save_index(self):
+        """
+        Write the index with the identification of the (closed) file
+        """
+        saved = {"file": self._file_key(),
+                 "follow_links": self.follow_links,
+                 "classes": self._index["classes"],
+                 "entries": self._index["entries"]}
+        try:
+            with open(self.index_file, "w") as f:
+                json.dump(saved, f)
+        except IOError as error:
+            logger.warning("Unable to write the NeXus index %s: %s", self.index_file, error)
+
+    def invalidate_index(self):
+        """
+        Forget the index of NeXus classes, to be called after modifying the
+        file without the methods of this class.
+        """
+        self._index = None
+
+    def get_index(self):
+        """
+        Index of the groups of the file with a NX_class attribute, built on
+        first use by walking the file once.
+
+        Soft and external links are skipped, without being dereferenced,
+        unless follow_links was set.
+
+        @return: dict with "classes": {parent path: {NX_class: [paths]}}
+                 and "entries": [(name, start_time or None)] for root NXentry
+        """
+        if self._index is None:
+            classes = {}
+            visited = set()
+
+            def walk(grp):
+                visited.add(grp.id)
+                children = {}
+                for name in grp:
+                    hard = isinstance(grp.get(name, getlink=True), h5py.HardLink)
+                    if not (hard or self.follow_links):
+                        # do not open the files targeted by external links
+                        continue
+                    try:
+                        sub = grp[name]
+                    except KeyError:  # dangling link
+                        continue
+                    if not isinstance(sub, h5py.Group):
+                        continue
+                    nx_class = _get_nx_class(sub)
+                    if nx_class is not None:
+                        children.setdefault(nx_class, []).append(posixpath.join(grp.name, name))
+                    # links to other places are listed but not followed
+                    if hard and sub.id not in visited:
+                        walk(sub)
+                if children:
+                    classes[grp.name] = children
+
+            walk(self.h5)
+            entries = []
+            for path in classes.get("/", {}).get("NXentry", []):
+                name = posixpath.basename(path)
+                start_time = None
+                if "start_time" in self.h5[name]:
+                    start_time = from_isotime(self.h5[name + "/start_time"][()])
+                entries.append((name, start_time))
+            self._index = {"classes": classes, "entries": entries}
+            self._index_built = True
+        return self._index
+
     def get_entry(self, name):
         """
         Retrieves an entry from its name
@@ -172,14 +301,9 @@ class Nexus(object):
         @param name: name of the entry to retrieve
         @return: HDF5 group of NXclass == NXentry
         """
-        for grp_name in self.h5:
-            if grp_name == name:
-                grp = self.h5[grp_name]
-                if (isinstance(grp, h5py.Group) and
-                   "start_time" in grp and
-                    "NX_class" in grp.attrs and
-                    grp.attrs["NX_class"] == "NXentry"):
-                    return grp
+        for entry, start_time in self.get_index()["entries"]:
+            if entry == name and start_time is not None:
+                return self.h5[entry]
 
     def get_entries(self):
         """
@@ -187,20 +311,12 @@ class Nexus(object):
 
         @return: list of HDF5 groups
         """
-        entries = [(grp, from_isotime(self.h5[grp + "/start_time"].value))
-                   for grp in self.h5
-                   if (isinstance(self.h5[grp], h5py.Group) and
-                       "start_time" in self.h5[grp] and
-                       "NX_class" in self.h5[grp].attrs and
-                       self.h5[grp].attrs["NX_class"] == "NXentry")]
+        entries = [i for i in self.get_index()["entries"] if i[1] is not None]
         if entries:
             entries.sort(key=lambda a: a[1], reverse=True)  # sort entries in decreasing time
             return [self.h5[i[0]] for i in entries]
         else:  # no entries found, try without sorting by time
-            entries = [grp for grp in self.h5
-                       if (isinstance(self.h5[grp], h5py.Group) and
-                           "NX_class" in self.h5[grp].attrs and
-                           self.h5[grp].attrs["NX_class"] == "NXentry")]
+            entries = [i[0] for i in self.get_index()["entries"]]
             entries.sort(reverse=True)
             return [self.h5[i] for i in entries]
 
@@ -276,6 +392,7 @@ class Nexus(object):
         @return: the corresponding HDF5 group
         """
         nb_entries = len(self.get_entries())
+        self.invalidate_index()
         entry_grp = self.h5.require_group("%s_%04i" % (entry, nb_entries))
         entry_grp.attrs["NX_class"] = "NXentry"
         entry_grp["title"] = numpy.string_(title)
@@ -307,6 +424,7 @@ class Nexus(object):
         """
         sub = grp.require_group(name)
         sub.attrs["NX_class"] = class_type
+        self.invalidate_index()
         return sub
 
     def new_detector(self, name="detector", entry="entry", subentry="pyFAI"):
@@ -324,6 +442,18 @@ class Nexus(object):
         det_grp = self.new_class(pyFAI_grp, name, "NXdetector")
         return det_grp
 
+    def new_data_writer(self, grp, frame_shape, name="data", **kwargs):
+        """
+        Create a dataset in a NXdata group, filled frame by frame
+
+        @param grp: NXdata group (see new_class)
+        @param frame_shape: shape of one frame
+        @param name: name of the dataset
+        @param kwargs: options of FrameWriter (dtype, nframes, chunks, compression, ...)
+        @return: FrameWriter, to be closed when all frames are written
+        """
+        return FrameWriter(grp, frame_shape, name=name, **kwargs)
+
     def get_class(self, grp, class_type="NXcollection"):
         """
         return all sub-groups of the given type within a group
@@ -331,10 +461,13 @@ class Nexus(object):
         @param grp: HDF5 group
         @param class_type: name of the NeXus class
         """
+        if grp.file.id == self.h5.id:
+            paths = self.get_index()["classes"].get(grp.name, {}).get(class_type, [])
+            return [grp[posixpath.basename(path)] for path in paths]
+        # group of another file, reached via an external link
         coll = [grp[name] for name in grp
                 if (isinstance(grp[name], h5py.Group) and
-                    "NX_class" in grp[name].attrs and
-                    grp[name].attrs["NX_class"] == class_type)]
+                    _get_nx_class(grp[name]) == class_type)]
         return coll
 
     def get_data(self, grp, class_type="NXdata"):
@@ -363,6 +496,7 @@ class Nexus(object):
         """
         if (excluded is not None) and (name in excluded):
             return
+        self.invalidate_index()
         if not toplevel:
             toplevel = self.h5[where]
         if isinstance(obj, h5py.Group):
@@ -378,6 +512,172 @@ class Nexus(object):
                 else:
                     logger.warning("Not overwriting %s in %s" % (toplevel[name].name, self.filename))
                     return
-            toplevel[name] = obj.value
+            toplevel[name] = obj[()]
             for k, v in obj.attrs.items():
                 toplevel[name].attrs[k] = v
+
+
+class FrameWriter(object):
+    """
+    Appends frames to a chunked, compressed dataset, using constant memory.
+
+    Frames are gathered chunk by chunk. Full chunks are queued to a
+    background thread which compresses and writes them while the next
+    frames are being read. With gzip compression and chunks made of whole
+    frames, the thread compresses the chunks with zlib (releasing the GIL)
+    and writes them with write_direct_chunk, otherwise it lets libhdf5 apply
+    the filters (lzf, ...).
+    """
+    def __init__(self, grp, frame_shape, name="data", dtype=numpy.float32, nframes=None,
+                 chunks=None, compression="gzip", compression_opts=None, shuffle=False,
+                 queue_size=4, threaded=True):
+        """
+        @param grp: HDF5 group (NXdata) where the dataset is created
+        @param frame_shape: shape of one frame
+        @param name: name of the dataset
+        @param dtype: data type of the dataset
+        @param nframes: number of frames to preallocate, the dataset grows beyond
+        @param chunks: shape of a chunk, by default one frame
+        @param compression: "gzip", "lzf" or None
+        @param compression_opts: compression level for gzip (default 4)
+        @param shuffle: apply the shuffle filter before compression
+        @param queue_size: number of chunks waiting to be written
+        @param threaded: compress and write in a background thread
+        """
+        self.frame_shape = tuple(frame_shape)
+        self.dtype = numpy.dtype(dtype)
+        self.nframes = nframes or 0
+        if chunks is None:
+            chunks = (1,) + self.frame_shape
+        self.chunks = tuple(chunks)
+        if compression == "gzip" and compression_opts is None:
+            compression_opts = 4
+        self.dataset = grp.create_dataset(name, shape=(self.nframes,) + self.frame_shape,
+                                          maxshape=(None,) + self.frame_shape,
+                                          dtype=self.dtype, chunks=self.chunks,
+                                          compression=compression, compression_opts=compression_opts,
+                                          shuffle=shuffle)
+        self.dataset.attrs["interpretation"] = "image"
+        self.dataset.attrs["signal"] = "1"
+        self.name = self.dataset.name
+        self.level = compression_opts
+        self.shuffle = shuffle
+        self.direct = (compression == "gzip" and self.chunks[1:] == self.frame_shape and
+                       "write_direct_chunk" in dir(self.dataset.id))
+        self.count = 0
+        self._buffer = None
+        self._filled = 0
+        self._error = None
+        self._queue = None
+        self._thread = None
+        if threaded:
+            self._queue = queue.Queue(queue_size)
+            self._thread = threading.Thread(target=self._work, name="FrameWriter")
+            self._thread.daemon = True
+            self._thread.start()
+
+    def __repr__(self):
+        return "FrameWriter of %s frames to %s" % (self.count, self.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *arg):
+        self.close()
+
+    def _work(self):
+        """Background thread: write the queued chunks"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            if self._error is None:
+                try:
+                    self._write(*item)
+                except Exception as error:
+                    logger.error("Error while writing %s: %s", self.name, error)
+                    self._error = error
+
+    def _write(self, start, count, block):
+        """
+        Write count frames of block, starting at frame start
+
+        @param start: index of the first frame of block
+        @param count: number of valid frames in block
+        @param block: array of the shape of a chunk
+        """
+        if start + count > self.dataset.shape[0]:
+            self.dataset.resize(start + count, axis=0)
+        if self.direct:
+            if count < block.shape[0]:
+                block[count:] = 0
+            raw = block.astype(self.dataset.dtype, copy=False)
+            raw = directchunk.shuffle(raw) if self.shuffle else raw.tobytes()
+            self.dataset.id.write_direct_chunk((start,) + (0,) * len(self.frame_shape),
+                                               zlib.compress(raw, self.level))
+        else:
+            self.dataset[start:start + count] = block[:count]
+
+    def _check(self):
+        """Raise the error of the writing thread, if any"""
+        if self._error is not None:
+            raise self._error
+
+    def _submit(self):
+        """Hand the current chunk over to the writing thread"""
+        if not self._filled:
+            return
+        start = self.count - self._filled
+        item = (start, self._filled, self._buffer)
+        self._buffer = None
+        self._filled = 0
+        if self._queue is None:
+            self._write(*item)
+        else:
+            self._queue.put(item)
+
+    def append(self, frame):
+        """
+        Add one frame at the end of the dataset
+
+        @param frame: 2D array of shape frame_shape
+        """
+        self._check()
+        frame = numpy.asarray(frame)
+        if frame.shape != self.frame_shape:
+            raise ValueError("Frame of shape %s expected, got %s" % (self.frame_shape, frame.shape))
+        if self._buffer is None:
+            self._buffer = numpy.empty(self.chunks[:1] + self.frame_shape, dtype=self.dtype)
+        self._buffer[self._filled] = frame
+        self._filled += 1
+        self.count += 1
+        if self._filled == self.chunks[0]:
+            self._submit()
+
+    def extend(self, frames):
+        """
+        Add a block of frames at the end of the dataset
+
+        @param frames: 3D array or iterable of frames
+        """
+        for frame in frames:
+            self.append(frame)
+
+    def close(self):
+        """
+        Write the pending frames and wait for the background thread.
+        """
+        if self.dataset is None:
+            return
+        try:
+            self._submit()
+        finally:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread.join()
+                self._thread = None
+        self._check()
+        if self.dataset.shape[0] != max(self.count, self.nframes):
+            self.dataset.resize(max(self.count, self.nframes), axis=0)
+        self.dataset.file.flush()
+        self.dataset = None
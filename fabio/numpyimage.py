@@ -38,6 +38,7 @@ import logging
 logger = logging.getLogger("numpyimage")
 import numpy
 from .fabioimage import FabioImage
+from .fabioutils import is_plain_file
 
 
 class NumpyImage(FabioImage):
@@ -153,8 +154,12 @@ The description of the fourth element of the header therefore has become:
         infile = self._open(fname)
         self._readheader(infile)
 
-        # read the image data
-        self.dataset = numpy.load(infile)
+        # read the image data, memory-mapped when the file allows it
+        if is_plain_file(fname):
+            infile.close()
+            self.dataset = numpy.load(fname, mmap_mode="c")
+        else:
+            self.dataset = numpy.load(infile)
         self.slice_dataset(frame)
         return self
 
@@ -163,7 +168,7 @@ The description of the fourth element of the header therefore has become:
         try to write image 
         @param fname: name of the file 
         """
-        numpy.save(fname, self.dataset)
+        numpy.save(fname, self.data if self.dataset is None else self.dataset)
 
     def getframe(self, num):
         """ returns the frame numbered 'num' in the stack if applicable"""
@@ -202,6 +202,8 @@ def _openimage(filename):
         imo = FabioImage()
         byts = imo._open(actual_filename).read(18)
         filetype = do_magic(byts, filename)
+        if filetype == "eiger" and url.scheme in ["nxs", "hdf5"]:
+            filetype = "hdf5"
     except IOError as error:
         logger.error("%s: File probably does not exist", error)
         raise error
@@ -230,9 +232,9 @@ def _openimage(filename):
         logger.error("Filetype not known %s %s" % (filename, klass_name))
         raise err
 
+    obj.filename = filename
     if url.scheme in ["nxs", "hdf5"] and filetype == "hdf5":
         obj.set_url(url)
-    obj.filename = filename
     # skip the read for read header
     return obj
 
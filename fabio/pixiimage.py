@@ -43,11 +43,16 @@ import numpy
 
 import os
 from .fabioimage import FabioImage
-from .fabioutils import previous_filename, next_filename
+from .fabioutils import previous_filename, next_filename, read_array, is_plain_file, \
+    memmap_stack
+
+
+FRAME_STRIDE = 512 * 476 * 2 + 24
 
 
 class PixiImage(FabioImage):
     _need_a_seek_to_read = True
+    dataset = None  # memory map of the whole sequence, when possible
 
     def _readheader(self, infile):
         infile.seek(0)
@@ -75,11 +80,30 @@ class PixiImage(FabioImage):
         infile = self._open(fname, "rb")
         self.sequencefilename = fname
         self._readheader(infile)
-        self.nframes = os.path.getsize(fname) / 487448
+        self.nframes = os.path.getsize(fname) // FRAME_STRIDE
+        self.dataset = memmap_stack(fname, self.header['offset'],
+                                    (self.nframes, self.header['height'], self.header['width']),
+                                    numpy.uint16, FRAME_STRIDE)
         self._readframe(infile, frame)
         infile.close()
         return self
 
+    def get_frame_location(self, num=None):
+        """
+        Position of the raw data of a frame in the sequence file
+
+        @param num: frame number, by default the current one
+        @return: 4-tuple (filename, offset, shape, dtype) or None for compressed files
+        """
+        if num is None:
+            num = self.currentframe
+        if not is_plain_file(self.sequencefilename):
+            return None
+        return (self.sequencefilename,
+                self.header['offset'] + num * FRAME_STRIDE,
+                (self.header['height'], self.header['width']),
+                numpy.dtype(numpy.uint16))
+
     def _makeframename(self):
         self.filename = "%s$%04d" % (self.sequencefilename,
                                      self.currentframe)
@@ -87,11 +111,13 @@ class PixiImage(FabioImage):
     def _readframe(self, filepointer, img_num):
         if (img_num > self.nframes or img_num < 0):
             raise Exception("Bad image number")
-        imgstart = self.header['offset'] + img_num * (512 * 476 * 2 + 24)
-        filepointer.seek(imgstart, 0)
-        self.data = numpy.fromstring(filepointer.read(512 * 476 * 2),
-                                      numpy.uint16)
-        self.data.shape = self.header['height'], self.header['width']
+        if self.dataset is not None:
+            self.data = self.dataset[img_num]
+        else:
+            imgstart = self.header['offset'] + img_num * FRAME_STRIDE
+            self.data = read_array(filepointer, imgstart,
+                                   (self.header['height'], self.header['width']),
+                                   numpy.uint16)
         self.dim2, self.dim1 = self.data.shape
         self.currentframe = int(img_num)
         self._makeframename()
@@ -112,9 +138,13 @@ class PixiImage(FabioImage):
         frame = pixiimage(header=newheader)
         frame.nframes = self.nframes
         frame.sequencefilename = self.sequencefilename
-        infile = frame._open(self.sequencefilename, "rb")
-        frame._readframe(infile, num)
-        infile.close()
+        frame.dataset = self.dataset
+        if frame.dataset is not None:
+            frame._readframe(None, num)
+        else:
+            infile = frame._open(self.sequencefilename, "rb")
+            frame._readframe(infile, num)
+            infile.close()
         return frame
 
     def next(self):
@@ -0,0 +1,720 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""Streaming per-pixel reductions (mean, std, min, max, sum) over
+multi-frame files and file series.
+
+Frames are read by blocks and accumulated in float64 using Welford's
+update, in bounded memory. The image is split into bands of rows which are
+processed by a pool of threads: numpy releases the GIL during the
+accumulation.
+
+Spatial reductions of a frame (or of each frame of a stack) are provided by
+`image_stats` (statistics in a single pass), `rebin` (binning by sum,
+mean or max) and `summed_area_table` (sums of many regions of interest).
+
+Order statistics over frames are in fabio.stacking, previews in
+fabio.thumbnail.
+"""
+from __future__ import absolute_import, print_function, with_statement, division
+
+__author__ = "Jérôme Kieffer"
+__contact__ = "Jerome.Kieffer@ESRF.eu"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__date__ = "18/10/2016"
+__status__ = "development"
+
+import logging
+import collections
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy
+logger = logging.getLogger("reduction")
+
+from .fabioimage import FabioImage
+from .fabioutils import StringTypes
+
+OPERATIONS = ("mean", "std", "max", "min", "sum")
+
+
+def iter_images(source):
+    """
+    Iterate over the images of a source
+
+    @param source: filename, FabioImage, numpy array or iterable of those
+        (like a file_series)
+    @return: generator of FabioImage or numpy arrays
+    """
+    if isinstance(source, (FabioImage, numpy.ndarray)):
+        yield source
+    elif isinstance(source, StringTypes):
+        from .openimage import openimage
+        yield openimage(source)
+    else:
+        for item in source:
+            for image in iter_images(item):
+                yield image
+
+
+def iter_frames(image):
+    """
+    Iterate over the frames of an image, one by one
+
+    @param image: FabioImage or numpy array
+    @return: generator of 2D arrays
+    """
+    if isinstance(image, numpy.ndarray):
+        if image.ndim == 2:
+            yield image
+        else:
+            for frame in image.reshape((-1,) + image.shape[-2:]):
+                yield frame
+    elif image.nframes <= 1:
+        yield image.data
+    else:
+        for i in range(image.nframes):
+            yield image.getframe(i).data
+
+
+def iter_blocks(source, chunk=16):
+    """
+    Iterate over all frames of a source by blocks of frames
+
+    Formats able to read several frames at once (read_frames) are read
+    block by block, the others frame by frame. The buffer is re-used from
+    one block to the next: copy the block if you need to keep it.
+
+    @param source: filename, FabioImage, numpy array or iterable of those
+    @param chunk: maximum number of frames per block
+    @return: generator of 3D arrays of shape (n <= chunk, rows, cols)
+    """
+    chunk = max(1, int(chunk))
+    buffer = None
+    filled = 0
+    for image in iter_images(source):
+        if isinstance(image, numpy.ndarray) and image.ndim > 2:
+            stack = image.reshape((-1,) + image.shape[-2:])
+            if filled:
+                yield buffer[:filled]
+                filled = 0
+            for start in range(0, len(stack), chunk):
+                yield stack[start:start + chunk]
+            continue
+        if "read_frames" in dir(image) and image.nframes > 1:
+            if filled:
+                yield buffer[:filled]
+                filled = 0
+            shape = image.data.shape
+            if buffer is None or buffer.shape[1:] != shape or buffer.dtype != image.data.dtype:
+                buffer = numpy.empty((chunk,) + shape, dtype=image.data.dtype)
+            for start in range(0, image.nframes, chunk):
+                stop = min(start + chunk, image.nframes)
+                yield image.read_frames(start, stop, out=buffer[:stop - start])
+            continue
+        for frame in iter_frames(image):
+            if buffer is None or buffer.shape[1:] != frame.shape or buffer.dtype != frame.dtype:
+                if filled:
+                    yield buffer[:filled]
+                    filled = 0
+                buffer = numpy.empty((chunk,) + frame.shape, dtype=frame.dtype)
+            buffer[filled] = frame
+            filled += 1
+            if filled == chunk:
+                yield buffer
+                filled = 0
+    if filled:
+        yield buffer[:filled]
+
+
+class Reducer(object):
+    """
+    Accumulates per-pixel statistics over a stream of frames
+
+    The state is stored in float64 (except min and max which keep the type of
+    the data, promoted when frames of another type arrive) and updated with
+    Welford's algorithm, band of rows by band of rows so that several threads
+    can share the work.
+    """
+    def __init__(self, shape, dtype, ops=OPERATIONS, nbands=1):
+        """
+        @param shape: shape of a frame
+        @param dtype: data type of the frames
+        @param ops: list of operations among "mean", "std", "max", "min", "sum"
+        @param nbands: number of bands of rows to split the frames into
+        """
+        for op in ops:
+            if op not in OPERATIONS:
+                raise ValueError("Unknown reduction %s, valid ones are %s" % (op, OPERATIONS))
+        self.ops = tuple(ops)
+        self.shape = tuple(shape)
+        self.dtype = numpy.dtype(dtype)
+        self.count = 0
+        self.mean = self.m2 = self.total = self.maxi = self.mini = None
+        if "std" in self.ops:
+            self.mean = numpy.zeros(self.shape, dtype=numpy.float64)
+            self.m2 = numpy.zeros(self.shape, dtype=numpy.float64)
+        elif "mean" in self.ops:
+            self.total = numpy.zeros(self.shape, dtype=numpy.float64)
+        if "sum" in self.ops:
+            self.total = numpy.zeros(self.shape, dtype=numpy.float64)
+        if "max" in self.ops:
+            self.maxi = numpy.empty(self.shape, dtype=self.dtype)
+        if "min" in self.ops:
+            self.mini = numpy.empty(self.shape, dtype=self.dtype)
+        nbands = max(1, min(int(nbands), self.shape[0]))
+        bounds = numpy.linspace(0, self.shape[0], nbands + 1).astype(int)
+        self.bands = [slice(bounds[i], bounds[i + 1]) for i in range(nbands)]
+        # scratch buffers, one pair per band
+        self._scratch = None
+        if self.m2 is not None:
+            self._scratch = [(numpy.empty((b.stop - b.start,) + self.shape[1:], numpy.float64),
+                              numpy.empty((b.stop - b.start,) + self.shape[1:], numpy.float64))
+                             for b in self.bands]
+
+    def update_band(self, block, band_index):
+        """
+        Accumulate a block of frames on one band of rows
+
+        @param block: 3D array (nframes, rows, cols)
+        @param band_index: index of the band of rows to process
+        """
+        band = self.bands[band_index]
+        count = self.count
+        for frame in block:
+            x = frame[band]
+            count += 1
+            if self.m2 is not None:
+                delta, tmp = self._scratch[band_index]
+                mean = self.mean[band]
+                numpy.subtract(x, mean, out=delta)
+                numpy.multiply(delta, 1.0 / count, out=tmp)
+                mean += tmp
+                numpy.subtract(x, mean, out=tmp)
+                tmp *= delta
+                self.m2[band] += tmp
+            if self.total is not None:
+                total = self.total[band]
+                numpy.add(total, x, out=total)
+            if self.maxi is not None:
+                maxi = self.maxi[band]
+                if count == 1:
+                    maxi[...] = x
+                else:
+                    numpy.maximum(maxi, x, out=maxi)
+            if self.mini is not None:
+                mini = self.mini[band]
+                if count == 1:
+                    mini[...] = x
+                else:
+                    numpy.minimum(mini, x, out=mini)
+
+    def update(self, block, pool=None):
+        """
+        Accumulate a block of frames
+
+        @param block: 3D array (nframes, rows, cols)
+        @param pool: ThreadPool used to process the bands in parallel
+        """
+        if block.shape[1:] != self.shape:
+            raise ValueError("Frame shape %s differs from %s" % (block.shape[1:], self.shape))
+        dtype = numpy.result_type(self.dtype, block.dtype)
+        if dtype != self.dtype:
+            # mixed series: max and min are kept in a type holding both
+            self.dtype = dtype
+            if self.maxi is not None:
+                self.maxi = self.maxi.astype(dtype)
+            if self.mini is not None:
+                self.mini = self.mini.astype(dtype)
+        if pool is None or len(self.bands) == 1:
+            for i in range(len(self.bands)):
+                self.update_band(block, i)
+        else:
+            pool.map(lambda i: self.update_band(block, i), range(len(self.bands)))
+        self.count += len(block)
+
+    def result(self, ddof=0):
+        """
+        @param ddof: delta degrees of freedom for the standard deviation
+        @return: dict with one array per operation and the number of frames as "count"
+        """
+        res = {"count": self.count}
+        if "mean" in self.ops:
+            if self.mean is not None:
+                res["mean"] = self.mean
+            else:
+                res["mean"] = self.total / self.count
+        if "std" in self.ops:
+            res["std"] = numpy.sqrt(self.m2 / max(self.count - ddof, 1))
+        if "sum" in self.ops:
+            res["sum"] = self.total
+        if "max" in self.ops:
+            res["max"] = self.maxi
+        if "min" in self.ops:
+            res["min"] = self.mini
+        return res
+
+
+def reduce(source, ops=OPERATIONS, chunk=16, workers=None, ddof=0):
+    """
+    Per-pixel reductions over all frames of a source, in bounded memory
+
+    Typical use is the averaging of dark frames:
+
+    ::
+
+        dark = fabio.reduction.reduce("dark_0000.edf", ops=("mean", "std"))["mean"]
+
+    @param source: filename, FabioImage, 3D numpy array or iterable of those
+        (like a file_series or a list of filenames)
+    @param ops: list of operations among "mean", "std", "max", "min", "sum"
+    @param chunk: number of frames read at once
+    @param workers: number of threads sharing the accumulation (default: number of CPU)
+    @param ddof: delta degrees of freedom for the standard deviation
+    @return: dict with one 2D array per operation and the number of frames as "count"
+    """
+    if isinstance(ops, StringTypes):
+        ops = (ops,)
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, int(workers))
+    pool = ThreadPool(workers) if workers > 1 else None
+    reducer = None
+    try:
+        for block in iter_blocks(source, chunk):
+            if reducer is None:
+                reducer = Reducer(block.shape[1:], block.dtype, ops, nbands=workers)
+            reducer.update(block, pool)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    if reducer is None:
+        raise RuntimeError("No frame to reduce in %s" % (source,))
+    return reducer.result(ddof)
+
+
+# number of pixels processed at once by image_stats, fits in cache
+STATS_BLOCK = 1 << 17
+
+
+def _valid_pixels(block, dummy=None, delta_dummy=None):
+    """
+    @return: the pixels of the block which are not masked, number of masked pixels
+    """
+    if dummy is None:
+        return block, 0
+    if delta_dummy:
+        valid = abs(block - dummy) > delta_dummy
+    else:
+        valid = block != dummy
+    masked = block.size - int(numpy.count_nonzero(valid))
+    return (block[valid] if masked else block), masked
+
+
+def _block_histogram(block, bins, hist_range, dummy=None, delta_dummy=None):
+    """
+    @return: histogram of the valid pixels of a block
+    """
+    return numpy.histogram(_valid_pixels(block, dummy, delta_dummy)[0], bins, hist_range)[0]
+
+
+def _block_stats(block, dummy=None, delta_dummy=None, saturation=None, bins=None, hist_range=None):
+    """
+    Statistics of a 1D block of pixels
+
+    @return: dict with count, min, max, sum, mean, m2 (sum of squared
+        deviations to the mean), masked, saturated and histogram
+    """
+    block, masked = _valid_pixels(block, dummy, delta_dummy)
+    res = {"count": block.size, "masked": masked, "saturated": 0,
+           "min": None, "max": None, "sum": 0.0, "mean": 0.0, "m2": 0.0, "histogram": None}
+    if block.size:
+        res["min"] = block.min()
+        res["max"] = block.max()
+        total = block.sum(dtype=numpy.float64)
+        mean = total / block.size
+        delta = numpy.subtract(block, mean, dtype=numpy.float64)
+        res["sum"] = total
+        res["mean"] = mean
+        res["m2"] = float(numpy.dot(delta, delta))
+        if saturation is not None:
+            res["saturated"] = int(numpy.count_nonzero(block >= saturation))
+    if bins is not None:
+        res["histogram"] = numpy.histogram(block, bins, hist_range)[0]
+    return res
+
+
+def _merge_stats(first, second):
+    """
+    Combine the statistics of two blocks (Chan et al. parallel variance)
+    """
+    if first["count"] == 0 or second["count"] == 0:
+        res = dict(second if first["count"] == 0 else first)
+        res["masked"] = first["masked"] + second["masked"]
+    else:
+        count = first["count"] + second["count"]
+        delta = second["mean"] - first["mean"]
+        res = {"count": count,
+               "masked": first["masked"] + second["masked"],
+               "saturated": first["saturated"] + second["saturated"],
+               "min": numpy.minimum(first["min"], second["min"]),
+               "max": numpy.maximum(first["max"], second["max"]),
+               "sum": first["sum"] + second["sum"],
+               "mean": first["mean"] + delta * second["count"] / count,
+               "m2": first["m2"] + second["m2"] + delta * delta * first["count"] * second["count"] / count,
+               "histogram": None}
+    if first["histogram"] is not None and second["histogram"] is not None:
+        res["histogram"] = first["histogram"] + second["histogram"]
+    return res
+
+
+def image_stats(data, dummy=None, delta_dummy=None, saturation=None, bins=None, hist_range=None,
+                workers=1, pool=None):
+    """
+    Statistics of an image in a single pass over the data
+
+    The image is processed by blocks small enough to stay in cache, which
+    are shared between threads (numpy releases the GIL) and combined with
+    the parallel algorithm of Chan et al. for the variance.
+
+    @param data: numpy array
+    @param dummy: value of the masked pixels, excluded from the statistics
+    @param delta_dummy: tolerance on the dummy value
+    @param saturation: pixels above or equal to this value are counted as saturated
+    @param bins: number of bins of the histogram (None for no histogram)
+    @param hist_range: range of the histogram, by default the range of the data
+        (needs a second pass)
+    @param workers: number of threads
+    @param pool: ThreadPool to use instead of creating one
+    @return: dict with min, max, mean, std, sum, count (valid pixels), masked,
+        saturated and histogram with its bin edges when bins is given
+    """
+    flat = numpy.ravel(data)
+    blocks = [flat[i:i + STATS_BLOCK] for i in range(0, flat.size, STATS_BLOCK)] or [flat]
+    workers = max(1, int(workers))
+    own_pool = pool is None and workers > 1 and len(blocks) > 1
+    if own_pool:
+        pool = ThreadPool(min(workers, len(blocks)))
+    mapper = map if pool is None or len(blocks) == 1 else pool.map
+    try:
+        kwargs = {"dummy": dummy, "delta_dummy": delta_dummy, "saturation": saturation}
+        if bins is not None and hist_range is not None:
+            kwargs.update(bins=bins, hist_range=hist_range)
+        results = list(mapper(lambda block: _block_stats(block, **kwargs), blocks))
+        res = results[0]
+        for other in results[1:]:
+            res = _merge_stats(res, other)
+        if bins is not None:
+            if hist_range is None:
+                if res["count"]:
+                    hist_range = (float(res["min"]), float(res["max"]))
+                histograms = list(mapper(lambda block: _block_histogram(block, bins, hist_range, dummy, delta_dummy),
+                                         blocks))
+                res["histogram"] = sum(histograms[1:], histograms[0])
+            res["bin_edges"] = numpy.histogram(numpy.empty(0), bins, hist_range)[1]
+    finally:
+        if own_pool:
+            pool.close()
+            pool.join()
+    m2 = res.pop("m2")
+    if res["count"]:
+        res["std"] = numpy.sqrt(m2 / res["count"])
+    else:
+        res["mean"] = res["std"] = numpy.nan
+    if bins is None:
+        res.pop("histogram")
+    return res
+
+
+def series_stats(source, workers=None, **kwargs):
+    """
+    Statistics of each frame of a source, frames being processed in parallel
+
+    Frames are read in order while at most two frames per thread are being
+    processed, so memory stays bounded.
+
+    @param source: filename, FabioImage, numpy array or iterable of those
+        (like a file_series or a list of filenames)
+    @param workers: number of threads (default: number of CPU)
+    @param kwargs: options of image_stats (dummy, saturation, bins, ...)
+    @return: generator of dict (see image_stats) with the filename and the
+        index of the frame in its file
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, int(workers))
+
+    def process(item):
+        res = image_stats(item[2], **kwargs)
+        res["filename"], res["frame"] = item[:2]
+        return res
+
+    return ordered_imap(process, iter_source_frames(source), workers)
+
+
+def iter_source_frames(source):
+    """
+    Iterate over the frames of a source, one by one, with their origin
+
+    @param source: filename, FabioImage, numpy array or iterable of those
+    @return: generator of (filename, index of the frame in its file, 2D array)
+    """
+    for image in iter_images(source):
+        filename = getattr(image, "filename", None)
+        for index, frame in enumerate(iter_frames(image)):
+            yield filename, index, frame
+
+
+def ordered_imap(function, items, workers):
+    """
+    Apply function on each item with a pool of threads, yielding the results
+    in order with at most two items per thread in flight.
+    """
+    if workers <= 1:
+        for item in items:
+            yield function(item)
+        return
+    pool = ThreadPool(workers)
+    try:
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.apply_async(function, (item,)))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+    finally:
+        pool.close()
+        pool.join()
+
+
+REBIN_METHODS = ("sum", "mean", "max")
+REBIN_EDGES = ("trim", "pad", "partial")
+
+# number of input pixels processed at once by rebin, fits in cache
+REBIN_BLOCK = 1 << 18
+
+
+def _rebin_dtype(dtype, method):
+    """
+    @return: default accumulation type for data of type dtype
+    """
+    dtype = numpy.dtype(dtype)
+    if method == "max":
+        return dtype
+    if method == "sum" and dtype.kind in "bi":
+        return numpy.dtype(numpy.int64)
+    if method == "sum" and dtype.kind == "u":
+        return numpy.dtype(numpy.uint64)
+    if dtype.kind == "f" and dtype.itemsize > 8:
+        return dtype
+    return numpy.dtype(numpy.float64)
+
+
+def rebin(data, factors, method="mean", edge="trim", dtype=None, out=None):
+    """
+    Rebin (down-sample) the last two dimensions of an array by integer factors
+
+    Each output pixel is accumulated from the factor[0] x factor[1] strided
+    views of the input, band of rows by band of rows so that the input stays
+    in cache: no full-size temporary array is allocated, whatever the type of
+    the input. Stacks of frames (3D or more) are rebinned frame by frame.
+
+    @param data: numpy array of dimension 2 or more
+    @param factors: binning factors (rows, columns), or one integer for both
+    @param method: "sum", "mean" or "max" of the pixels of a bin
+    @param edge: what to do with the last rows/columns when the shape is not
+        divisible by the factors: "trim" drops them, "pad" pads them with
+        zeros, "partial" makes smaller bins of the remaining pixels
+    @param dtype: type of the accumulator and of the result (by default
+        float64 for the mean, 64 bits integers for the sum of integers and
+        the type of the data for the max)
+    @param out: optional array to be filled with the result
+    @return: numpy array of shape data.shape[:-2] + binned shape
+    """
+    if method not in REBIN_METHODS:
+        raise ValueError("Unknown rebin method %s, expected one of %s" % (method, REBIN_METHODS))
+    if edge not in REBIN_EDGES:
+        raise ValueError("Unknown edge mode %s, expected one of %s" % (edge, REBIN_EDGES))
+    data = numpy.asarray(data)
+    if data.ndim < 2:
+        raise ValueError("rebin needs an array of dimension 2 or more, got %s" % data.ndim)
+    if isinstance(factors, int) or numpy.isscalar(factors):
+        factors = (factors, factors)
+    fy, fx = (int(i) for i in factors)
+    if fy < 1 or fx < 1:
+        raise ValueError("Binning factors have to be positive, got %s" % (factors,))
+    rows, cols = data.shape[-2:]
+    if edge == "trim":
+        shape = (rows // fy, cols // fx)
+    else:
+        shape = (-(-rows // fy), -(-cols // fx))
+    dtype = _rebin_dtype(data.dtype, method) if dtype is None else numpy.dtype(dtype)
+    full_shape = data.shape[:-2] + shape
+    if out is None:
+        out = numpy.empty(full_shape, dtype=dtype)
+    elif out.shape != full_shape:
+        raise ValueError("Output array of shape %s expected, got %s" % (full_shape, out.shape))
+    if out.size == 0:
+        return out
+    # used area of the input, and size of the incomplete last bins
+    used = (min(rows, shape[0] * fy), min(cols, shape[1] * fx))
+    rest = (used[0] - (shape[0] - 1) * fy, used[1] - (shape[1] - 1) * fx)
+    accumulate = numpy.maximum if method == "max" else numpy.add
+    band = max(1, REBIN_BLOCK // max(1, cols * fy))
+
+    for index in numpy.ndindex(data.shape[:-2]):
+        frame = data[index]
+        result = out[index]
+        for start in range(0, shape[0], band):
+            stop = min(start + band, shape[0])
+            dest = result[start:stop]
+            first = True
+            for i in range(fy):
+                # last input row of this band for offset i
+                last = min(stop * fy, used[0])
+                for j in range(fx):
+                    src = frame[start * fy + i:last:fy, j:used[1]:fx]
+                    if src.size == 0:
+                        continue
+                    if first:
+                        if src.shape == dest.shape:
+                            dest[...] = src
+                        else:
+                            dest[...] = 0
+                            dest[:src.shape[0], :src.shape[1]] = src
+                        first = False
+                    else:
+                        target = dest[:src.shape[0], :src.shape[1]]
+                        accumulate(target, src, out=target, casting="unsafe")
+        if method == "max" and edge == "pad":
+            # the padding pixels are zeros
+            if rest[0] < fy:
+                numpy.maximum(result[-1], 0, out=result[-1], casting="unsafe")
+            if rest[1] < fx:
+                numpy.maximum(result[:, -1], 0, out=result[:, -1], casting="unsafe")
+    if method == "mean":
+        numpy.divide(out, fy * fx, out=out, casting="unsafe")
+        if edge == "partial":
+            if rest[0] < fy:
+                numpy.multiply(out[..., -1, :], fy / rest[0], out=out[..., -1, :], casting="unsafe")
+            if rest[1] < fx:
+                numpy.multiply(out[..., -1], fx / rest[1], out=out[..., -1], casting="unsafe")
+    return out
+
+
+def summed_area_table(data, dtype=None):
+    """
+    Summed-area table (integral image) of the last two dimensions of an array
+
+    table[..., i, j] is the sum of data[..., :i, :j], so the table has one
+    more row and one more column than the data, filled with zeros. The sum of
+    any rectangle is then obtained from 4 elements of the table (area_sums).
+
+    @param data: numpy array of dimension 2 or more
+    @param dtype: type of the table, by default int64 for integers (uint64
+        for unsigned 64 bits integers) and float64 for floating point data
+    @return: numpy array of shape data.shape[:-2] + (rows + 1, cols + 1)
+    """
+    data = numpy.asarray(data)
+    if dtype is None:
+        if data.dtype.kind in "biu":
+            dtype = numpy.uint64 if data.dtype == numpy.uint64 else numpy.int64
+        else:
+            dtype = numpy.float64
+    shape = data.shape[:-2] + (data.shape[-2] + 1, data.shape[-1] + 1)
+    table = numpy.empty(shape, dtype=dtype)
+    table[..., 0, :] = 0
+    table[..., :, 0] = 0
+    inner = table[..., 1:, 1:]
+    # cumulative sum along the contiguous rows, then row after row: much
+    # faster than numpy.cumsum along the columns (strided access)
+    numpy.cumsum(data, axis=-1, dtype=dtype, out=inner)
+    for i in range(1, inner.shape[-2]):
+        numpy.add(inner[..., i, :], inner[..., i - 1, :], out=inner[..., i, :])
+    return table
+
+
+def roi_bounds(slices, shape):
+    """
+    Convert regions of interest given as pairs of slices into arrays of bounds
+
+    @param slices: list of (row slice, column slice), with a step of 1
+    @param shape: shape of the image (rows, cols)
+    @return: 4 arrays of indices: first row, end row, first col, end col
+    """
+    bounds = numpy.zeros((4, len(slices)), dtype=numpy.intp)
+    for i, (rows, cols) in enumerate(slices):
+        start0, stop0, step0 = rows.indices(shape[0])
+        start1, stop1, step1 = cols.indices(shape[1])
+        if step0 != 1 or step1 != 1:
+            raise ValueError("Only regions of interest with a step of 1 are supported")
+        bounds[:, i] = start0, max(start0, stop0), start1, max(start1, stop1)
+    return bounds
+
+
+def area_sums(table, bounds):
+    """
+    Sums of many rectangles from a summed-area table, in O(1) each
+
+    @param table: summed-area table of a frame or a stack of frames
+    @param bounds: first row, end row, first col, end col of each rectangle
+        (see roi_bounds)
+    @return: array of shape table.shape[:-2] + (number of rectangles,)
+    """
+    r0, r1, c0, c1 = bounds
+    return table[..., r1, c1] - table[..., r0, c1] - table[..., r1, c0] + table[..., r0, c0]
+
+
+def integrate_series(source, rois, workers=None):
+    """
+    Sum of several regions of interest over each frame of a source
+
+    A summed-area table is computed once per frame, then each region costs
+    4 lookups. Frames are processed in parallel by a pool of threads.
+
+    @param source: filename, FabioImage, numpy array or iterable of those
+        (like a file_series or a list of filenames)
+    @param rois: list of coordinates accepted by FabioImage.integrate_area
+        (4 coordinates or a pair of slices)
+    @param workers: number of threads (default: number of CPU)
+    @return: numpy array of shape (nframes, nrois)
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, int(workers))
+
+    def process(item):
+        return FabioImage(data=item[2]).integrate_areas(rois)
+
+    results = list(ordered_imap(process, iter_source_frames(source), workers))
+    if not results:
+        return numpy.zeros((0, len(rois)))
+    return numpy.vstack(results)
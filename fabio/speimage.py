@@ -52,6 +52,10 @@ import numpy as np
 from numpy.polynomial.polynomial import polyval
 
 from .fabioimage import FabioImage
+from .fabioutils import read_array, is_plain_file, memmap_stack
+
+
+DATA_TYPES = {0: np.float32, 1: np.int32, 2: np.int16, 3: np.uint16}
 
 
 class SpeImage(FabioImage):
@@ -60,6 +64,8 @@ class SpeImage(FabioImage):
     Put some documentation here
     """
 
+    dataset = None  # memory map of all frames, when possible
+
     def _readheader(self, infile):
         """
         Read and decode the header of an image:
@@ -108,11 +114,42 @@ class SpeImage(FabioImage):
 
         with self._open(fname, 'rb') as infile:
             self._readheader(infile)
+            self.nframes = max(1, int(self.header['num_frames']))
+            self.currentframe = frame or 0
+            location = self.get_frame_location(0)
+            if location is not None:
+                self.dataset = memmap_stack(location[0], location[1],
+                                            (self.nframes,) + location[2], location[3])
             # read the image data and declare
-            self.data = self._read_data(infile, frame)
+            if self.dataset is not None:
+                self.data = self.dataset[self.currentframe]
+            else:
+                self.data = self._read_data(infile, frame)
 
         return self
 
+    def getframe(self, num):
+        """
+        Returns a frame of the file as a new FabioImage object
+
+        @param num: frame number
+        """
+        if self.nframes == 1:
+            return FabioImage.getframe(self, num)
+        if num < 0 or num >= self.nframes:
+            raise IndexError("getframe %s out of range [%s %s[" % (num, 0, self.nframes))
+        frame = self.__class__(header=self.header.copy())
+        frame.filename = self.filename
+        frame.nframes = self.nframes
+        frame.currentframe = num
+        frame.dataset = self.dataset
+        if self.dataset is not None:
+            frame.data = self.dataset[num]
+        else:
+            with frame._open(self.filename, 'rb') as infile:
+                frame.data = frame._read_data(infile, num)
+        return frame
+
     def _get_version(self, infile):
         self.xml_offset = self._read_at(infile, 678, 1, np.long)
         if self.xml_offset == [0]:
@@ -267,25 +304,33 @@ class SpeImage(FabioImage):
 
         return roi_x, roi_x + roi_width, roi_y, roi_y + roi_height
 
+    def get_frame_location(self, num=None):
+        """
+        Position of the raw data of a frame in the SPE file
+
+        @param num: frame number, by default the first one
+        @return: 4-tuple (filename, offset, shape, dtype) or None for compressed files
+        """
+        dtype = DATA_TYPES.get(self.header.get('data_type'))
+        if dtype is None or not is_plain_file(self.filename):
+            return None
+        shape = (int(self.header['y_dim']), int(self.header['x_dim']))
+        num = num or 0
+        return (self.filename, 4100 + num * shape[0] * shape[1] * np.dtype(dtype).itemsize,
+                shape, np.dtype(dtype).newbyteorder("<"))
+
     def _read_at(self, infile, pos, size, ntype):
-        infile.seek(pos)
-        dtype = np.dtype(ntype)
-        bp = dtype.itemsize
-        data = infile.read(size * bp)
-        return np.fromstring(data, dtype)
+        # positional read: frames can be read concurrently from a shared file
+        return read_array(infile, pos, size, ntype)
 
     def _read_data(self, infile, frame=None):
         if frame is None:
             frame = 0
-        if self.header['data_type'] == 0:
-            number_size = np.float32().itemsize
-        elif self.header['data_type'] == 1:
-            number_size = np.int32().itemsize
-        elif self.header['data_type'] == 2:
-            number_size = np.int16().itemsize
-        elif self.header['data_type'] == 3:
-            number_size = np.int32().itemsize
-        frame_size = self.header['x_dim'] * self.header['y_dim'] * number_size
+        dtype = DATA_TYPES.get(self.header['data_type'])
+        if dtype is None:
+            return None
+        # the frame size comes from the same type as the pixels read
+        frame_size = self.header['x_dim'] * self.header['y_dim'] * np.dtype(dtype).itemsize
         return self._read_frame(infile, 4100 + frame * frame_size)
 
     def _read_frame(self, infile, pos=None):
@@ -296,16 +341,10 @@ class SpeImage(FabioImage):
         """
         if pos is None:
             pos = infile.tell()
-        if self.header['data_type'] == 0:
-            data = self._read_at(infile, pos, self.header['x_dim'] * self.header['y_dim'], np.float32)
-        elif self.header['data_type'] == 1:
-            data = self._read_at(infile, pos, self.header['x_dim'] * self.header['y_dim'], np.int32)
-        elif self.header['data_type'] == 2:
-            data = self._read_at(infile, pos, self.header['x_dim'] * self.header['y_dim'], np.int16)
-        elif self.header['data_type'] == 3:
-            data = self._read_at(infile, pos, self.header['x_dim'] * self.header['y_dim'], np.uint16)
-        else:
+        dtype = DATA_TYPES.get(self.header['data_type'])
+        if dtype is None:
             return None
+        data = self._read_at(infile, pos, self.header['x_dim'] * self.header['y_dim'], dtype)
         return data.reshape((self.header['y_dim'], self.header['x_dim']))
 
 
@@ -0,0 +1,316 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""Out-of-core per-pixel order statistics (median, percentile, sigma-clipped
+mean) over all frames of multi-frame files and file series.
+
+The image is processed by bands of rows, each band being read from every
+frame directly at its position in the file: the frames are never loaded all
+at once. Compressed frames are first decompressed into a spool file.
+"""
+from __future__ import absolute_import, print_function, with_statement, division
+
+__author__ = "Jérôme Kieffer"
+__contact__ = "Jerome.Kieffer@ESRF.eu"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__date__ = "18/10/2016"
+__status__ = "development"
+
+import os
+import shutil
+import tempfile
+import logging
+import multiprocessing
+from multiprocessing.pool import ThreadPool
+import numpy
+logger = logging.getLogger("stacking")
+
+from .fabioutils import File, preadinto, read_array
+from .reduction import iter_images, iter_frames
+
+STACK_METHODS = ("median", "percentile", "sigma_clip", "mean")
+
+# Extra working memory per pixel of the band, on top of the band itself
+_STACK_WORK = {"median": None, "percentile": None, "sigma_clip": 34, "mean": 0}
+
+# Maximum number of files opened at once while reading a band
+MAX_OPEN_FILES = 256
+
+
+def _frame_locations(source, spool_dir):
+    """
+    Locate the raw data of every frame of a source.
+
+    Frames which cannot be read directly from their file (compressed ones)
+    are decompressed once into a spool file of spool_dir.
+
+    @return: list of locations (filename, offset, shape, dtype) or 2D arrays
+    """
+    locations = []
+    spool = None
+    try:
+        for image in iter_images(source):
+            if isinstance(image, numpy.ndarray):
+                locations += list(iter_frames(image))
+                continue
+            for num in range(max(1, image.nframes)):
+                location = image.get_frame_location(num)
+                if location is None:
+                    if image.nframes <= 1:
+                        data = image.data
+                    else:
+                        data = image.getframe(num).data
+                    if spool is None:
+                        spool = open(os.path.join(spool_dir, "spool.raw"), "wb")
+                    data = numpy.ascontiguousarray(data)
+                    location = (spool.name, spool.tell(), data.shape, data.dtype)
+                    spool.write(data.tobytes())
+                locations.append(location)
+    finally:
+        if spool is not None:
+            spool.close()
+    return locations
+
+
+def _open_files(locations):
+    """
+    Open the files holding the frames, to be kept open while reading all bands
+
+    @param locations: list of frame locations, see _frame_locations
+    @return: dict filename: File, or None if there are more than MAX_OPEN_FILES
+    """
+    filenames = set(loc[0] for loc in locations if not isinstance(loc, numpy.ndarray))
+    if len(filenames) > MAX_OPEN_FILES:
+        return None
+    files = {}
+    try:
+        for name in sorted(filenames):
+            files[name] = File(name, "rb")
+    except Exception:
+        for f in files.values():
+            f.close()
+        raise
+    return files
+
+
+def _read_band(locations, band, start, pool=None, files=None):
+    """
+    Read the same rows of all frames
+
+    @param locations: list of frame locations, see _frame_locations
+    @param band: 3D array (nframes, rows, cols) to be filled
+    @param start: first row of the band
+    @param files: files already opened, see _open_files. If None, files are
+        opened for this band only, by groups of MAX_OPEN_FILES
+    """
+    stop = start + band.shape[1]
+    arrays = [i for i, loc in enumerate(locations) if isinstance(loc, numpy.ndarray)]
+    for i in arrays:
+        band[i] = locations[i][start:stop]
+    by_file = {}
+    for i, loc in enumerate(locations):
+        if not isinstance(loc, numpy.ndarray):
+            by_file.setdefault(loc[0], []).append(i)
+    filenames = sorted(by_file)
+    for first in range(0, len(filenames), MAX_OPEN_FILES):
+        names = filenames[first:first + MAX_OPEN_FILES]
+        if files is None:
+            opened = dict((name, File(name, "rb")) for name in names)
+        else:
+            opened = files
+        try:
+            def read(i):
+                filename, offset, shape, dtype = locations[i]
+                dtype = numpy.dtype(dtype)
+                offset += start * shape[1] * dtype.itemsize
+                if dtype == band.dtype:
+                    preadinto(opened[filename], band[i], offset)
+                else:
+                    band[i] = read_array(opened[filename], offset, band.shape[1:], dtype)
+            indexes = [i for name in names for i in by_file[name]]
+            if pool is None:
+                for i in indexes:
+                    read(i)
+            else:
+                pool.map(read, indexes)
+        finally:
+            if files is None:
+                for f in opened.values():
+                    f.close()
+
+
+def _take_first_axis(array, index):
+    """
+    Pick one value per pixel along the first axis: array[index[j, k], j, k]
+
+    Equivalent to numpy.take_along_axis (numpy >= 1.15) with axis=0.
+    """
+    grid = numpy.ogrid[tuple(slice(0, n) for n in index.shape)]
+    return array[(index,) + tuple(grid)]
+
+
+def _stack_band(band, method, q=50, sigma=3.0, max_iter=5):
+    """
+    Order statistics along the first axis of a band of frames
+
+    @return: 2D array of float64
+    """
+    if method == "median":
+        return numpy.median(band, axis=0)
+    elif method == "percentile":
+        return numpy.percentile(band, q, axis=0)
+    elif method == "mean":
+        return band.mean(axis=0, dtype=numpy.float64)
+    # sigma clipping around the median, returns the mean of remaining values.
+    # Values are sorted once: the kept values of a pixel are then a contiguous
+    # range [lower, upper) and their sums are differences of cumulative sums.
+    data = numpy.sort(band, axis=0).astype(numpy.float64)
+    nframes = data.shape[0]
+    shift = data[nframes // 2].copy()
+    data -= shift  # limits the cancellation in the variance
+    cumsum = numpy.zeros((nframes + 1,) + data.shape[1:], dtype=numpy.float64)
+    numpy.cumsum(data, axis=0, out=cumsum[1:])
+    cumsum2 = numpy.zeros_like(cumsum)
+    numpy.cumsum(data * data, axis=0, out=cumsum2[1:])
+    lower = numpy.zeros(data.shape[1:], dtype=numpy.intp)
+    upper = numpy.zeros(data.shape[1:], dtype=numpy.intp) + nframes
+    take = _take_first_axis
+    for _ in range(max_iter):
+        count = upper - lower
+        center = (take(data, lower + (count - 1) // 2) + take(data, lower + count // 2)) / 2.0
+        mean = (take(cumsum, upper) - take(cumsum, lower)) / count
+        variance = (take(cumsum2, upper) - take(cumsum2, lower)) / count - mean * mean
+        deviation = sigma * numpy.sqrt(numpy.maximum(variance, 0))
+        # rejected values stay rejected
+        new_lower = numpy.maximum((data < center - deviation).sum(axis=0), lower)
+        new_upper = numpy.minimum((data <= center + deviation).sum(axis=0), upper)
+        # never reject all values of a pixel
+        empty = new_upper <= new_lower
+        new_lower[empty] = lower[empty]
+        new_upper[empty] = upper[empty]
+        if (new_lower == lower).all() and (new_upper == upper).all():
+            break
+        lower, upper = new_lower, new_upper
+    return (take(cumsum, upper) - take(cumsum, lower)) / (upper - lower) + shift
+
+
+def stack_frames(source, method="median", q=50, sigma=3.0, max_iter=5,
+                 memory=2 ** 30, workers=None, output=None):
+    """
+    Per-pixel order statistics over all frames of a source, out-of-core
+
+    The frames are never loaded all at once: the image is processed by bands
+    of rows, each band being read from every frame at its position in the
+    file, then reduced by a pool of threads. Compressed frames are first
+    decompressed into a temporary file.
+
+    ::
+
+        background = fabio.stacking.stack_frames(series, "median", memory=2e9)
+
+    @param source: filename, FabioImage, 3D numpy array or iterable of those
+        (like a file_series or a list of filenames)
+    @param method: one of "median", "percentile", "sigma_clip", "mean"
+    @param q: percentile (0-100) for the "percentile" method
+    @param sigma: rejection threshold, in standard deviations around the median,
+        for "sigma_clip"
+    @param max_iter: maximum number of clipping iterations for "sigma_clip"
+    @param memory: approximate amount of memory to be used, in bytes
+    @param workers: number of threads for reading and computing (default: number of CPU)
+    @param output: if given, filename of an EDF file to save the result to
+    @return: 2D array of float64
+    """
+    if method not in STACK_METHODS:
+        raise ValueError("Unknown stacking method %s, valid ones are %s" % (method, STACK_METHODS))
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, int(workers))
+    spool_dir = tempfile.mkdtemp(prefix="fabio_stack_")
+    pool = ThreadPool(workers) if workers > 1 else None
+    files = None
+    try:
+        locations = _frame_locations(source, spool_dir)
+        if not locations:
+            raise RuntimeError("No frame to stack in %s" % (source,))
+        shapes = set(tuple(loc.shape if isinstance(loc, numpy.ndarray) else loc[2])
+                     for loc in locations)
+        if len(shapes) > 1:
+            raise ValueError("Frames have different shapes: %s" % sorted(shapes))
+        rows, cols = shapes.pop()
+        dtype = numpy.result_type(*[loc.dtype if isinstance(loc, numpy.ndarray) else loc[3]
+                                    for loc in locations]).newbyteorder("=")
+        nframes = len(locations)
+        extra = _STACK_WORK[method]
+        if extra is None:
+            extra = dtype.itemsize
+        per_row = nframes * cols * (dtype.itemsize + extra)
+        band_rows = int(memory // per_row)
+        if band_rows < 1:
+            logger.warning("Memory limit of %s bytes too small for one row of %s frames, "
+                           "using %s bytes", memory, nframes, per_row)
+            band_rows = 1
+        band_rows = min(band_rows, rows)
+        logger.debug("Stacking %s frames of %s by bands of %s rows", nframes, (rows, cols), band_rows)
+        result = numpy.empty((rows, cols), dtype=numpy.float64)
+        band = numpy.empty((nframes, band_rows, cols), dtype=dtype)
+        files = _open_files(locations)
+        for start in range(0, rows, band_rows):
+            stop = min(start + band_rows, rows)
+            current = band[:, :stop - start]
+            if stop - start < band_rows:
+                current = numpy.empty((nframes, stop - start, cols), dtype=dtype)
+            _read_band(locations, current, start, pool, files)
+            bounds = numpy.linspace(0, stop - start, min(workers, stop - start) + 1).astype(int)
+
+            def process(i):
+                lower, upper = bounds[i], bounds[i + 1]
+                result[start + lower:start + upper] = _stack_band(current[:, lower:upper],
+                                                                  method, q, sigma, max_iter)
+            if pool is None:
+                process(0)
+            else:
+                pool.map(process, range(len(bounds) - 1))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if files is not None:
+            for f in files.values():
+                f.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+    if output is not None:
+        from .edfimage import EdfImage
+        header = {"stack_method": method, "stack_frames": str(nframes)}
+        if method == "percentile":
+            header["stack_percentile"] = str(q)
+        elif method == "sigma_clip":
+            header["stack_sigma"] = str(sigma)
+        EdfImage(data=result, header=header).write(output)
+    return result
@@ -43,13 +43,34 @@ from .utilstest import UtilsTest
 
 logger = UtilsTest.get_logger(__file__)
 fabio = sys.modules["fabio"]
-from fabio.GEimage import GEimage
+from fabio.GEimage import GEimage, GE_HEADER_INFO
 # filename dim1 dim2 min max mean stddev
 TESTIMAGES = """GE_aSI_detector_image_1529      2048 2048 1515 16353 1833.0311 56.9124
                 GE_aSI_detector_image_1529.gz   2048 2048 1515 16353 1833.0311 56.9124
                 GE_aSI_detector_image_1529.bz2  2048 2048 1515 16353 1833.0311 56.9124"""
 
 
+def write_ge(filename, data):
+    """
+    Write a minimal GE sequence
+
+    @param filename: name of the file
+    @param data: 3D array with the frames
+    """
+    import struct
+    values = {"StandardHeaderSizeInBytes": 8192,
+              "UserHeaderSizeInBytes": 0,
+              "NumberOfFrames": data.shape[0],
+              "NumberOfRowsInFrame": data.shape[1],
+              "NumberOfColsInFrame": data.shape[2],
+              "ImageDepthInBits": 16}
+    header = b"".join(b"\x00" * nbytes if fmt is None else struct.pack(fmt, values.get(name, 0))
+                      for name, nbytes, fmt in GE_HEADER_INFO)
+    with open(filename, "wb") as f:
+        f.write(header.ljust(values["StandardHeaderSizeInBytes"], b"\x00"))
+        f.write(data.astype("<u2").tostring())
+
+
 class TestGE(unittest.TestCase):
 
     def setUp(self):
@@ -75,9 +96,59 @@ class TestGE(unittest.TestCase):
             self.assertEqual(dim2, obj.dim2, "dim2")
 
 
+class TestGeSequence(unittest.TestCase):
+    """
+    Multi-frame GE sequence
+    """
+    def setUp(self):
+        self.filename = os.path.join(UtilsTest.tempdir, "sequence.ge2")
+        self.data = numpy.random.randint(0, 16000, size=(10, 32, 16)).astype(numpy.uint16)
+        write_ge(self.filename, self.data)
+
+    def tearDown(self):
+        os.unlink(self.filename)
+
+    def test_getframe(self):
+        obj = GEimage()
+        obj.read(self.filename)
+        self.assertEqual(obj.nframes, 10, "nframes")
+        self.assertEqual(abs(obj.data - self.data[0]).max(), 0, "first frame")
+        handle = obj._file
+        for i in range(obj.nframes):
+            frame = obj.getframe(i)
+            self.assertTrue(frame._file is None, "frames do not keep the file opened")
+            self.assertEqual(abs(frame.data - self.data[i]).max(), 0, "frame %s" % i)
+        self.assertTrue(obj._file is handle, "file handle is reused")
+        frame = frame.previous()
+        self.assertEqual(frame.currentframe, 8, "previous")
+        self.assertEqual(abs(frame.data - self.data[8]).max(), 0, "previous frame")
+        frame.close()
+        obj.close()
+        self.assertTrue(handle.closed, "file is closed")
+        self.assertTrue(obj._file is None, "no handle left")
+        self.assertEqual(abs(obj.getframe(3).data - self.data[3]).max(), 0, "file is re-opened")
+        obj.close()
+
+    def test_read_frames(self):
+        obj = GEimage()
+        obj.read(self.filename)
+        block = obj.read_frames(2, 7)
+        self.assertEqual(block.shape, (5, 32, 16), "shape")
+        self.assertEqual(abs(block - self.data[2:7]).max(), 0, "content")
+        out = numpy.zeros((3, 32, 16), dtype=numpy.uint16)
+        res = obj.read_frames(7, 10, out=out)
+        self.assertTrue(res is out, "output array is used")
+        self.assertEqual(abs(out - self.data[7:]).max(), 0, "content of out")
+        self.assertRaises(IndexError, obj.read_frames, 5, 11)
+        self.assertRaises(ValueError, obj.read_frames, 0, 2, out)
+        obj.close()
+
+
 def suite():
     testsuite = unittest.TestSuite()
     testsuite.addTest(TestGE("test_read"))
+    testsuite.addTest(TestGeSequence("test_getframe"))
+    testsuite.addTest(TestGeSequence("test_read_frames"))
     return testsuite
 
 if __name__ == '__main__':
@@ -64,8 +64,14 @@ from . import testpilatusimage
 from . import test_nexus
 from . import testeigerimage
 from . import testhdf5image
+from . import testhdf5pool
 from . import testfit2dimage
 from . import testspeimage
+from . import testreduction
+from . import teststacking
+from . import testthumbnail
+from . import testconverters
+from . import testconvert
 
 
 def suite():
@@ -99,8 +105,14 @@ def suite():
     testSuite.addTest(test_nexus.suite())
     testSuite.addTest(testeigerimage.suite())
     testSuite.addTest(testhdf5image.suite())
+    testSuite.addTest(testhdf5pool.suite())
     testSuite.addTest(testfit2dimage.suite())
     testSuite.addTest(testspeimage.suite())
+    testSuite.addTest(testreduction.suite())
+    testSuite.addTest(teststacking.suite())
+    testSuite.addTest(testthumbnail.suite())
+    testSuite.addTest(testconverters.suite())
+    testSuite.addTest(testconvert.suite())
     return testSuite
 
 
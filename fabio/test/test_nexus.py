@@ -58,14 +58,92 @@ class testNexus(unittest.TestCase):
         fname = os.path.join(UtilsTest.tempdir, "nexus.h5")
         nex = nexus.Nexus(fname)
         entry = nex.new_entry("entry")
-        time1 = nexus.from_isotime(entry["start_time"].value)
-        entry["bad_time"] = [entry["start_time"].value]  #this is a list !!!
-        time2 = nexus.from_isotime(entry["bad_time"].value)
+        time1 = nexus.from_isotime(entry["start_time"][()])
+        entry["bad_time"] = [entry["start_time"][()]]  #this is a list !!!
+        time2 = nexus.from_isotime(entry["bad_time"][()])
         self.assertEqual(time1, time2, "start_time in list does not works !")
         nex.close()
         self.assert_(os.path.exists(fname))
         os.unlink(fname)
 
+    def test_writer(self):
+        "Streaming of frames into compressed datasets"
+        fname = os.path.join(UtilsTest.tempdir, "nexus_writer.h5")
+        stack = numpy.random.randint(0, 1000, size=(11, 17, 13)).astype(numpy.uint16)
+        options = [{"compression": "gzip"},
+                   {"compression": "gzip", "shuffle": True, "chunks": (4, 17, 13)},
+                   {"compression": "lzf", "threaded": False},
+                   {"compression": "gzip", "chunks": (2, 9, 13), "nframes": 15}]
+        with nexus.Nexus(fname) as nex:
+            entry = nex.new_entry("entry")
+            for i, opts in enumerate(options):
+                nxdata = nex.new_class(entry, "data_%i" % i, "NXdata")
+                with nex.new_data_writer(nxdata, (17, 13), dtype=numpy.uint16, **opts) as writer:
+                    writer.append(stack[0])
+                    writer.extend(stack[1:])
+                    self.assertRaises(ValueError, writer.append, stack[0, 1:])
+                self.assertEqual(writer.count, 11, "number of frames")
+        with nexus.Nexus(fname) as nex:
+            data = nex.get_data(nex.get_entries()[0])
+            self.assertEqual(len(data), 4, "4 datasets")
+            for ds in data:
+                self.assertEqual(abs(ds[:11] - stack).max(), 0, "content of %s" % ds.name)
+            self.assertEqual(data[-1].shape[0], 15, "preallocated")
+        os.unlink(fname)
+
+    def test_index(self):
+        "Index of NeXus classes, invalidated on write and saved between sessions"
+        fname = os.path.join(UtilsTest.tempdir, "nexus_index.h5")
+        index_file = os.path.join(UtilsTest.tempdir, "nexus_index.json")
+        for name in (fname, index_file):
+            if os.path.exists(name):
+                os.unlink(name)
+        with nexus.Nexus(fname, index_file=index_file) as nex:
+            for i in range(3):
+                entry = nex.new_entry("entry", force_time="2016-10-18T12:00:%02i+02:00" % i)
+                instrument = nex.new_instrument(entry, "ID00")
+                detector = nex.new_class(instrument, "detector", "NXdetector")
+                nxdata = nex.new_class(detector, "data", "NXdata")
+                nxdata.create_dataset("data", data=numpy.zeros((2, 2)) + i).attrs["signal"] = "1"
+            self.assertEqual([e.name for e in nex.get_entries()], ["/entry_0002", "/entry_0001", "/entry_0000"], "latest first")
+            self.assertEqual(nex.find_detector().name, "/entry_0002/ID00/detector", "detector")
+            self.assertEqual(len(nex.find_data(all=True)), 3, "all data")
+            self.assertIs(nex.get_index(), nex.get_index(), "index kept")
+            nex.new_entry("entry", force_time="2016-10-18T13:00:00+02:00")
+            self.assertEqual(nex.get_entries()[0].name, "/entry_0003", "index updated")
+        with nexus.Nexus(fname, index_file=index_file) as nex:
+            self.assertIsNot(nex._index, None, "index loaded")
+            self.assertEqual(nex.find_data()[0, 0], 2, "data of the latest entry with a NXdata")
+            self.assertEqual(nex.get_entry("entry_0001").name, "/entry_0001", "entry by name")
+        with nexus.Nexus(fname, "a", index_file=index_file) as nex:
+            nex.h5["entry_0000"].attrs["NX_class"] = "NXcollection"
+        with nexus.Nexus(fname, index_file=index_file) as nex:
+            self.assertIs(nex._index, None, "outdated index")
+            self.assertEqual(len(nex.get_entries()), 3, "3 entries left")
+        os.unlink(fname)
+        os.unlink(index_file)
+
+    def test_links(self):
+        "Soft and external links are only indexed on request"
+        h5py = nexus.h5py
+        fname = os.path.join(UtilsTest.tempdir, "nexus_links.h5")
+        external = os.path.join(UtilsTest.tempdir, "nexus_external.h5")
+        with h5py.File(external, mode="w") as h:
+            h.create_group("detector").attrs["NX_class"] = "NXdetector"
+        with nexus.Nexus(fname, "a") as nex:
+            entry = nex.new_entry("entry")
+            nex.new_class(entry, "sample", "NXsample")
+            entry["sample_link"] = h5py.SoftLink(entry.name + "/sample")
+            entry["detector"] = h5py.ExternalLink(external, "/detector")
+        with nexus.Nexus(fname, follow_links=True) as nex:
+            classes = nex.get_index()["classes"]["/entry_0000"]
+            self.assertEqual(sorted(classes["NXsample"]), ["/entry_0000/sample", "/entry_0000/sample_link"], "soft link")
+            self.assertEqual(classes["NXdetector"], ["/entry_0000/detector"], "external link")
+        os.unlink(external)
+        with nexus.Nexus(fname) as nex:
+            classes = nex.get_index()["classes"]["/entry_0000"]
+            self.assertEqual(classes, {"NXsample": ["/entry_0000/sample"]}, "links skipped")
+        os.unlink(fname)
 
 def suite():
     testsuite = unittest.TestSuite()
@@ -74,6 +152,9 @@ def suite():
     else:
         testsuite.addTest(testNexus("test_nexus"))
         testsuite.addTest(testNexus("test_from_time"))
+        testsuite.addTest(testNexus("test_writer"))
+        testsuite.addTest(testNexus("test_index"))
+        testsuite.addTest(testNexus("test_links"))
 #         testsuite.addTest(testNexus("test_invert"))
     return testsuite
 
@@ -46,8 +46,9 @@ from .utilstest import UtilsTest
 
 logger = UtilsTest.get_logger(__file__)
 fabio = sys.modules["fabio"]
-from fabio.cbfimage import cbfimage
-from fabio.compression import decByteOffset_numpy, decByteOffset_cython
+from fabio.cbfimage import cbfimage, CIF
+from fabio import cbfimage as cbfmodule
+from fabio.compression import decByteOffset_numpy, decByteOffset_cython, md5sum
 from fabio.third_party.six import PY3
 if PY3:
     from fabio.fabioutils import unicode
@@ -163,6 +164,142 @@ class TestCbfReader(unittest.TestCase):
             self.assertEqual(obj.header[key], other.header[key], "value are the same for key %s [%s|%s]" % (key, obj.header[key], other.header[key]))
 
 
+class TestCbfWriter(unittest.TestCase):
+    """ test cbf image writer on synthetic data """
+
+    def test_write_data(self):
+        """Size and MD5 of the binary section are patched after streaming the data"""
+        name = os.path.join(UtilsTest.tempdir, "write_data.cbf")
+        for dtype in ("int32", "int64", "int16", "uint16"):
+            data = numpy.random.randint(0, 30000, size=(53, 47)).astype(dtype)
+            data[10, 10] = 0
+            cbfimage(data=data).write(name)
+            other = cbfimage()
+            other.read(name)
+            self.assertEqual(abs(other.data - data).max(), 0, "data are the same for %s" % dtype)
+            raw = other.read(name, only_raw=True)
+            self.assertEqual(int(other.header["X-Binary-Size"]), len(raw), "size is correct for %s" % dtype)
+            self.assertEqual(numpy.string_(other.header["Content-MD5"]), md5sum(raw), "MD5 is correct for %s" % dtype)
+        os.unlink(name)
+
+    def test_multi_image(self):
+        """Several binary sections in one file are read as frames"""
+        name = os.path.join(UtilsTest.tempdir, "multi_image.cbf")
+        frames = []
+        with open(name, "wb") as outfile:
+            for i in range(3):
+                data = numpy.random.randint(0, 30000, size=(31 + i, 47)).astype("int32")
+                part = os.path.join(UtilsTest.tempdir, "multi_image_%s.cbf" % i)
+                cbfimage(data=data, header={"_diffrn_scan_frame.frame_number": str(i)}).write(part)
+                with open(part, "rb") as infile:
+                    outfile.write(infile.read())
+                os.unlink(part)
+                frames.append(data)
+        obj = fabio.open(name)
+        self.assertEqual(obj.nframes, 3, "3 frames")
+        self.assertEqual(abs(obj.data - frames[0]).max(), 0, "first frame")
+        for i in range(3):
+            frame = obj.getframe(i)
+            self.assertEqual(frame.data.shape, frames[i].shape, "shape of frame %s" % i)
+            self.assertEqual(abs(frame.data - frames[i]).max(), 0, "data of frame %s" % i)
+            self.assertEqual(frame.header["_diffrn_scan_frame.frame_number"], str(i), "header of frame %s" % i)
+        self.assertEqual(abs(obj.next().data - frames[1]).max(), 0, "next frame")
+        self.assertRaises(IOError, obj.getframe, 3)
+        other = fabio.open(name, frame=2)
+        self.assertEqual(other.currentframe, 2, "frame selected at opening")
+        self.assertEqual(abs(other.data - frames[2]).max(), 0, "data of the frame selected at opening")
+        self.assertTrue(other._index is obj._index, "index taken from the cache")
+        self.assertEqual(list(obj._index["dim2"]), [31, 32, 33], "index of the sections")
+        self.assertTrue(frame._file is None, "frames do not keep the file")
+        obj.close()
+        self.assertTrue(obj._file is None, "file closed")
+        self.assertEqual(abs(obj.getframe(1).data - frames[1]).max(), 0, "file re-opened")
+        obj.close()
+        other.close()
+        os.unlink(name)
+        cbfimage(data=frames[0]).write(name)
+        single = cbfimage()
+        single.read(name)
+        self.assertTrue(single._file is None, "single image file closed after reading")
+        os.unlink(name)
+
+
+class TestCifParser(unittest.TestCase):
+    """ test the CIF tokenizers and the extraction of loops """
+    TEXT = b"""data_test
+_item.one 1
+_item.two 'quoted value'
+loop_
+_cat.a
+_cat.b
+1 2
+3 "four 4"
+_item.three ?
+loop_
+_other.x
+_other.y
+_other.z
+7 8
+_item.text
+;
+multi-line
+text
+;
+"""
+
+    def parse(self, text):
+        cif = CIF()
+        cif._parseCIF(text)
+        return cif
+
+    def test_loops(self):
+        cif = self.parse(self.TEXT)
+        self.assertEqual(cif["_item.one"], "1", "value before loops")
+        self.assertEqual(cif["_item.two"], "quoted value", "quoted value")
+        self.assertEqual(cif["_item.three"], "?", "value between loops")
+        self.assertEqual(cif["_item.text"], "multi-line\ntext", "text field after loops")
+        loops = cif["loop_"]
+        self.assertEqual(len(loops), 2, "2 loops")
+        keys, rows = loops[0]
+        self.assertEqual(keys, [b"_cat.a", b"_cat.b"], "keys")
+        self.assertEqual(rows, [{b"_cat.a": b"1", b"_cat.b": b"2"}, {b"_cat.a": b"3", b"_cat.b": b"four 4"}], "rows")
+        self.assertEqual(loops[1][1], [{b"_other.x": b"7", b"_other.y": b"8", b"_other.z": b"?"}], "incomplete row")
+        self.assertFalse("_cat.a" in cif, "loop keys are not items")
+
+    def test_python_tokenizer(self):
+        text = self.TEXT + b"""_binary
+;
+--CIF-BINARY-FORMAT-SECTION--
+\x00\n;\x01 'x
+--CIF-BINARY-FORMAT-SECTION----
+;
+# comment 'not a field
+_last it's"""
+        fields = CIF._splitCIF(text)
+        self.assertEqual(fields[-1], b"it's", "quote inside a field")
+        self.assertTrue(fields[-3].startswith(b"--CIF-BINARY-FORMAT-SECTION--"), "binary section kept")
+        if cbfmodule.split_tokens is not None:
+            self.assertEqual(fields, cbfmodule.split_tokens(text), "same fields as the cython tokenizer")
+        self.assertEqual(CIF._splitCIF(b""), [], "empty")
+        split_tokens = cbfmodule.split_tokens
+        cbfmodule.split_tokens = None
+        try:
+            cif = self.parse(self.TEXT)
+        finally:
+            cbfmodule.split_tokens = split_tokens
+        self.assertEqual(cif, self.parse(self.TEXT), "same result without cython")
+
+    def test_many_loops(self):
+        lines = [b"data_many"]
+        for i in range(2000):
+            lines += [b"loop_", b"_c%i.a" % i, b"_c%i.b" % i, b"1 2 3 4"]
+        lines.append(b"_end 5")
+        cif = self.parse(b"\n".join(lines))
+        self.assertEqual(len(cif["loop_"]), 2000, "all loops")
+        self.assertEqual(cif["loop_"][-1][1][1], {b"_c1999.a": b"3", b"_c1999.b": b"4"}, "last loop")
+        self.assertEqual(cif["_end"], "5", "item after the loops")
+
+
 def suite():
     testsuite = unittest.TestSuite()
     testsuite.addTest(TestCbfReader("test_read"))
@@ -171,6 +308,11 @@ def suite():
     testsuite.addTest(TestCbfReader("test_consitency_manual"))
     testsuite.addTest(TestCbfReader("test_consitency_convert"))
     testsuite.addTest(TestCbfReader("test_unicode"))
+    testsuite.addTest(TestCbfWriter("test_write_data"))
+    testsuite.addTest(TestCbfWriter("test_multi_image"))
+    testsuite.addTest(TestCifParser("test_loops"))
+    testsuite.addTest(TestCifParser("test_python_tokenizer"))
+    testsuite.addTest(TestCifParser("test_many_loops"))
 
     return testsuite
 
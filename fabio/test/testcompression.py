@@ -41,6 +41,7 @@ __date__ = "12/07/2016"
 import unittest
 import sys
 import os
+import io
 import numpy
 
 if __name__ == '__main__':
@@ -123,10 +124,78 @@ class TestByteOffset(unittest.TestCase):
         self.assertEqual(abs(self.ds - obt_cy2).max(), 0.0, "cython2-numpy algo_orig")
 
 
+    def test_chunks(self):
+        """compression block after block gives the same stream, with the right MD5"""
+        ref = compression.compByteOffset_numpy(self.ds)
+        for block in (1, 3, 7, self.ds.size, 1 << 16):
+            res = b"".join(compression.compByteOffset_chunks(self.ds, block))
+            self.assertEqual(ref, res, "cython block %s" % block)
+            res = b"".join(compression.compByteOffset_numpy_chunks(self.ds, block))
+            self.assertEqual(ref, res, "numpy block %s" % block)
+        for dtype in ("int32", "int64", "uint16"):
+            data = numpy.random.randint(0, 1 << 15, size=(97, 101)).astype(dtype)
+            data[::11, ::13] = 0
+            stream = io.BytesIO()
+            size, md5 = compression.compByteOffset_stream(data, stream, block=1000)
+            self.assertEqual(stream.getvalue(), compression.compByteOffset_numpy(data), dtype)
+            self.assertEqual(size, len(stream.getvalue()), dtype)
+            self.assertEqual(md5, compression.md5sum(stream.getvalue()), dtype)
+            res = compression.decByteOffset_cython(stream.getvalue(), data.size)
+            self.assertEqual(abs(res - data.ravel()).max(), 0, dtype)
+
+    def test_parallel(self):
+        """blocks compressed in parallel are identical to the serial compression"""
+        data = numpy.random.randint(-1 << 20, 1 << 20, size=2000).cumsum()
+        data[::17] = 0
+        data[::101] = 1 << 40
+        for dtype in ("int32", "int64", "uint16"):
+            ds = data.astype(dtype)
+            ref = compression.compByteOffset(ds)
+            for workers in (1, 2, 3):
+                for block in (1, 100, 4096, 1 << 18):
+                    res = b"".join(compression.compByteOffset_parallel_chunks(ds, workers, block))
+                    self.assertEqual(ref, res, "%s with %s threads, block %s" % (dtype, workers, block))
+            self.assertEqual(ref, compression.compByteOffset_parallel(ds, 4), dtype)
+            stream = io.BytesIO()
+            size, md5 = compression.compByteOffset_stream(ds, stream, 1000, workers=4)
+            self.assertEqual(stream.getvalue(), ref, dtype)
+            self.assertEqual(md5, compression.md5sum(ref), dtype)
+
+    def test_fast_decoder(self):
+        """memchr-based decoder gives the same result as the byte-wise one"""
+        try:
+            from fabio.ext import byte_offset
+        except ImportError:
+            self.skipTest("byte_offset cython module not available")
+        data = numpy.random.randint(-1 << 20, 1 << 20, size=3000).cumsum()
+        data[:1000] = numpy.random.poisson(1, 1000)
+        data[::29] = 1 << 40
+        for dtype, decoder in (("int32", byte_offset.dec_cbf32), ("int64", byte_offset.dec_cbf)):
+            ds = data.astype(dtype) if dtype == "int64" else (data % (1 << 30)).astype(dtype)
+            stream = compression.compByteOffset(ds)
+            res = decoder(stream, ds.size)
+            self.assertEqual(res.dtype, ds.dtype, dtype)
+            self.assertEqual(abs(res - ds).max(), 0, dtype)
+            for size in (None, 1, 17, ds.size - 5):
+                ref = decoder(stream, size, fast=False)
+                res = decoder(stream, size)
+                self.assertEqual(ref.size, res.size, "%s size %s" % (dtype, size))
+                self.assertEqual(abs(ref - res).max(), 0, "%s size %s" % (dtype, size))
+            for cut in range(1, 16):
+                ref = decoder(stream[:-cut], fast=False)
+                res = decoder(stream[:-cut])
+                self.assertEqual(ref.size, res.size, "%s truncated by %s" % (dtype, cut))
+                self.assertEqual(abs(ref - res).max(), 0, "%s truncated by %s" % (dtype, cut))
+            self.assertEqual(decoder(b"").size, 0, dtype)
+
+
 def suite():
     testsuite = unittest.TestSuite()
     testsuite.addTest(TestByteOffset("testSC"))
     testsuite.addTest(TestByteOffset("testComp"))
+    testsuite.addTest(TestByteOffset("test_chunks"))
+    testsuite.addTest(TestByteOffset("test_parallel"))
+    testsuite.addTest(TestByteOffset("test_fast_decoder"))
     return testsuite
 
 if __name__ == '__main__':
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#    Project: Fable Input Output
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Test of the fabio-convert script
+"""
+from __future__ import print_function, with_statement, division, absolute_import
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+if __name__ == '__main__':
+    import pkgutil
+    __path__ = pkgutil.extend_path([os.path.dirname(__file__)], "fabio.test")
+from .utilstest import UtilsTest
+import numpy
+logger = UtilsTest.get_logger(__file__)
+fabio = sys.modules["fabio"]
+from fabio.edfimage import edfimage
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(fabio.__file__))),
+                      "scripts", "fabio-convert")
+
+
+def load_script():
+    """
+    @return: the fabio-convert script as a module, None if not available
+    """
+    if not os.path.isfile(SCRIPT):
+        return None
+    try:
+        from importlib.machinery import SourceFileLoader
+    except ImportError:  # python 2
+        import imp
+        return imp.load_source("fabio_convert", SCRIPT)
+    return SourceFileLoader("fabio_convert", SCRIPT).load_module()
+
+
+convert = load_script()
+
+
+class TestConvert(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp(prefix="fabio_convert_", dir=UtilsTest.tempdir)
+        self.data = numpy.random.randint(0, 1000, size=(3, 8, 10)).astype(numpy.uint16)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def path(self, *args):
+        return os.path.join(self.tmpdir, *args)
+
+    def test_list_inputs(self):
+        os.makedirs(self.path("in", "sub"))
+        for name in ("a.edf", "c.edf.gz", os.path.join("sub", "b.edf")):
+            open(self.path("in", name), "wb").close()
+        inputs = convert.list_inputs([self.path("in")])
+        self.assertEqual(inputs, [(self.path("in", "a.edf"), "a"), (self.path("in", "c.edf.gz"), "c")],
+                         "directory without compression extension")
+        inputs = convert.list_inputs([self.path("in")], recursive=True)
+        self.assertEqual(inputs[-1], (self.path("in", "sub", "b.edf"), os.path.join("sub", "b")), "recursive")
+        inputs = convert.list_inputs([self.path("in", "*.edf"), self.path("missing.edf")])
+        self.assertEqual(inputs, [(self.path("in", "a.edf"), "a"), (self.path("missing.edf"), "missing")],
+                         "glob patterns and plain names")
+
+    def test_find_collisions(self):
+        inputs = [("x/img.edf", "img"), ("y.edf", "y"), ("x/img.npy", "img")]
+        self.assertEqual(dict(convert.find_collisions(inputs)), {"img": ["x/img.edf", "x/img.npy"]}, "collision")
+        self.assertEqual(len(convert.find_collisions(inputs[:2])), 0, "no collision")
+
+    def test_output_names(self):
+        self.assertEqual(convert.output_names("out/img", "cbf", 1), ["out/img.cbf"], "single frame")
+        self.assertEqual(convert.output_names("out/img", "cbf", 3),
+                         ["out/img_0000.cbf", "out/img_0001.cbf", "out/img_0002.cbf"], "multi-frame")
+
+    def test_convert_file(self):
+        single = self.path("single.edf")
+        edfimage(data=self.data[0]).write(single)
+        result = convert.convert_file((single, self.path("out", "single"), "npy", False))
+        self.assertEqual(result.status, "done", result.message)
+        self.assertEqual(abs(numpy.load(self.path("out", "single.npy")) - self.data[0]).max(), 0, "converted")
+        result = convert.convert_file((single, self.path("out", "single"), "npy", False))
+        self.assertEqual(result.status, "skipped", "existing output is skipped")
+        result = convert.convert_file((single, self.path("out", "single"), "npy", True))
+        self.assertEqual(result.status, "done", "overwritten with force")
+
+        multi = self.path("multi.edf")
+        e = edfimage(data=self.data[0])
+        for frame in self.data[1:]:
+            e.appendFrame(data=frame)
+        e.write(multi)
+        result = convert.convert_file((multi, self.path("out", "multi"), "edf", False))
+        self.assertEqual(result.status, "done", result.message)
+        self.assertEqual(result.outputs, convert.output_names(self.path("out", "multi"), "edf", 3), "one file per frame")
+        for name, frame in zip(result.outputs, self.data):
+            self.assertEqual(abs(fabio.open(name).data - frame).max(), 0, "content of %s" % name)
+        result = convert.convert_file((multi, self.path("out", "multi"), "edf", False))
+        self.assertEqual(result.status, "skipped", "existing frames are skipped")
+
+    def test_failure(self):
+        source = self.path("complex.npy")
+        numpy.save(source, numpy.ones((8, 10), dtype=numpy.complex64))
+        result = convert.convert_file((source, self.path("out", "complex"), "edf", False))
+        self.assertEqual(result.status, "failed", "no EDF type for complex data")
+        self.assertEqual(os.listdir(self.path("out")), [], "no partial output left")
+
+    def test_hdf5_exists(self):
+        source = self.path("single.edf")
+        edfimage(data=self.data[0]).write(source)
+        output = self.path("out.h5")
+        with open(output, "wb") as f:
+            f.write(b"previous")
+        self.assertEqual(convert.main(["-F", "hdf5", "-j", "1", "-o", output, source]), 1, "error exit code")
+        with open(output, "rb") as f:
+            self.assertEqual(f.read(), b"previous", "existing output untouched")
+
+
+def suite():
+    testsuite = unittest.TestSuite()
+    if convert is None:
+        logger.warning("fabio-convert script not found. Skipping its tests")
+    else:
+        testsuite.addTest(TestConvert("test_list_inputs"))
+        testsuite.addTest(TestConvert("test_find_collisions"))
+        testsuite.addTest(TestConvert("test_output_names"))
+        testsuite.addTest(TestConvert("test_convert_file"))
+        testsuite.addTest(TestConvert("test_failure"))
+        testsuite.addTest(TestConvert("test_hdf5_exists"))
+    return testsuite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
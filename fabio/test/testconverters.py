@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#    Project: Fable Input Output
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+
+"""Test the conversion of data between formats
+"""
+
+from __future__ import print_function, with_statement, division, absolute_import
+import unittest
+import sys
+import os
+
+if __name__ == '__main__':
+    import pkgutil
+    __path__ = pkgutil.extend_path([os.path.dirname(__file__)], "fabio.test")
+from .utilstest import UtilsTest
+import numpy
+
+logger = UtilsTest.get_logger(__file__)
+fabio = sys.modules["fabio"]
+from fabio import converters
+from fabio.cbfimage import CbfImage
+from fabio.OXDimage import OXDimage
+from fabio.edfimage import EdfImage
+
+
+class TestIntegerConversion(unittest.TestCase):
+
+    def test_narrowest(self):
+        "Narrowest type holding the range of the data"
+        cases = [(numpy.array([0, 200.7]), converters.INTEGER_TYPES, numpy.uint8),
+                 (numpy.array([-1, 200.7]), converters.INTEGER_TYPES, numpy.int16),
+                 (numpy.array([0, 70000], dtype=numpy.int64), converters.INTEGER_TYPES, numpy.int64),
+                 (numpy.array([0, 70000], dtype=numpy.int64), ("uint16", "uint32"), numpy.uint32),
+                 (numpy.array([-5, 5], dtype=numpy.int8), converters.WRITER_DTYPES["OXDimage"], numpy.int32),
+                 (numpy.array([0, 1000.]), converters.WRITER_DTYPES["pnmimage"], numpy.uint16),
+                 (numpy.array([True, False]), converters.INTEGER_TYPES, numpy.uint8)]
+        for data, dtypes, expected in cases:
+            res = converters.convert_data_integer(data, dtypes)
+            self.assertEqual(res.dtype, numpy.dtype(expected), "dtype for %s" % data)
+            self.assertEqual(abs(res - data.astype(int)).max(), 0, "values for %s" % data)
+
+    def test_no_copy(self):
+        "Compatible data are neither copied nor widened"
+        data = numpy.arange(100, dtype=numpy.uint16).reshape(10, 10)
+        self.assertIs(CbfImage.checkData(data), data, "uint16 kept for CBF")
+        view = converters.convert_data_integer(data, ("int16", "int32"))
+        self.assertEqual(view.dtype, numpy.int16, "reinterpreted as int16")
+        self.assertTrue(numpy.may_share_memory(view, data), "same buffer")
+        self.assertEqual(abs(view - data).max(), 0, "same values")
+
+    def test_write_only(self):
+        "Data are converted when written, not when the image is created"
+        data = numpy.linspace(0, 1000, 600).astype(numpy.float32).reshape(20, 30)
+        expected = data.copy()
+        cbf = CbfImage(data=data)
+        self.assertIs(cbf.data, data, "data kept as given")
+        filename = os.path.join(UtilsTest.tempdir, "write_only.cbf")
+        cbf.write(filename)
+        self.assertEqual(abs(data - expected).max(), 0, "data not modified")
+        res = fabio.open(filename).data
+        self.assertEqual(res.dtype, numpy.uint16, "written as uint16")
+        self.assertEqual(abs(res - data.astype(int)).max(), 0, "values")
+        os.unlink(filename)
+
+    def test_convert(self):
+        "Conversion of an EDF image to formats storing integers"
+        data = numpy.random.randint(0, 4000, size=(20, 30)).astype(numpy.float32)
+        edf = EdfImage(data=data)
+        self.assertEqual(edf.convert("cbf").data.dtype, numpy.uint16, "CBF")
+        self.assertEqual(edf.convert("OXD").data.dtype, numpy.int32, "OXD")
+        self.assertEqual(OXDimage.checkData(data).dtype, numpy.int32, "OXD checkData")
+        self.assertEqual(CbfImage(data=data).data.dtype, numpy.float32, "CBF image from float data")
+
+
+def suite():
+    testsuite = unittest.TestSuite()
+    testsuite.addTest(TestIntegerConversion("test_narrowest"))
+    testsuite.addTest(TestIntegerConversion("test_no_copy"))
+    testsuite.addTest(TestIntegerConversion("test_write_only"))
+    testsuite.addTest(TestIntegerConversion("test_convert"))
+    return testsuite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
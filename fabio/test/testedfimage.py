@@ -44,6 +44,7 @@ from .utilstest import UtilsTest
 logger = UtilsTest.get_logger(__file__)
 fabio = sys.modules["fabio"]
 from fabio.edfimage import edfimage
+from fabio import edfimage as edfmodule
 from fabio.third_party import six
 
 
@@ -336,9 +337,171 @@ class TestEdfWrite(unittest.TestCase):
         self.assert_(abs(r.data - self.data).max() == 0, "data are OK")
         self.assertEqual(int(r.header["EDF_HeaderSize"]), 512, "header size is one 512 block")
 
+    def testByteOffset(self):
+        self.filename = os.path.join(self.tmpdir, "merged_bo.edf")
+        data = (self.data * 1000 - 30000).astype("int32")
+        header = {"toto": "tutu", "Compression": "BYTE_OFFSET"}
+        e = edfimage(data=data, header=header)
+        e.write(self.filename)
+        r = fabio.open(self.filename)
+        self.assertEqual(r.header["Compression"], "BYTE_OFFSET", "compression is kept")
+        self.assertEqual(int(r.header["Size"]), len(fabio.compression.compByteOffset(data)), "size is the compressed one")
+        self.assertEqual(r.data.dtype, data.dtype, "dtype is OK")
+        self.assertEqual(abs(r.data - data).max(), 0, "data are OK")
+
+    def tearDown(self):
+        os.unlink(self.filename)
+
+
+class TestEdfFrameTable(unittest.TestCase):
+    """
+    Multi-frame EDF files are described by a compact frame table
+    """
+    def setUp(self):
+        self.filename = os.path.join(UtilsTest.tempdir, "frametable.edf")
+        self.nframes = 5
+        e = edfimage(data=numpy.zeros((8, 10), numpy.uint16), header={"frame": 0})
+        for i in range(1, self.nframes):
+            e.appendFrame(data=(numpy.arange(80, dtype=numpy.float32) * i).reshape(8, 10),
+                          header={"frame": i})
+        e.write(self.filename)
+
     def tearDown(self):
         os.unlink(self.filename)
 
+    def test_lazy_header(self):
+        obj = fabio.open(self.filename)
+        self.assertEqual(obj.nframes, self.nframes, "number of frames")
+        table = obj._frames[0]._table
+        self.assertEqual(len(table), self.nframes, "one row per frame")
+        for frame in obj._frames:
+            self.assertTrue(frame._table is table, "frames share the table")
+            self.assertTrue(frame._header is None, "header not parsed yet")
+        frame = obj._frames[3]
+        self.assertEqual(frame.dims, [10, 8], "dims")
+        self.assertEqual(frame.bytecode, numpy.float32, "bytecode")
+        self.assertTrue(frame._header is None, "layout does not need the header")
+        self.assertEqual(frame.header["frame"], "3", "header is parsed on demand")
+        self.assertTrue(frame.header is frame.header, "parsed header is kept")
+        self.assertTrue(obj._frames[2]._header is None, "other headers are not parsed")
+        self.assertEqual(obj.getframe(2).data.dtype, numpy.float32, "data of frame 2")
+        self.assertFalse(obj._frames[2].swap_needed(), "byte order from the table")
+        self.assertTrue(obj._frames[2]._header is None, "reading data does not parse the header")
+
+    def test_max_dims(self):
+        table = edfmodule.FrameTable()
+        index = table.new_row()
+        table.set_dims(index, list(range(2, 4 + edfmodule.MAX_DIMS)))
+        self.assertEqual(table.get_dims(index), list(range(2, 2 + edfmodule.MAX_DIMS)), "extra dims are ignored")
+
+    def test_data(self):
+        obj = fabio.open(self.filename)
+        self.assertEqual(obj.data.dtype, numpy.uint16, "first frame dtype")
+        for i in range(1, self.nframes):
+            frame = obj.getframe(i)
+            self.assertEqual(frame.header["frame"], str(i), "header of frame %s" % i)
+            self.assertEqual(abs(frame.data - numpy.arange(80).reshape(8, 10) * i).max(), 0, "data of frame %s" % i)
+
+    def test_rewrite(self):
+        obj = fabio.open(self.filename)
+        obj.getframe(2).header["extra"] = "blah"
+        obj.write(self.filename)
+        obj = fabio.open(self.filename)
+        self.assertEqual(obj.getframe(2).header["extra"], "blah", "modified header is saved")
+        self.assertEqual(obj.getframe(4).header["frame"], "4", "untouched header is saved")
+
+
+class TestEdfHeaderParser(unittest.TestCase):
+    """
+    Compiled header parser and reading of long headers
+    """
+    BLOCKS = ["\nHeaderID = EH:000001:000000:000000 ;\nImage = 1 ;\nDim_1 = 10 ;\n",
+              "Dim_1=10;dim_1 = 12; no equal sign ;\t key \x00 with null = \x00value = 3\x00 ;;",
+              " Empty = ;  = empty key ; last = no semicolon ",
+              "",
+              ";;;"]
+
+    def test_parser(self):
+        if edfmodule._parse_header is None:
+            self.skipTest("_edf cython module not available")
+        for block in self.BLOCKS + self.BLOCKS:
+            ref_header, ref_caps = edfmodule._parse_header_block(block)
+            header, caps = edfmodule._parse_header(block.encode("ASCII"))
+            self.assertEqual(list(header.items()), list(ref_header.items()), "header of %r" % block)
+            self.assertEqual(caps, ref_caps, "upper-case keys of %r" % block)
+            self.assertTrue(isinstance(header, type(ref_header)), "header is an OrderedDict")
+        first = edfmodule._parse_header(self.BLOCKS[0])[0]
+        second = edfmodule._parse_header(self.BLOCKS[0].replace("1 ;", "2 ;"))[0]
+        self.assertTrue(all(i is j for i, j in zip(first, second)), "keys are interned")
+
+    def test_select(self):
+        select = frozenset(["DIM_1", "EMPTY", "LAST", "MISSING"])
+        parsers = [edfmodule._parse_header_block]
+        if edfmodule._parse_header is not None:
+            parsers.append(edfmodule._parse_header)
+        for parse in parsers:
+            for block in self.BLOCKS + self.BLOCKS:
+                full_header, full_caps = parse(block)
+                header, caps = parse(block, select)
+                self.assertEqual(caps, dict((k, v) for k, v in full_caps.items() if k in select), "caps of %r" % block)
+                self.assertEqual(list(header.items()), [(k, v) for k, v in full_header.items() if k.upper() in select],
+                                 "selected keys of %r" % block)
+
+    def test_long_header(self):
+        filename = os.path.join(UtilsTest.tempdir, "longheader.edf")
+        header = dict(("motor_%03i" % i, str(i * 1.5)) for i in range(300))
+        e = edfimage(data=numpy.arange(80, dtype=numpy.uint16).reshape(8, 10), header=header)
+        e.appendFrame(data=numpy.ones((8, 10), numpy.uint16), header=header)
+        e.write(filename)
+        obj = fabio.open(filename)
+        self.assertEqual(obj.nframes, 2, "number of frames")
+        for key, value in header.items():
+            self.assertEqual(obj.header[key], value, "key %s" % key)
+        self.assertEqual(abs(obj.data - numpy.arange(80).reshape(8, 10)).max(), 0, "data of frame 0")
+        frame = obj.getframe(1)
+        self.assertEqual(frame.header["motor_299"], header["motor_299"], "header of frame 1")
+        self.assertEqual(abs(frame.data - 1).max(), 0, "data of frame 1")
+        os.unlink(filename)
+
+
+class TestEdfConcurrentRead(unittest.TestCase):
+    """
+    Frames of a shared EDF file read from many threads at once
+    """
+    def setUp(self):
+        self.filename = os.path.join(UtilsTest.tempdir, "concurrent.edf")
+        self.nframes = 32
+        self.shape = (64, 48)
+        e = edfimage(data=self.reference(0))
+        for i in range(1, self.nframes):
+            e.appendFrame(data=self.reference(i))
+        e.write(self.filename)
+
+    def tearDown(self):
+        os.unlink(self.filename)
+
+    def reference(self, i):
+        return (numpy.arange(self.shape[0] * self.shape[1], dtype=numpy.uint32) + 1000 * i).reshape(self.shape)
+
+    def test_threadpool(self):
+        from multiprocessing.pool import ThreadPool
+        obj = fabio.open(self.filename)
+
+        def read_frame(i):
+            # fresh view to force a read from disk every time
+            frame = edfimage(frames=obj._frames).getframe(i)
+            frame._frames[i]._data = None
+            return i, frame.data
+
+        pool = ThreadPool(8)
+        try:
+            for _ in range(5):
+                for i, data in pool.imap_unordered(read_frame, list(range(self.nframes)) * 4):
+                    self.assertEqual(abs(data - self.reference(i)).max(), 0, "frame %s is correct" % i)
+        finally:
+            pool.close()
+            pool.join()
+
 
 class TestEdfRegression(unittest.TestCase):
     """
@@ -388,7 +551,16 @@ def suite():
     testsuite.addTest(TestEdfWrite("testFlat"))
     testsuite.addTest(TestEdfWrite("testGzip"))
     testsuite.addTest(TestEdfWrite("testBzip2"))
+    testsuite.addTest(TestEdfWrite("testByteOffset"))
     testsuite.addTest(TestEdfRegression("bug_27"))
+    testsuite.addTest(TestEdfFrameTable("test_lazy_header"))
+    testsuite.addTest(TestEdfFrameTable("test_max_dims"))
+    testsuite.addTest(TestEdfFrameTable("test_data"))
+    testsuite.addTest(TestEdfFrameTable("test_rewrite"))
+    testsuite.addTest(TestEdfHeaderParser("test_parser"))
+    testsuite.addTest(TestEdfHeaderParser("test_select"))
+    testsuite.addTest(TestEdfHeaderParser("test_long_header"))
+    testsuite.addTest(TestEdfConcurrentRead("test_threadpool"))
 
     return testsuite
 
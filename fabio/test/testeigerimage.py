@@ -21,6 +21,7 @@ if __name__ == '__main__':
     import pkgutil
     __path__ = pkgutil.extend_path([os.path.dirname(__file__)], "fabio.test")
 from .utilstest import UtilsTest
+import numpy
 
 
 logger = UtilsTest.get_logger(__file__)
@@ -28,10 +29,15 @@ fabio = sys.modules["fabio"]
 
 from fabio.openimage import openimage
 from fabio.eigerimage import EigerImage, h5py
+from fabio import directchunk
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
 
 
 def make_hdf5(name, shape=(50, 99, 101)):
-    with h5py.File(name) as h:
+    with h5py.File(name, mode="a") as h:
         e = h.require_group("entry/data")
         if len(shape) == 2:
             e.require_dataset("data", shape, compression="gzip", compression_opts=9, dtype="float32")
@@ -72,11 +78,158 @@ class TestEiger(unittest.TestCase):
         self.assertEqual(e.bpp, 4, "bpp OK")
 
 
+class TestEigerChunks(unittest.TestCase):
+    """Direct chunk reads with threaded decompression"""
+
+    def setUp(self):
+        self.fn = os.path.join(UtilsTest.tempdir, "eiger_chunks.h5")
+        self.stack = numpy.random.randint(0, 1000, size=(23, 31, 17)).astype(numpy.uint32)
+        with h5py.File(self.fn, mode="w") as h:
+            grp = h.require_group("entry/data")
+            grp.create_dataset("data_000001", data=self.stack[:10], chunks=(1, 31, 17),
+                               compression="gzip", shuffle=True)
+            grp.create_dataset("data_000002", data=self.stack[10:20], chunks=(3, 31, 17),
+                               compression="gzip")
+            grp.create_dataset("data_000003", data=self.stack[20:], chunks=(1, 8, 17),
+                               compression="gzip")
+
+    def tearDown(self):
+        if os.path.exists(self.fn):
+            os.unlink(self.fn)
+
+    def test_reader(self):
+        e = EigerImage()
+        e.read(self.fn)
+        readers = [e._get_dataset(i)[1] for i in range(3)]
+        self.assertEqual([r.supported for r in readers], [True, True, False], "supported layouts")
+        reader = readers[1]
+        out = numpy.zeros((5, 31, 17), dtype=numpy.uint32)
+        reader.read(2, 7, out)
+        self.assertEqual(abs(out - self.stack[12:17]).max(), 0, "partial chunks")
+
+    def test_read_frames(self):
+        e = EigerImage()
+        e.read(self.fn)
+        for workers in (1, 4):
+            data = e.read_frames(0, 23, workers=workers)
+            self.assertEqual(abs(data - self.stack).max(), 0, "all frames, %s workers" % workers)
+        out = numpy.zeros((12, 31, 17), dtype=numpy.uint32)
+        e.read_frames(8, 20, out=out)
+        self.assertEqual(abs(out - self.stack[8:20]).max(), 0, "across datasets")
+        for i in (0, 9, 13, 22):
+            self.assertEqual(abs(e.getframe(i).data - self.stack[i]).max(), 0, "frame %s" % i)
+        self.assertRaises(IndexError, e.read_frames, 20, 24)
+
+    def test_step(self):
+        e = EigerImage()
+        e.read(self.fn)
+        for start, stop, step in ((0, 23, 2), (1, 23, 4), (3, 22, 7), (9, 12, 1), (21, 22, 5)):
+            data = e.read_frames(start, stop, step, workers=2)
+            self.assertEqual(abs(data - self.stack[start:stop:step]).max(), 0,
+                             "frames [%s:%s:%s]" % (start, stop, step))
+        out = numpy.zeros((8, 31, 17), dtype=numpy.float64)
+        e.read_frames(0, 23, 3, out=out)
+        self.assertEqual(abs(out - self.stack[::3]).max(), 0, "with conversion")
+        self.assertRaises(ValueError, e.read_frames, 0, 10, 2, out=out)
+
+    def test_plugins(self):
+        "LZ4 and bitshuffle chunks decompressed without the HDF5 plugins"
+        fn = os.path.join(UtilsTest.tempdir, "eiger_lz4.h5")
+        with h5py.File(fn, mode="w") as h:
+            grp = h.require_group("entry/data")
+            grp.create_dataset("data_000001", data=self.stack[:10], chunks=(1, 31, 17),
+                               **hdf5plugin.LZ4())
+            grp.create_dataset("data_000002", data=self.stack[10:], chunks=(1, 31, 17),
+                               **hdf5plugin.Bitshuffle())
+        try:
+            e = EigerImage()
+            e.read(fn)
+            readers = [e._get_dataset(i)[1] for i in range(2)]
+            self.assertEqual([r.supported for r in readers], [True, True], "supported filters")
+            self.assertEqual(abs(e.read_frames(0, 23, workers=2) - self.stack).max(), 0, "content")
+            e.close()
+        finally:
+            os.unlink(fn)
+
+
+class TestEigerLinks(unittest.TestCase):
+    """Master file with external links to the data files"""
+
+    def setUp(self):
+        self.master = os.path.join(UtilsTest.tempdir, "eiger_master.h5")
+        self.files = [os.path.join(UtilsTest.tempdir, "eiger_data_%06i.h5" % i) for i in range(1, 4)]
+        self.stack = numpy.random.randint(0, 1000, size=(25, 13, 11)).astype(numpy.uint16)
+        for i, fn in enumerate(self.files):
+            with h5py.File(fn, mode="w") as h:
+                h.create_dataset("entry/data/data", data=self.stack[10 * i:10 * (i + 1)],
+                                 chunks=(1, 13, 11), compression="gzip")
+        with h5py.File(self.master, mode="w") as h:
+            grp = h.require_group("entry/data")
+            for i, fn in enumerate(self.files):
+                grp["data_%06i" % (i + 1)] = h5py.ExternalLink(os.path.basename(fn), "entry/data/data")
+            specific = h.require_group("entry/instrument/detector/detectorSpecific")
+            specific["nimages"] = 5
+            specific["ntrigger"] = 5
+
+    def tearDown(self):
+        for fn in [self.master] + self.files:
+            if os.path.exists(fn):
+                os.unlink(fn)
+
+    def test_lazy(self):
+        "Only the first and last data files are opened to read the master file"
+        os.rename(self.files[1], self.files[1] + ".bak")
+        try:
+            e = EigerImage()
+            e.read(self.master)
+            self.assertEqual(e.nframes, 25, "number of frames")
+            self.assertIs(e.dataset[1], None, "second data file not opened")
+            self.assertEqual(abs(e.data - self.stack[0]).max(), 0, "first frame")
+            self.assertEqual(abs(e.getframe(24).data - self.stack[24]).max(), 0, "last file")
+            self.assertIs(e.dataset[1], None, "second file still not opened")
+            e.close()
+        finally:
+            os.rename(self.files[1] + ".bak", self.files[1])
+
+    def test_read_frames(self):
+        e = EigerImage()
+        e.read(self.master)
+        self.assertEqual(abs(e.read_frames(0, 25) - self.stack).max(), 0, "all frames")
+        self.assertEqual(abs(e.getframe(24).data - self.stack[24]).max(), 0, "last frame")
+        e.close()
+
+    def test_inconsistent(self):
+        "Data file holding fewer frames than the first one"
+        with h5py.File(self.files[1], mode="w") as h:
+            h.create_dataset("entry/data/data", data=self.stack[10:15], chunks=(1, 13, 11))
+        stack = numpy.concatenate((self.stack[:15], self.stack[20:]))
+        e = EigerImage()
+        e.read(self.master)
+        self.assertEqual(e.nframes, 25, "second file assumed complete")
+        frame = e.getframe(1)
+        self.assertEqual(abs(e.read_frames(5, 20, 2) - stack[5::2]).max(), 0, "content")
+        self.assertEqual(e.nframes, 20, "corrected when the second file is opened")
+        self.assertEqual(frame.nframes, 20, "frames share the correction")
+        self.assertEqual(abs(frame.getframe(19).data - stack[19]).max(), 0, "last frame")
+        self.assertRaises(IndexError, e.read_frames, 15, 21)
+        frame.close()
+        e.close()
+
+
 def suite():
     testsuite = unittest.TestSuite()
     if h5py is not None:
         testsuite.addTest(TestEiger("test_read"))
         testsuite.addTest(TestEiger("test_open"))
+        testsuite.addTest(TestEigerChunks("test_reader"))
+        testsuite.addTest(TestEigerChunks("test_read_frames"))
+        testsuite.addTest(TestEigerChunks("test_step"))
+        if hdf5plugin is not None and directchunk.lz4_block is not None and \
+                directchunk.bitshuffle is not None:
+            testsuite.addTest(TestEigerChunks("test_plugins"))
+        testsuite.addTest(TestEigerLinks("test_lazy"))
+        testsuite.addTest(TestEigerLinks("test_read_frames"))
+        testsuite.addTest(TestEigerLinks("test_inconsistent"))
     return testsuite
 
 
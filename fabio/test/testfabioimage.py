@@ -73,6 +73,60 @@ class test50000(unittest.TestCase):
         self.assertEqual(self.obj.getstddev(), 0)
 
 
+class TestStats(unittest.TestCase):
+    """Statistics computed in one pass"""
+
+    def setUp(self):
+        self.data = numpy.random.randint(0, 1000, size=(613, 517)).astype(numpy.int32)
+        self.data[5, :20] = -1
+        self.obj = fabioimage(self.data)
+
+    def test_stats(self):
+        for workers in (1, 3):
+            self.obj.resetvals()
+            res = self.obj.stats(workers=workers)
+            self.assertEqual(res["min"], self.data.min(), "min")
+            self.assertEqual(res["max"], self.data.max(), "max")
+            self.assertAlmostEqual(res["mean"], self.data.mean(dtype=numpy.float64), 8, "mean")
+            self.assertAlmostEqual(res["std"], self.data.std(dtype=numpy.float64), 8, "std")
+            self.assertEqual(res["sum"], self.data.sum(), "sum")
+            self.assertEqual(res["count"], self.data.size, "count")
+        self.assertEqual(self.obj.getmax(), self.data.max(), "getmax uses the cache")
+        self.assertAlmostEqual(self.obj.getstddev(), self.data.std(dtype=numpy.float64), 8, "getstddev")
+
+    def test_nan(self):
+        data = numpy.random.random((613, 517))
+        data[-1, -1] = numpy.nan
+        for workers in (1, 3):
+            obj = fabioimage(data)
+            res = obj.stats(workers=workers)
+            self.assertTrue(numpy.isnan(res["max"]), "max propagates NaN")
+            self.assertTrue(numpy.isnan(res["min"]), "min propagates NaN")
+        obj = fabioimage(data)
+        self.assertTrue(numpy.isnan(obj.getmax()), "getmax like numpy.max")
+
+    def test_masked(self):
+        valid = self.data[self.data != -1]
+        res = self.obj.stats(dummy=-1, saturation=900, bins=7, workers=2)
+        self.assertEqual(res["masked"], 20, "masked pixels")
+        self.assertEqual(res["count"], valid.size, "valid pixels")
+        self.assertEqual(res["min"], valid.min(), "min without dummy")
+        self.assertAlmostEqual(res["mean"], valid.mean(dtype=numpy.float64), 8, "mean without dummy")
+        self.assertEqual(res["saturated"], (valid >= 900).sum(), "saturated pixels")
+        hist, edges = numpy.histogram(valid, 7)
+        self.assertEqual(abs(res["histogram"] - hist).max(), 0, "histogram")
+        self.assertTrue(numpy.allclose(res["bin_edges"], edges), "bin edges")
+        res = self.obj.stats(bins=4, hist_range=(0, 100))
+        self.assertEqual(abs(res["histogram"] - numpy.histogram(self.data, 4, (0, 100))[0]).max(), 0, "range")
+
+    def test_cache(self):
+        first = self.obj.stats()
+        self.assertEqual(self.obj._stats[(None, None, None, None, None)]["max"], first["max"], "cached")
+        self.obj.data = self.obj.data * 2
+        self.obj.resetvals()
+        self.assertEqual(self.obj.stats()["max"], 2 * first["max"], "cache invalidated by resetvals")
+
+
 class testslices(unittest.TestCase):
     """check slicing"""
     def setUp(self):
@@ -106,6 +160,21 @@ class testslices(unittest.TestCase):
         self.assertEqual(area1, area2)
         self.assertEqual(area1, self.npix * 100)
 
+    def testintegrateareas(self):
+        """ integrations with the summed-area table"""
+        self.obj.resetvals()
+        rois = [self.cord, self.slic, (slice(0, 10), slice(None)), [0, 0, 1023, 1023]]
+        res = self.obj.integrate_areas(rois)
+        self.assertEqual(res[0], self.npix * 100, "coordinates")
+        self.assertEqual(res[1], self.npix * 100, "slices")
+        self.assertEqual(res[2], 0, "outside")
+        self.assertEqual(res[3], self.obj.data.sum(dtype=numpy.float64), "whole image")
+        self.assertEqual(self.obj.summed_area_table().dtype, numpy.int64, "integer table")
+        self.assertEqual(self.obj.integrate_area(self.slic), self.npix * 100, "integrate_area uses the table")
+        self.obj.resetvals()
+        self.assertTrue(self.obj._summed_area is None, "table invalidated by resetvals")
+        self.assertEqual(self.obj.integrate_area(self.slic, summed_area=True), self.npix * 100, "opt-in")
+
     def testRebin(self):
         """Test the rebin method"""
         big = numpy.arange(64).reshape((8, 8))
@@ -113,6 +182,11 @@ class testslices(unittest.TestCase):
         fabimg = fabioimage(data=big, header={})
         fabimg.rebin(4, 4)
         self.assertEqual(abs(res - fabimg.data).max(), 0, "data are the same after rebin")
+        for dtype in (numpy.float64, numpy.uint16):
+            fabimg = fabioimage(data=big.astype(dtype), header={})
+            fabimg.rebin(4, 4, method="max")
+            self.assertEqual(fabimg.data.dtype, dtype, "type kept by max")
+            self.assertEqual(abs(fabimg.data - [[27, 31], [59, 63]]).max(), 0, "max pooling")
 
 
 class testopen(unittest.TestCase):
@@ -210,6 +284,63 @@ class testPILimage3(testPILimage):
         return ((numpy.random.random(shape) - 0.5) * sys.maxsize / 10).astype(typ)
 
 
+class TestPILtypes(unittest.TestCase):
+    """ toPIL16 with the types not listed above"""
+
+    def testtypes(self):
+        ref = numpy.arange(12).reshape(3, 4)
+        for typ in (numpy.float64, numpy.int64, numpy.bool_, ">u2", ">i4", ">f8"):
+            data = ref.astype(typ)
+            img = fabioimage(data, {})
+            pim = img.toPIL16()
+            self.assertEqual(pim.size, (4, 3), "size")
+            for i, j in ((0, 0), (1, 2), (3, 2)):
+                self.assertEqual(pim.getpixel((i, j)), float(data[j, i]), "pixel %s %s of type %s" % (i, j, typ))
+        img = fabioimage(ref.astype(numpy.uint16)[:, ::2], {})
+        self.assertEqual(img.toPIL16().getpixel((1, 2)), 10, "non contiguous data")
+        img.data = img.data + 1
+        img.resetvals()
+        self.assertEqual(img.toPIL16().getpixel((1, 2)), 11, "cache invalidated by resetvals")
+
+
+class TestThumbnail(unittest.TestCase):
+    """ 8 bit previews"""
+
+    def setUp(self):
+        self.data = numpy.arange(1000 * 600, dtype=numpy.uint32).reshape(600, 1000)
+        self.obj = fabioimage(self.data, {})
+
+    def testscales(self):
+        for scale in ("linear", "log", "percentile"):
+            thumb = self.obj.thumbnail(100, scale)
+            self.assertEqual(thumb.dtype, numpy.uint8, "uint8")
+            self.assertEqual(thumb.shape, (60, 100), "aspect ratio is kept")
+            self.assertEqual(thumb.min(), 0, "black")
+            self.assertEqual(thumb.max(), 255, "white")
+        linear = self.obj.thumbnail((50, 200), "linear")
+        self.assertEqual(linear.shape, (30, 50), "width limited")
+        self.assertTrue((numpy.diff(linear[:, 0].astype(int)) > 0).all(), "increasing")
+        log = self.obj.thumbnail((50, 200), "log")
+        self.assertTrue(log[1, 0] > linear[1, 0], "log scale")
+
+    def testnan(self):
+        data = numpy.ones((10, 10), numpy.float32)
+        data[:5] = 2
+        data[0, 0] = numpy.nan
+        thumb = fabioimage(data, {}).thumbnail(10, "linear")
+        self.assertEqual(thumb[0, 0], 0, "nan is black")
+        self.assertEqual(thumb[1, 0], 255, "max")
+        self.assertEqual(thumb[9, 9], 0, "min")
+
+    def testsave(self):
+        filename = os.path.join(UtilsTest.tempdir, "thumbnail.png")
+        thumb = self.obj.thumbnail(64, filename=filename)
+        self.assertTrue(os.path.exists(filename), "saved")
+        saved = numpy.asarray(fabio.fabioimage.Image.open(filename))
+        self.assertEqual(abs(saved - thumb).max(), 0, "same content")
+        os.unlink(filename)
+
+
 def suite():
     testsuite = unittest.TestSuite()
 
@@ -218,9 +349,14 @@ def suite():
     testsuite.addTest(test50000("testgetmean"))
     testsuite.addTest(test50000("getstddev"))
 
+    testsuite.addTest(TestStats("test_stats"))
+    testsuite.addTest(TestStats("test_nan"))
+    testsuite.addTest(TestStats("test_masked"))
+    testsuite.addTest(TestStats("test_cache"))
     testsuite.addTest(testslices("testgetmax"))
     testsuite.addTest(testslices("testgetmin"))
     testsuite.addTest(testslices("testintegratearea"))
+    testsuite.addTest(testslices("testintegrateareas"))
     testsuite.addTest(testslices("testRebin"))
 
     testsuite.addTest(testopen("testFlat"))
@@ -231,8 +367,12 @@ def suite():
         testsuite.addTest(testPILimage("testpil"))
         testsuite.addTest(testPILimage2("testpil"))
         testsuite.addTest(testPILimage3("testpil"))
+        testsuite.addTest(TestPILtypes("testtypes"))
+        testsuite.addTest(TestThumbnail("testsave"))
     else:
         logger.warning("Skipping PIL related tests")
+    testsuite.addTest(TestThumbnail("testscales"))
+    testsuite.addTest(TestThumbnail("testnan"))
     return testsuite
 
 if __name__ == '__main__':
@@ -21,6 +21,7 @@ if __name__ == '__main__':
     import pkgutil
     __path__ = pkgutil.extend_path([os.path.dirname(__file__)], "fabio.test")
 from .utilstest import UtilsTest
+import numpy
 
 
 logger = UtilsTest.get_logger(__file__)
@@ -32,7 +33,7 @@ from fabio.hdf5image import Hdf5Image, h5py
 
 
 def make_hdf5(name, shape=(50, 99, 101)):
-    with h5py.File(name) as h:
+    with h5py.File(name, mode="a") as h:
         e = h.require_group("entry")
         if len(shape) == 2:
             e.require_dataset("data", shape, compression="gzip", compression_opts=9, dtype="float32")
@@ -90,12 +91,69 @@ class TestHdf5(unittest.TestCase):
         self.assertEqual(e.nframes, 50, "nframes OK")
         self.assertEqual(e.bpp, 4, "nframes OK")
 
+    def test_read_frames(self):
+        filename = os.path.join(UtilsTest.tempdir, "frames.h5")
+        stack = numpy.random.random((20, 9, 7)).astype("float32")
+        with h5py.File(filename, mode="w") as h:
+            h["entry/data"] = stack
+        try:
+            e = Hdf5Image()
+            e.read(filename + "::entry/data")
+            self.assertEqual(abs(e.read_frames(2, 11) - stack[2:11]).max(), 0, "contiguous")
+            out = numpy.zeros((4, 9, 7), dtype="float64")
+            e.read_frames(1, 20, 5, out=out)
+            self.assertEqual(abs(out - stack[1:20:5]).max(), 0, "strided with conversion")
+            self.assertRaises(IndexError, e.read_frames, 15, 25)
+            e.close()
+        finally:
+            os.unlink(filename)
+
+    def test_url(self):
+        filename = os.path.join(UtilsTest.tempdir, "url.h5")
+        stack = numpy.random.random((10, 40, 30)).astype("float32")
+        with h5py.File(filename, mode="w") as h:
+            h["entry/data"] = stack
+            h["entry/image"] = stack[3]
+        url = "hdf5://%s?entry/data#slice=" % filename
+        try:
+            e = openimage(url + "[:,:,5]")
+            self.assertEqual(e.nframes, 1, "one frame")
+            self.assertEqual(abs(e.data - stack[:, :, 5]).max(), 0, "column of every frame")
+            e.close()
+            e = openimage(url + "[2:9:3,10:20,::2]", frame=1)
+            self.assertEqual(e.nframes, 3, "nframes of the selection")
+            self.assertEqual(abs(e.data - stack[5, 10:20, ::2]).max(), 0, "ROI of frame 1")
+            self.assertEqual(abs(e.getframe(2).data - stack[8, 10:20, ::2]).max(), 0, "ROI of frame 2")
+            self.assertEqual(abs(e.read_frames(0, 3, 2) - stack[2:9:6, 10:20, ::2]).max(), 0, "read_frames")
+            e.close()
+            e = Hdf5Image()
+            e.read(url + "[-1,...,3]")
+            self.assertEqual(abs(e.data - stack[-1, :, 3]).max(), 0, "row")
+            self.assertEqual(e.data.shape, (1, 40), "row shape")
+            e.read(filename + "::entry/data")
+            self.assertEqual(e.nframes, 10, "slice of the URL is forgotten")
+            self.assertEqual(abs(e.data - stack[0]).max(), 0, "full frame")
+            e.read(url + "[2]")
+            frame = e.getframe(0)
+            self.assertEqual(abs(frame.data - stack[2]).max(), 0, "getframe of a 2D selection")
+            frame.close()
+            self.assertRaises(RuntimeError, e.getframe, 1)
+            e.read(filename + "::entry/image")
+            frame = e.getframe(0)
+            self.assertEqual(abs(frame.data - stack[3]).max(), 0, "getframe of a 2D dataset")
+            frame.close()
+            e.close()
+        finally:
+            os.unlink(filename)
+
 
 def suite():
     testsuite = unittest.TestSuite()
     if h5py is not None:
         testsuite.addTest(TestHdf5("test_read"))
         testsuite.addTest(TestHdf5("test_open"))
+        testsuite.addTest(TestHdf5("test_read_frames"))
+        testsuite.addTest(TestHdf5("test_url"))
     return testsuite
 
 
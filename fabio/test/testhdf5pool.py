@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#    Project: Fable Input Output
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+
+"""Test the pool of HDF5 files
+"""
+
+from __future__ import print_function, with_statement, division, absolute_import
+import unittest
+import sys
+import os
+import time
+
+if __name__ == '__main__':
+    import pkgutil
+    __path__ = pkgutil.extend_path([os.path.dirname(__file__)], "fabio.test")
+from .utilstest import UtilsTest
+import numpy
+
+logger = UtilsTest.get_logger(__file__)
+fabio = sys.modules["fabio"]
+from fabio.hdf5pool import Hdf5FilePool, h5py
+from fabio import hdf5pool
+from fabio.hdf5image import Hdf5Image
+
+
+class TestHdf5Pool(unittest.TestCase):
+
+    def setUp(self):
+        self.filenames = []
+        for i in range(3):
+            filename = os.path.join(UtilsTest.tempdir, "pool_%i.h5" % i)
+            with h5py.File(filename, mode="w") as h:
+                h["entry/data"] = numpy.arange(60, dtype="float32").reshape(3, 4, 5) + i
+            self.filenames.append(filename)
+
+    def tearDown(self):
+        hdf5pool.pool.clear()
+        for filename in self.filenames:
+            if os.path.exists(filename):
+                os.unlink(filename)
+
+    def test_refcount(self):
+        pool = Hdf5FilePool()
+        h1 = pool.acquire(self.filenames[0])
+        h2 = pool.acquire(self.filenames[0])
+        self.assertTrue(h1 is h2, "shared handle")
+        pool.retain(h1)
+        h3 = pool.acquire(self.filenames[1])
+        self.assertEqual(pool.stats()["open"], 2, "files in use stay open")
+        pool.release(h1)
+        pool.release(h1)
+        self.assertTrue(h1.id.valid, "file still in use")
+        pool.release(h1)
+        self.assertFalse(h1.id.valid, "file closed when released")
+        stats = pool.stats()
+        self.assertEqual((stats["open"], stats["in_use"]), (1, 1), "open files")
+        with h5py.File(self.filenames[0], mode="a"):
+            pass
+        self.assertTrue(h3.id.valid, "file in use still open")
+        pool.clear()
+        self.assertFalse(h3.id.valid, "clear closes everything")
+
+    def test_keep_idle(self):
+        pool = Hdf5FilePool(keep_idle=1)
+        h1 = pool.acquire(self.filenames[0])
+        pool.release(h1)
+        self.assertTrue(h1.id.valid, "idle file stays open")
+        self.assertTrue(pool.acquire(self.filenames[0]) is h1, "idle file reused")
+        pool.release(h1)
+        h2 = pool.acquire(self.filenames[1])
+        pool.release(h2)
+        stats = pool.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2), "hits and misses")
+        self.assertEqual(stats["evictions"], 1, "evictions")
+        self.assertFalse(h1.id.valid, "least recently used idle file closed")
+        self.assertTrue(h2.id.valid, "most recently used idle file open")
+        pool.clear()
+
+    def test_modified(self):
+        if sys.platform == "win32":
+            self.skipTest("open files can not be replaced under Windows")
+        pool = Hdf5FilePool(keep_idle=1)
+        h1 = pool.acquire(self.filenames[0])
+        pool.release(h1)
+        time.sleep(0.01)
+        # HDF5 refuses to open for writing a file already opened: replace it
+        replacement = self.filenames[0] + ".tmp"
+        with h5py.File(replacement, mode="w") as h:
+            h["entry/other"] = numpy.zeros(10)
+        os.rename(replacement, self.filenames[0])
+        h2 = pool.acquire(self.filenames[0])
+        self.assertFalse(h1 is h2, "modified file is reopened")
+        self.assertFalse(h1.id.valid, "outdated handle closed")
+        self.assertTrue("entry/other" in h2, "new content")
+        pool.clear()
+
+    def test_images(self):
+        before = hdf5pool.pool.stats()
+        img = Hdf5Image()
+        img.read(self.filenames[0] + "::entry/data")
+        frame = img.getframe(2)
+        other = fabio.open(self.filenames[0] + "::entry/data")
+        self.assertTrue(img.hdf5 is other.hdf5, "images share the file")
+        img.close()
+        other.close()
+        self.assertTrue(frame.hdf5.id.valid, "frame keeps the file open")
+        self.assertEqual(abs(frame.data - (numpy.arange(40, 60).reshape(4, 5))).max(), 0, "data")
+        frame.close()
+        after = hdf5pool.pool.stats()
+        self.assertEqual(after["hits"] - before["hits"], 1, "one hit")
+        self.assertEqual(after["in_use"], 0, "all released")
+        self.assertEqual(after["open"], 0, "all closed")
+        with h5py.File(self.filenames[0], mode="a") as h:
+            h["entry/other"] = numpy.zeros(10)
+
+
+def suite():
+    testsuite = unittest.TestSuite()
+    if h5py is not None:
+        testsuite.addTest(TestHdf5Pool("test_refcount"))
+        testsuite.addTest(TestHdf5Pool("test_keep_idle"))
+        testsuite.addTest(TestHdf5Pool("test_modified"))
+        testsuite.addTest(TestHdf5Pool("test_images"))
+    return testsuite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
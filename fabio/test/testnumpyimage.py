@@ -95,12 +95,28 @@ class TestNumpy(unittest.TestCase):
             if os.path.exists(self.fn):
                 os.unlink(self.fn)
 
+    def test_memmap(self):
+        "3D stacks are memory-mapped and frames are views"
+        stack = numpy.random.random((5, 11, 9)).astype("float32")
+        numpy.save(self.fn, stack)
+        obj = openimage(self.fn)
+        self.assertTrue(isinstance(obj.dataset, numpy.memmap), "memory-mapped")
+        self.assertEqual(obj.nframes, 5, "nframes")
+        frame = obj.getframe(3)
+        self.assertTrue(numpy.may_share_memory(frame.data, obj.dataset), "zero-copy frame")
+        self.assertEqual(abs(frame.data - stack[3]).max(), 0, "frame content")
+        frame.data[frame.data > 0.5] = 0
+        self.assertEqual(abs(numpy.load(self.fn)[3] - stack[3]).max(), 0, "copy on write")
+        obj = None
+        frame = None
+
 
 def suite():
     testsuite = unittest.TestSuite()
     testsuite.addTest(TestNumpy("test_read"))
     testsuite.addTest(TestNumpy("test_write"))
     testsuite.addTest(TestNumpy("test_multidim"))
+    testsuite.addTest(TestNumpy("test_memmap"))
     return testsuite
 
 if __name__ == '__main__':
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#    Project: Fable Input Output
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Test for streaming reductions over frames.
+"""
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+import os
+import sys
+import unittest
+if __name__ == '__main__':
+    import pkgutil
+    __path__ = pkgutil.extend_path([os.path.dirname(__file__)], "fabio.test")
+from .utilstest import UtilsTest
+import numpy
+logger = UtilsTest.get_logger(__file__)
+fabio = sys.modules["fabio"]
+from fabio.edfimage import edfimage
+from fabio.reduction import reduce, iter_blocks, series_stats, rebin, integrate_series, \
+    summed_area_table
+
+
+class TestReduce(unittest.TestCase):
+
+    def setUp(self):
+        self.stack = numpy.random.randint(0, 60000, size=(13, 17, 11)).astype(numpy.uint16)
+        self.filenames = []
+
+    def tearDown(self):
+        for filename in self.filenames:
+            os.unlink(filename)
+
+    def check(self, res, stack):
+        self.assertEqual(res["count"], len(stack), "count")
+        self.assertTrue(numpy.allclose(res["mean"], stack.mean(axis=0, dtype=numpy.float64)), "mean")
+        self.assertTrue(numpy.allclose(res["std"], stack.std(axis=0, dtype=numpy.float64)), "std")
+        self.assertTrue(numpy.allclose(res["sum"], stack.sum(axis=0, dtype=numpy.float64)), "sum")
+        self.assertEqual(abs(res["max"] - stack.max(axis=0)).max(), 0, "max")
+        self.assertEqual(abs(res["min"] - stack.min(axis=0)).max(), 0, "min")
+
+    def test_array(self):
+        for chunk in (1, 4, 20):
+            for workers in (1, 3):
+                res = reduce(self.stack, chunk=chunk, workers=workers)
+                self.check(res, self.stack)
+
+    def test_mixed_types(self):
+        floats = (self.stack[6:] * 1.5).astype(numpy.float32)
+        floats[0, 0, 0] = 1e6
+        large = self.stack[4:6].astype(numpy.int64)
+        large[0, 0, 1] = 2 ** 40
+        stack = numpy.concatenate((self.stack[:4].astype(numpy.float64), large, floats))
+        for workers in (1, 3):
+            res = reduce([self.stack[:4], large, floats], chunk=3, workers=workers)
+            self.check(res, stack)
+            self.assertEqual(res["max"].dtype, numpy.float64, "promoted type")
+
+    def test_multiframe(self):
+        filename = os.path.join(UtilsTest.tempdir, "reduce.edf")
+        self.filenames.append(filename)
+        e = edfimage(data=self.stack[0])
+        for frame in self.stack[1:]:
+            e.appendFrame(data=frame)
+        e.write(filename)
+        self.check(reduce(filename, chunk=5, workers=2), self.stack)
+
+    def test_series(self):
+        for i, frame in enumerate(self.stack):
+            filename = os.path.join(UtilsTest.tempdir, "reduce_%04i.edf" % i)
+            self.filenames.append(filename)
+            edfimage(data=frame).write(filename)
+        self.check(reduce(self.filenames, chunk=4, workers=2), self.stack)
+        res = reduce(self.filenames, ops=("mean",), workers=1)
+        self.assertEqual(set(res.keys()), set(("mean", "count")), "only the requested ops")
+
+    def test_series_stats(self):
+        for i, frame in enumerate(self.stack[:5]):
+            filename = os.path.join(UtilsTest.tempdir, "stats_%04i.edf" % i)
+            self.filenames.append(filename)
+            edfimage(data=frame).write(filename)
+        for workers in (1, 3):
+            res = list(series_stats(self.filenames + [self.stack[5:]], workers=workers, saturation=50000))
+            self.assertEqual(len(res), len(self.stack), "one result per frame")
+            self.assertEqual([i["filename"] for i in res[:5]], self.filenames, "filenames in order")
+            self.assertEqual([i["frame"] for i in res[5:]], list(range(len(self.stack) - 5)), "frame index")
+            for frame, stats in zip(self.stack, res):
+                self.assertEqual(stats["max"], frame.max(), "max")
+                self.assertAlmostEqual(stats["mean"], frame.mean(dtype=numpy.float64), 6, "mean")
+                self.assertEqual(stats["saturated"], (frame >= 50000).sum(), "saturated")
+
+    def test_integrate_series(self):
+        rois = [(slice(0, 5), slice(2, 7)), (slice(3, None), slice(None)), [1, 2, 4, 9]]
+        res = integrate_series(self.stack, rois, workers=3)
+        self.assertEqual(res.shape, (len(self.stack), len(rois)), "shape")
+        for frame, sums in zip(self.stack, res):
+            img = fabio.fabioimage.FabioImage(frame)
+            expected = [frame[rois[0]].sum(), frame[rois[1]].sum(), frame[img.make_slice(list(rois[2]))].sum()]
+            self.assertEqual(abs(sums - expected).max(), 0, "sums")
+        table = summed_area_table(self.stack)
+        self.assertEqual(table.shape, (13, 18, 12), "table of a stack")
+        self.assertEqual(abs(table[:, -1, -1] - self.stack.sum(axis=(1, 2))).max(), 0, "total")
+
+    def test_stability(self):
+        "Welford's update does not suffer from catastrophic cancellation"
+        stack = numpy.random.random((50, 4, 4)) + 1e9
+        res = reduce(stack, ops=("std",), chunk=7)
+        self.assertTrue(numpy.allclose(res["std"], stack.std(axis=0), rtol=1e-5), "std")
+
+    def test_blocks(self):
+        blocks = [block.copy() for block in iter_blocks([self.stack[:5], self.stack[5]], chunk=2)]
+        self.assertEqual([len(b) for b in blocks], [2, 2, 1, 1], "block sizes")
+        self.assertEqual(abs(numpy.concatenate(blocks) - self.stack[:6]).max(), 0, "block content")
+
+
+class TestRebin(unittest.TestCase):
+
+    def setUp(self):
+        self.stack = numpy.random.randint(0, 60000, size=(3, 21, 14)).astype(numpy.uint16)
+
+    def test_divisible(self):
+        frame = self.stack[0, :20, :14]
+        ref = frame.reshape(5, 4, 7, 2).astype(numpy.float64)
+        self.assertTrue(numpy.allclose(rebin(frame, (4, 2)), ref.mean(axis=3).mean(axis=1)), "mean")
+        res = rebin(frame, (4, 2), "sum")
+        self.assertEqual(res.dtype, numpy.uint64, "sum of unsigned integers")
+        self.assertEqual(abs(res - ref.sum(axis=3).sum(axis=1)).max(), 0, "sum")
+        res = rebin(frame, (4, 2), "max")
+        self.assertEqual(res.dtype, frame.dtype, "max keeps the type")
+        self.assertEqual(abs(res - frame.reshape(5, 4, 7, 2).max(axis=3).max(axis=1)).max(), 0, "max")
+
+    def test_edges(self):
+        frame = self.stack[0]
+        self.assertEqual(rebin(frame, 4, edge="trim").shape, (5, 3), "trim")
+        pad = rebin(frame, 4, "mean", edge="pad")
+        partial = rebin(frame, 4, "mean", edge="partial")
+        self.assertEqual(pad.shape, (6, 4), "pad")
+        self.assertEqual(partial.shape, (6, 4), "partial")
+        self.assertAlmostEqual(pad[-1, -1], frame[20:, 12:].sum() / 16., 6, "padded with zeros")
+        self.assertAlmostEqual(partial[-1, -1], frame[20:, 12:].mean(), 6, "mean of the remaining pixels")
+        self.assertAlmostEqual(partial[2, -1], frame[8:12, 12:].mean(), 6, "last column")
+        self.assertTrue(numpy.allclose(pad[:5, :3], partial[:5, :3]), "same complete bins")
+
+    def test_stack(self):
+        res = rebin(self.stack, (3, 7), "sum", dtype=numpy.float32)
+        self.assertEqual(res.shape, (3, 7, 2), "shape")
+        self.assertEqual(res.dtype, numpy.float32, "dtype")
+        for frame, binned in zip(self.stack, res):
+            self.assertTrue(numpy.allclose(binned, rebin(frame, (3, 7), "sum")), "frame by frame")
+
+    def test_image(self):
+        img = edfimage(data=self.stack[0])
+        self.assertRaises(RuntimeError, img.rebin, 4, 4)
+        img.rebin(4, 4, keep_I=False, edge="partial")
+        self.assertEqual(img.data.shape, (6, 4), "shape")
+        self.assertEqual((img.dim1, img.dim2), (4, 6), "dims")
+        self.assertEqual(img.data.dtype, numpy.uint16, "dtype")
+
+
+def suite():
+    testsuite = unittest.TestSuite()
+    testsuite.addTest(TestReduce("test_array"))
+    testsuite.addTest(TestReduce("test_mixed_types"))
+    testsuite.addTest(TestReduce("test_multiframe"))
+    testsuite.addTest(TestReduce("test_series"))
+    testsuite.addTest(TestReduce("test_series_stats"))
+    testsuite.addTest(TestReduce("test_integrate_series"))
+    testsuite.addTest(TestReduce("test_stability"))
+    testsuite.addTest(TestReduce("test_blocks"))
+    testsuite.addTest(TestRebin("test_divisible"))
+    testsuite.addTest(TestRebin("test_edges"))
+    testsuite.addTest(TestRebin("test_stack"))
+    testsuite.addTest(TestRebin("test_image"))
+    return testsuite
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
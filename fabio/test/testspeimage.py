@@ -40,6 +40,7 @@ __date__ = "12/07/2016"
 
 import unittest
 import os
+import gzip
 import sys
 
 import numpy as np
@@ -152,6 +153,56 @@ class TestSpeImage(unittest.TestCase):
         self.assertEqual(abs(v2_file.data - v2_file_bz.data).max(), 0, "v2/bz")
         self.assertEqual(abs(v3_file.data - v3_file_bz.data).max(), 0, "v3/bz")
 
+class TestSpeStack(unittest.TestCase):
+    """Synthetic multi-frame version 2 file"""
+
+    def setUp(self):
+        self.stack = np.random.randint(0, 60000, size=(4, 6, 5)).astype(np.uint16)
+        header = bytearray(4100)
+        header[108:110] = np.uint16(3).tobytes()  # uint16
+        header[42:44] = np.int16(5).tobytes()
+        header[656:658] = np.int16(6).tobytes()
+        header[1446:1450] = np.int32(4).tobytes()
+        header[20:29] = b"18Oct2016"
+        header[172:178] = b"120000"
+        self.filename = os.path.join(UtilsTest.tempdir, "stack.spe")
+        with open(self.filename, "wb") as f:
+            f.write(bytes(header) + self.stack.tobytes())
+
+    def tearDown(self):
+        if os.path.exists(self.filename):
+            os.unlink(self.filename)
+
+    def test_memmap(self):
+        img = SpeImage()
+        img.read(self.filename, 2)
+        self.assertEqual(img.nframes, 4, "nframes")
+        self.assertEqual(abs(img.data - self.stack[2]).max(), 0, "frame 2")
+        self.assertFalse(img.data.flags.owndata, "data is a view")
+        frame = img.getframe(3)
+        self.assertEqual(abs(frame.data - self.stack[3]).max(), 0, "frame 3")
+        self.assertTrue(np.may_share_memory(frame.data, img.dataset), "frames share the map")
+        self.assertRaises(IndexError, img.getframe, 4)
+        frame.data *= 2
+        frame.data[0, 0] = 7
+        self.assertEqual(frame.data[0, 0], 7, "frames can be modified in place")
+        self.assertEqual(abs(SpeImage().read(self.filename, 3).data - self.stack[3]).max(), 0, "file unchanged")
+
+    def test_fallback(self):
+        with open(self.filename, "rb") as f:
+            raw = f.read()
+        with gzip.open(self.filename + ".gz", "wb") as f:
+            f.write(raw)
+        try:
+            img = SpeImage()
+            img.read(self.filename + ".gz", 2)
+            self.assertTrue(img.dataset is None, "compressed file is not mapped")
+            self.assertEqual(abs(img.data - self.stack[2]).max(), 0, "frame 2")
+            self.assertEqual(abs(img.getframe(3).data - self.stack[3]).max(), 0, "frame 3")
+        finally:
+            os.unlink(self.filename + ".gz")
+
+
 def suite():
     testsuite = unittest.TestSuite()
     testsuite.addTest(TestSpeImage("test_reading_version2_spe"))
@@ -165,6 +216,8 @@ def suite():
     testsuite.addTest(TestSpeImage("test_read_data"))
     testsuite.addTest(TestSpeImage("test_multiple_frames"))
     testsuite.addTest(TestSpeImage("test_fabio_integration"))
+    testsuite.addTest(TestSpeStack("test_memmap"))
+    testsuite.addTest(TestSpeStack("test_fallback"))
     return testsuite
 
 if __name__ == '__main__':
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#    Project: Fable Input Output
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Test for out-of-core stacking of frames.
+"""
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+import os
+import sys
+import unittest
+if __name__ == '__main__':
+    import pkgutil
+    __path__ = pkgutil.extend_path([os.path.dirname(__file__)], "fabio.test")
+from .utilstest import UtilsTest
+import numpy
+logger = UtilsTest.get_logger(__file__)
+fabio = sys.modules["fabio"]
+from fabio.edfimage import edfimage
+from fabio.stacking import stack_frames
+
+
+class TestStack(unittest.TestCase):
+
+    def setUp(self):
+        self.stack = numpy.random.randint(0, 60000, size=(9, 23, 7)).astype(numpy.uint16)
+        self.filenames = []
+
+    def tearDown(self):
+        for filename in self.filenames:
+            if os.path.exists(filename):
+                os.unlink(filename)
+
+    def write_stack(self, name, stack):
+        filename = os.path.join(UtilsTest.tempdir, name)
+        self.filenames.append(filename)
+        e = edfimage(data=stack[0])
+        for frame in stack[1:]:
+            e.appendFrame(data=frame)
+        e.write(filename)
+        return filename
+
+    def test_location(self):
+        filename = self.write_stack("stack_location.edf", self.stack)
+        img = fabio.open(filename)
+        for i in (0, 5):
+            name, offset, shape, dtype = img.get_frame_location(i)
+            self.assertEqual(shape, self.stack.shape[1:], "shape")
+            data = numpy.fromfile(name, dtype=dtype, count=shape[0] * shape[1], offset=offset)
+            self.assertEqual(abs(data.reshape(shape) - self.stack[i]).max(), 0, "frame %s" % i)
+
+    def test_median(self):
+        filename = self.write_stack("stack_median.edf", self.stack)
+        ref = numpy.median(self.stack, axis=0)
+        for memory in (1, 10000, 2 ** 30):
+            for workers in (1, 3):
+                res = stack_frames(filename, "median", memory=memory, workers=workers)
+                self.assertTrue(numpy.allclose(res, ref), "median memory=%s workers=%s" % (memory, workers))
+        res = stack_frames(filename, "percentile", q=90, memory=10000)
+        self.assertTrue(numpy.allclose(res, numpy.percentile(self.stack, 90, axis=0)), "percentile")
+
+    def test_compressed(self):
+        "frames without a direct location are spooled"
+        filename = os.path.join(UtilsTest.tempdir, "stack_compressed.edf.gz")
+        self.filenames.append(filename)
+        import gzip
+        raw = self.write_stack("stack_raw.edf", self.stack[:4])
+        with open(raw, "rb") as src:
+            with gzip.open(filename, "wb") as dst:
+                dst.write(src.read())
+        self.assertEqual(fabio.open(filename).get_frame_location(0), None, "no location")
+        res = stack_frames([filename, self.stack[4:]], "mean", memory=5000, workers=2)
+        self.assertTrue(numpy.allclose(res, self.stack.mean(axis=0)), "mean")
+
+    def test_many_files(self):
+        "files are opened once, or by groups when there are too many of them"
+        from fabio import stacking
+        filenames = [self.write_stack("stack_file_%i.edf" % i, self.stack[2 * i:2 * i + 2])
+                     for i in range(len(self.stack) // 2)]
+        ref = numpy.median(self.stack[:2 * len(filenames)], axis=0)
+        res = stack_frames(filenames, "median", memory=10000, workers=2)
+        self.assertTrue(numpy.allclose(res, ref), "files opened once")
+        max_open_files = stacking.MAX_OPEN_FILES
+        stacking.MAX_OPEN_FILES = 2
+        try:
+            res = stack_frames(filenames, "median", memory=10000, workers=2)
+        finally:
+            stacking.MAX_OPEN_FILES = max_open_files
+        self.assertTrue(numpy.allclose(res, ref), "files opened for each band")
+
+    def test_sigma_clip(self):
+        stack = numpy.ones((20, 8, 8), dtype=numpy.float32)
+        stack[:, :, ::2] = 3
+        stack[7, 2, 2] = 1000
+        output = os.path.join(UtilsTest.tempdir, "stack_clip.edf")
+        self.filenames.append(output)
+        res = stack_frames(stack, "sigma_clip", sigma=3, output=output)
+        self.assertTrue(numpy.allclose(res, stack[0]), "outlier rejected")
+        saved = fabio.open(output)
+        self.assertEqual(saved.header["stack_method"], "sigma_clip", "header")
+        self.assertTrue(numpy.allclose(saved.data, res), "saved data")
+
+
+def suite():
+    testsuite = unittest.TestSuite()
+    testsuite.addTest(TestStack("test_location"))
+    testsuite.addTest(TestStack("test_median"))
+    testsuite.addTest(TestStack("test_compressed"))
+    testsuite.addTest(TestStack("test_many_files"))
+    testsuite.addTest(TestStack("test_sigma_clip"))
+    return testsuite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
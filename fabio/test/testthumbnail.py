@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+#    Project: Fable Input Output
+#             https://github.com/silx-kit/fabio
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+#    This program is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    This program is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#    GNU General Public License for more details.
+#
+#    You should have received a copy of the GNU General Public License
+#    along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Test for thumbnails of frames.
+"""
+__author__ = "Jérôme Kieffer"
+__date__ = "18/10/2016"
+import os
+import sys
+import unittest
+if __name__ == '__main__':
+    import pkgutil
+    __path__ = pkgutil.extend_path([os.path.dirname(__file__)], "fabio.test")
+from .utilstest import UtilsTest
+import numpy
+logger = UtilsTest.get_logger(__file__)
+fabio = sys.modules["fabio"]
+from fabio.thumbnail import thumbnail_series
+
+
+class TestThumbnail(unittest.TestCase):
+
+    def setUp(self):
+        self.stack = numpy.random.randint(0, 60000, size=(13, 17, 11)).astype(numpy.uint16)
+        self.filenames = []
+
+    def tearDown(self):
+        for filename in self.filenames:
+            os.unlink(filename)
+
+    def test_thumbnail_series(self):
+        res = list(thumbnail_series(self.stack, size=(6, 10), scale="linear", workers=2))
+        self.assertEqual(len(res), len(self.stack), "one thumbnail per frame")
+        self.assertEqual([i[1] for i in res], list(range(len(self.stack))), "frames in order")
+        self.assertEqual(res[0][2].shape, (9, 6), "binned by 2")
+        if fabio.thumbnail.Image is None:
+            return
+        template = os.path.join(UtilsTest.tempdir, "thumb_%(index)03i.png")
+        res = list(thumbnail_series(self.stack[:3], template=template, size=8, workers=2))
+        for filename, frame, thumb in res:
+            self.filenames.append(filename)
+            self.assertTrue(os.path.exists(filename), "saved")
+        self.assertEqual(res[2][0], template % {"index": 2}, "file name")
+
+
+def suite():
+    testsuite = unittest.TestSuite()
+    testsuite.addTest(TestThumbnail("test_thumbnail_series"))
+    return testsuite
+
+
+if __name__ == '__main__':
+    runner = unittest.TextTestRunner()
+    runner.run(suite())
@@ -0,0 +1,142 @@
+# coding: utf-8
+#
+#    Project: X-ray image reader
+#             https://github.com/silx-kit/fabio
+#
+#
+#    Copyright (C) European Synchrotron Radiation Facility, Grenoble, France
+#
+#    Principal author:       Jérôme Kieffer (Jerome.Kieffer@ESRF.eu)
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+#
+
+"""8 bit previews (thumbnails) of frames, computed with numpy only and
+saved in any format supported by PIL (PNG, JPEG...)
+"""
+from __future__ import absolute_import, print_function, with_statement, division
+
+__author__ = "Jérôme Kieffer"
+__contact__ = "Jerome.Kieffer@ESRF.eu"
+__license__ = "MIT"
+__copyright__ = "European Synchrotron Radiation Facility, Grenoble, France"
+__date__ = "18/10/2016"
+__status__ = "development"
+
+import os
+import multiprocessing
+import numpy
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from .reduction import rebin, iter_source_frames, ordered_imap
+
+THUMBNAIL_SCALES = ("linear", "log", "percentile")
+
+
+def thumbnail(data, size=256, scale="log", percentiles=(1, 99)):
+    """
+    8 bit preview of a frame, binned and scaled with numpy only
+
+    The frame is binned by the smallest integer factor making it fit in
+    size (mean of the bins, partial bins on the edges), then the binned
+    image is scaled to [0, 255]. Non finite pixels are black.
+
+    @param data: 2D numpy array
+    @param size: maximum size of the thumbnail, in pixels, or (width, height)
+    @param scale: "linear", "log" or "percentile" (linear between percentiles)
+    @param percentiles: lower and upper percentiles for the percentile scale
+    @return: 2D numpy array of uint8
+    """
+    if scale not in THUMBNAIL_SCALES:
+        raise ValueError("Unknown scale %s, expected one of %s" % (scale, THUMBNAIL_SCALES))
+    if numpy.isscalar(size):
+        size = (size, size)
+    width, height = (max(1, int(i)) for i in size)
+    rows, cols = data.shape[-2:]
+    factor = max(1, -(-rows // height), -(-cols // width))
+    small = rebin(data, factor, "mean", edge="partial", dtype=numpy.float32)
+    finite = numpy.isfinite(small)
+    values = small if finite.all() else small[finite]
+    res = numpy.zeros(small.shape, dtype=numpy.uint8)
+    if values.size == 0:
+        return res
+    if scale == "percentile":
+        low, high = numpy.percentile(values, percentiles)
+    else:
+        low, high = values.min(), values.max()
+    numpy.clip(small, low, high, out=small)
+    small -= low
+    high -= low
+    if scale == "log":
+        numpy.log1p(small, out=small)
+        high = numpy.log1p(high)
+    if high > 0:
+        small *= 255.0 / high
+    small += 0.5
+    numpy.copyto(res, small, casting="unsafe", where=finite)
+    return res
+
+
+def save_thumbnail(thumb, filename):
+    """
+    Save an 8 bit preview with PIL, format given by the extension (png, jpg...)
+
+    @param thumb: 2D numpy array of uint8
+    @param filename: name of the output file
+    """
+    if Image is None:
+        raise RuntimeError("PIL is needed to save thumbnails")
+    Image.frombuffer("L", thumb.shape[::-1], numpy.ascontiguousarray(thumb), "raw", "L", 0, 1).save(filename)
+
+
+def thumbnail_series(source, template=None, size=256, scale="log", percentiles=(1, 99), workers=None):
+    """
+    Thumbnails of each frame of a source, computed by a pool of threads
+
+    @param source: filename, FabioImage, numpy array or iterable of those
+        (like a file_series or a list of filenames)
+    @param template: if given, each thumbnail is saved under the name
+        template % {"name": file name without extension, "frame": index of
+        the frame in its file, "index": index in the series},
+        like "previews/%(name)s_%(frame)04i.png"
+    @param size: maximum size of the thumbnails (see thumbnail)
+    @param scale: "linear", "log" or "percentile"
+    @param percentiles: lower and upper percentiles for the percentile scale
+    @param workers: number of threads (default: number of CPU)
+    @return: generator of (filename, frame, thumbnail) where filename is the
+        name of the saved file if any, else the name of the input file
+    """
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    workers = max(1, int(workers))
+
+    def process(item):
+        index, (filename, frame, data) = item
+        thumb = thumbnail(data, size, scale, percentiles)
+        if template is not None:
+            name = os.path.splitext(os.path.basename(filename or ""))[0]
+            filename = template % {"name": name, "frame": frame, "index": index}
+            save_thumbnail(thumb, filename)
+        return filename, frame, thumb
+
+    return ordered_imap(process, enumerate(iter_source_frames(source)), workers)
@@ -98,7 +98,11 @@ def check_cython():
     except ImportError:
         return False
     else:
-        if Cython.Compiler.Version.version < "0.17":
+        from distutils.version import LooseVersion
+        # const memoryviews (fabio/ext/_cif.pyx, _edf.pyx) need Cython 0.28
+        if LooseVersion(Cython.Compiler.Version.version) < LooseVersion("0.28"):
+            print("Cython %s is too old, 0.28 is needed: using the provided C files" %
+                  Cython.Compiler.Version.version)
             return False
     return True
 
@@ -151,7 +155,8 @@ def Extension(name, source=None, can_use_openmp=False, extra_sources=None, **kwa
 ext_modules = [Extension('cf_io', extra_sources=['fabio/ext/src/columnfile.c']),
                Extension("byte_offset"),
                Extension('mar345_IO', extra_sources=['fabio/ext/src/ccp4_pack.c']),
-               Extension('_cif')]
+               Extension('_cif'),
+               Extension('_edf')]
 
 
 ##############